@@ -1,14 +1,24 @@
 import os
 import argparse
+import threading
 from datetime import datetime, timedelta
 
 from src.FIM.FIM import monitor_changes
+from src.FIM import verify
 from src.Authentication.Authentication import Authentication
 from src.utils.anomaly_detection import parse_log_file, load_vectorizer_model
+from src.utils import export, columnar_export, snapshot_diff
+from src.api.database.connection import FimSessionLocal, fim_engine
+from src.api.models.fim_models import upgrade_fim_schema
+from src.utils.database import DatabaseOperation
+from src.utils.restore import RestoreEngine, RestoreError
+from src.utils import log_reader
+from src.utils.log_search import get_log_search_index
 
 
 class CLI:
     def __init__(self):
+        upgrade_fim_schema(fim_engine)
         self.monitor_changes = monitor_changes()
         self.authentication = Authentication()
         self.exclude_files = []
@@ -31,20 +41,47 @@ class CLI:
         parser.add_argument("-a", "--analyze-logs", action="store_true", help="Analyze the log file for anomalies")
         parser.add_argument("-e", "--exclude", type=str, help="Exclude selected file and folder")
         parser.add_argument("-d", "--dir", nargs="+", type=str, help="Add directories to monitor.")
+        parser.add_argument("-x", "--export", choices=export.EXPORT_KINDS, help="Export the baseline or change history")
+        parser.add_argument("-f", "--format", choices=export.EXPORT_FORMATS + columnar_export.COLUMNAR_FORMATS,
+                            default="ndjson", help="Export format (parquet/arrow write a partitioned dataset directory)")
+        parser.add_argument("-o", "--output", type=str, help="Export output file (or directory for parquet/arrow)")
+        parser.add_argument("--rebuild-rollups", action="store_true", help="Recompute dashboard change rollups from history")
+        parser.add_argument("--full-export", action="store_true", help="Re-export all change history instead of only new events")
+        parser.add_argument("--verify", action="store_true",
+                            help="Check the disk against the stored baseline (all monitored directories, or the --dir paths)")
+        parser.add_argument("--rehash", action="store_true", help="With --verify, hash every file instead of trusting unchanged mtimes")
+        parser.add_argument("--diff", nargs=2, metavar=("OLD", "NEW"),
+                            help="Diff two snapshots: db:<dir>, live:<dir> or a baseline export file[#<dir>]")
+        parser.add_argument("--restore", type=str, metavar="PATH", help="Restore a file or folder from the newest clean backup snapshot")
+        parser.add_argument("--snapshot", type=str, help="With --restore, restore from this snapshot id")
+        parser.add_argument("--prune", action="store_true", help="With --restore, remove files that are not in the snapshot")
+        parser.add_argument("--at", type=datetime.fromisoformat, metavar="TIME",
+                            help="With --restore, restore the state at this time (e.g. '2025-01-31 14:00') from snapshots and version history")
+        parser.add_argument("-z", "--gzip", action="store_true", help="Gzip-compress the export")
+        parser.add_argument("--search-logs", nargs="?", const="", metavar="QUERY",
+                            help="Search the log index (full-text QUERY, combine with --path/--user/--since/--until/--level)")
+        parser.add_argument("--path", type=str, help="With --search-logs, records about this path or anything under it")
+        parser.add_argument("--user", type=str, help="With --search-logs, records of this user")
+        parser.add_argument("--since", type=datetime.fromisoformat, metavar="TIME", help="With --search-logs, records at or after TIME")
+        parser.add_argument("--until", type=datetime.fromisoformat, metavar="TIME", help="With --search-logs, records at or before TIME")
+        parser.add_argument("--level", nargs="+", help="With --search-logs, only these levels")
+        parser.add_argument("--limit", type=int, default=50, help="With --search-logs, maximum results (default 50)")
+        parser.add_argument("--rebuild-log-index", action="store_true", help="Rebuild the log search index from scratch")
 
         args = parser.parse_args()
         monitored_dirs = []
         if args.dir is not None:
             monitored_dirs = [os.path.abspath(dir) for dir in args.dir]
 
-        if any([args.monitor, args.reset_baseline, args.analyze_logs]):
+        if any([args.monitor, args.reset_baseline, args.analyze_logs, args.export, args.verify, args.diff, args.restore,
+                args.rebuild_rollups, args.search_logs is not None, args.rebuild_log_index]):
             self._require_auth()
             self.authenticated = True
 
         if args.analyze_logs:
             log_folder_path = 'logs'
-            for file in os.listdir(log_folder_path):
-                file_path = os.path.join(log_folder_path, file)
+            log_paths = [os.path.join(log_folder_path, file) for file in os.listdir(log_folder_path) if file.endswith(".log")]
+            for file_path in (segment for log_path in log_paths for segment in log_reader.segments(log_path)):
                 log_df = parse_log_file(file_path)
                 if log_df.empty:
                     print("No log data found.")
@@ -78,6 +115,106 @@ class CLI:
         if args.view_logs:
             self.monitor_changes.view_logs()
 
+        if args.rebuild_log_index:
+            print(f"Indexed {get_log_search_index().rebuild()} log records")
+
+        if args.search_logs is not None:
+            index = get_log_search_index()
+            index.update()
+            try:
+                results = index.search(
+                    text=args.search_logs or None, path=args.path, user=args.user, levels=args.level,
+                    directory=os.path.abspath(args.dir[0]) if args.dir else None,
+                    since=log_reader.to_epoch(args.since) if args.since else None,
+                    until=log_reader.to_epoch(args.until) if args.until else None,
+                    limit=args.limit,
+                )
+            except ValueError as e:
+                print(e)
+                results = []
+            for record in reversed(results):
+                print(log_reader.format_record(record))
+            print(f"{len(results)} matching records")
+
+        if args.rebuild_rollups:
+            events = DatabaseOperation(FimSessionLocal()).rebuild_change_rollups()
+            print(f"Rebuilt change rollups from {events} events")
+
+        if args.verify:
+            db_session = FimSessionLocal()
+            try:
+                monitored = DatabaseOperation(db_session).get_all_monitored_directories()
+                try:
+                    targets = verify.resolve_targets(monitored_dirs or monitored, monitored)
+                except ValueError as e:
+                    print(e)
+                    return
+                report = verify.VerifyReport()
+                worker = threading.Thread(
+                    target=verify.run_verify, args=(db_session, targets, report, args.rehash), daemon=True
+                )
+                worker.start()
+                for entry in report.follow():
+                    print(f"{entry['status'].upper():9} {entry['type']:6} {entry['path']}")
+                worker.join()
+                summary = report.summary()
+                print(f"Verified {len(targets)} directories: {summary['added']} added, "
+                      f"{summary['modified']} modified, {summary['deleted']} deleted")
+            finally:
+                db_session.close()
+
+        if args.diff:
+            db_session = FimSessionLocal()
+            try:
+                counts = {"added": 0, "modified": 0, "deleted": 0}
+                old, new = (snapshot_diff.source_from_spec(spec, db_session) for spec in args.diff)
+                for entry in snapshot_diff.merge_diff(old, new):
+                    counts[entry["status"]] += 1
+                    print(f"{entry['status'].upper():9} {entry['type']:6} {entry['path']}")
+                print(f"{counts['added']} added, {counts['modified']} modified, {counts['deleted']} deleted")
+            except ValueError as e:
+                print(e)
+            finally:
+                db_session.close()
+
+        if args.restore:
+            db_session = FimSessionLocal()
+            try:
+                monitored = DatabaseOperation(db_session).get_all_monitored_directories()
+                source_dir = next(iter(verify.resolve_targets([os.path.abspath(args.restore)], monitored)))
+                engine = RestoreEngine(self.monitor_changes.backup_instance, self.monitor_changes.version_store)
+                result = engine.restore(source_dir, os.path.abspath(args.restore), db_session,
+                                        snapshot_id=args.snapshot, prune=args.prune,
+                                        at=log_reader.to_epoch(args.at) if args.at else None)
+                print(f"Restored {result['restored']} files ({result['unchanged']} already intact, "
+                      f"{result['pruned']} pruned) from snapshot {result['snapshot']}"
+                      + (f" as of {args.at}" if args.at else "") + f" in {result['seconds']}s")
+            except (ValueError, RestoreError) as e:
+                print(e)
+            finally:
+                db_session.close()
+
+        if args.export:
+            output = args.output or f"fim_{args.export}.{args.format}" + (".gz" if args.gzip else "")
+            directories = monitored_dirs or [None]
+            if len(directories) > 1:
+                print("Please specify a single directory to export, or none for all.")
+                return
+            db_session = FimSessionLocal()
+            try:
+                if args.format in columnar_export.COLUMNAR_FORMATS:
+                    output = args.output or "fim_export"
+                    rows = columnar_export.export_columnar(
+                        db_session, args.export, output, args.format, directories[0],
+                        incremental=not args.full_export
+                    )
+                    print(f"Exported {rows} {args.export} rows to {os.path.join(output, args.export)}")
+                else:
+                    written = export.export_to_file(db_session, args.export, args.format, output, directories[0], args.gzip)
+                    print(f"Exported {args.export} to {output} ({written} bytes)")
+            finally:
+                db_session.close()
+
         if args.exclude:
             self.exclude_files.append(args.exclude)
 
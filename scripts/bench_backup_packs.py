@@ -0,0 +1,117 @@
+"""
+bench_backup_packs.py
+----------------------
+Benchmark of backup storage formats: loose objects (raw copies) against
+compressed packs (zlib, lzma, and zstd when installed).
+
+Builds a synthetic tree of small config-like files, snapshots it once per
+format into a fresh store and reports disk usage (allocated blocks), inode
+count, snapshot time and single-file restore latency:
+
+    python scripts/bench_backup_packs.py --files 20000 --samples 500
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.backup import Backup  # noqa: E402
+from src.utils.pack_store import zstd_available  # noqa: E402
+
+CONFIG_WORDS = ["server", "listen", "port", "timeout", "enabled", "true", "false", "path", "user",
+                "group", "include", "log_level", "info", "max_connections", "cache", "ttl"]
+
+
+def build_tree(root, files, seed=7):
+    """Small files of 200 B - 8 KB of key = value lines, spread over nested folders."""
+    rng = random.Random(seed)
+    for i in range(files):
+        folder = os.path.join(root, f"svc{i % 50}", f"conf{i % 7}")
+        os.makedirs(folder, exist_ok=True)
+        lines = []
+        for _ in range(rng.randint(5, 200)):
+            lines.append(f"{rng.choice(CONFIG_WORDS)}_{rng.randint(0, 99)} = {rng.choice(CONFIG_WORDS)}{rng.randint(0, 9999)}")
+        with open(os.path.join(folder, f"file{i}.conf"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def disk_usage(root):
+    """(allocated bytes, inodes) under root."""
+    allocated = inodes = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            st = os.lstat(os.path.join(dirpath, name))
+            allocated += st.st_blocks * 512
+            inodes += 1
+    return allocated, inodes
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run(source, codec, samples):
+    store = tempfile.mkdtemp(prefix=f"fim-bench-{codec or 'raw'}-")
+    try:
+        backup = Backup(store, pack_codec=codec)
+        start = time.perf_counter()
+        snapshot = backup.create_backup(source)
+        snapshot_seconds = time.perf_counter() - start
+
+        entries = [e for e in backup.read_manifest(snapshot) if e["type"] == "file"]
+        picks = random.Random(1).sample(entries, min(samples, len(entries)))
+        latencies = []
+        for entry in picks:
+            start = time.perf_counter()
+            backup.read_object(entry["digest"])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        allocated, inodes = disk_usage(store)
+        return {
+            "format": codec or "raw",
+            "store_mb": allocated / (1024 * 1024),
+            "inodes": inodes,
+            "snapshot_s": snapshot_seconds,
+            "restore_p50_ms": statistics.median(latencies),
+            "restore_p99_ms": _percentile(latencies, 99),
+        }
+    finally:
+        shutil.rmtree(store, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark raw vs packed backup objects")
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--samples", type=int, default=500, help="Single-file restores to time per format")
+    parser.add_argument("--source", help="Benchmark an existing directory instead of a synthetic tree")
+    args = parser.parse_args()
+
+    source = args.source or tempfile.mkdtemp(prefix="fim-bench-src-")
+    try:
+        if not args.source:
+            build_tree(source, args.files)
+        source_bytes, _ = disk_usage(source)
+        print(f"Source: {source} ({source_bytes / (1024 * 1024):.1f} MB allocated)\n")
+
+        codecs = ["", "zlib", "lzma"] + (["zstd"] if zstd_available() else [])
+        print(f"{'format':<8}{'store MB':>10}{'inodes':>9}{'snapshot s':>12}{'p50 ms':>9}{'p99 ms':>9}")
+        for codec in codecs:
+            r = run(source, codec, args.samples)
+            print(f"{r['format']:<8}{r['store_mb']:>10.1f}{r['inodes']:>9}{r['snapshot_s']:>12.2f}"
+                  f"{r['restore_p50_ms']:>9.3f}{r['restore_p99_ms']:>9.3f}")
+    finally:
+        if not args.source:
+            shutil.rmtree(source, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
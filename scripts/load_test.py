@@ -0,0 +1,81 @@
+"""
+load_test.py
+-------------
+Concurrent load test for the FIM read endpoints.
+
+Fires `--requests` GETs at each endpoint with `--concurrency` workers and
+prints latency percentiles, so sync and async deployments can be compared:
+
+    python scripts/load_test.py --base-url http://127.0.0.1:8000 --concurrency 64
+"""
+
+import argparse
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_ENDPOINTS = [
+    "/api/fim/status",
+    "/api/fim/changes?limit=100",
+    "/api/fim/baseline?limit=500",
+]
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _timed_get(url, timeout):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            ok = 200 <= response.status < 400
+    except (urllib.error.URLError, TimeoutError):
+        ok = False
+    return (time.perf_counter() - start) * 1000, ok
+
+
+def run(base_url, endpoints, total_requests, concurrency, timeout):
+    results = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for endpoint in endpoints:
+            url = base_url.rstrip("/") + endpoint
+            started = time.perf_counter()
+            samples = list(pool.map(lambda _: _timed_get(url, timeout), range(total_requests)))
+            elapsed = time.perf_counter() - started
+
+            latencies = [latency for latency, _ in samples]
+            errors = sum(1 for _, ok in samples if not ok)
+            results[endpoint] = {
+                "rps": total_requests / elapsed,
+                "p50": statistics.median(latencies),
+                "p95": _percentile(latencies, 95),
+                "p99": _percentile(latencies, 99),
+                "errors": errors,
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the FIM read endpoints")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoint", action="append", help="Endpoint path (repeatable)")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    results = run(args.base_url, args.endpoint or DEFAULT_ENDPOINTS, args.requests, args.concurrency, args.timeout)
+
+    print(f"{'endpoint':40} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for endpoint, r in results.items():
+        print(f"{endpoint:40} {r['rps']:8.1f} {r['p50']:8.1f} {r['p95']:8.1f} {r['p99']:8.1f} {r['errors']:7d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,83 +1,112 @@
 import os
 import time
 import json
+import threading
 from pathlib import Path
 from datetime import datetime
-from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+from src.api.database.connection import FimSessionLocal
 from src.utils.backup import Backup
+from src.utils.copy_engine import copy_engine
+from src.utils.versions import VERSIONING_ENABLED, VersionStore
 from src.utils.database import DatabaseOperation
 from src.FIM.fim_utils import FIM_monitor
-from src.config.logging_config import configure_logger
+from src.FIM import verify
+from src.FIM.event_bus import change_event_bus
+from src.FIM.monitor_manager import MonitorManager
+from src.config.logging_config import LOGS_DIR, configure_logger, log_path_for
+from src.utils.jobs import JobCancelled
+from src.utils.restore import RESTORE_TMP_MARKER
+from src.utils import log_reader
 
 
 class FIMEventHandler(FileSystemEventHandler):
-    def __init__(self, parent, logger, db_session):
+    """
+    Watchdog handler for one monitored root. Runs on the observer thread,
+    so it only hands events to the manager's hashing pool; hashing, the
+    baseline lookup and reporting happen on a pool lane.
+    """
+
+    def __init__(self, parent, logger, directory_path):
         super().__init__()
         self.parent: monitor_changes = parent
         self.logger = logger
-        self.directory_path = None
-        self.db_session = db_session
-        self.database_instance = DatabaseOperation(db_session)
-
-    def _get_directory_path(self, event_path):
-        """Extract monitored directory path from event path"""
-        for dir_path in self.parent.current_directories:
-            if event_path.startswith(dir_path):
-                return dir_path
-        return os.path.dirname(event_path)
+        self.directory_path = directory_path
 
-    def on_created(self, event):
-        try:
-            _path = event.src_path
-            if event.is_directory:
-                current_hash = self.parent.fim_instance.calculate_folder_hash(_path if isinstance(_path, str) else str(_path))
-                is_file = False
-            else:
-                current_hash = self.parent.fim_instance.calculate_hash(_path if isinstance(_path, str) else str(_path))
-                is_file = True
+    def _dispatch(self, handler, event):
+        _path = event.src_path if isinstance(event.src_path, str) else str(event.src_path)
+        if RESTORE_TMP_MARKER in os.path.basename(_path):
+            return  # restore staging file, renamed into place once verified
+        self.parent.manager.hash_pool.submit(_path, handler, _path, event.is_directory, time.perf_counter())
 
-            self.parent.file_folder_addition(_path, current_hash, is_file, self.logger, self.database_instance)
-        except Exception as e:
-            self.logger.error(f"Creation error: {str(e)}")
+    def on_created(self, event):
+        self._dispatch(self._handle_created, event)
 
     def on_modified(self, event):
-        try:
-            _path = event.src_path
+        self._dispatch(self._handle_modified, event)
 
-            if event.is_directory:
-                current_hash = self.parent.fim_instance.calculate_folder_hash(_path if isinstance(_path, str) else str(_path))
-                is_file = False
-            else:
-                current_hash = self.parent.fim_instance.calculate_hash(_path if isinstance(_path, str) else str(_path))
-                is_file = True
+    def on_deleted(self, event):
+        self._dispatch(self._handle_deleted, event)
+
+    def _current_hash(self, _path, is_directory):
+        if is_directory:
+            return self.parent.fim_instance.calculate_folder_hash(_path)
+        return self.parent.fim_instance.calculate_hash(_path)
+
+    @staticmethod
+    def _timings(received, hashed=None):
+        """Queue wait / hashing time in ms for the structured log line."""
+        now = time.perf_counter()
+        timings = {"latency_ms": round((now - received) * 1000, 3)}
+        if hashed is not None:
+            timings["hash_ms"] = round((now - hashed) * 1000, 3)
+        return timings
+
+    def _handle_created(self, _path, is_directory, received):
+        try:
+            started = time.perf_counter()
+            current_hash = self._current_hash(_path, is_directory)
+            baseline = self.parent.manager.baseline_entry(self.directory_path, _path) or {}
+            if baseline.get('hash') == current_hash:
+                # Re-created with its baseline content (e.g. renamed into place by a restore)
+                self.parent.file_folder_modification(
+                    _path, current_hash, current_hash, not is_directory, self.logger, self.directory_path,
+                    timings=self._timings(received, started), flagged=baseline.get('status') != 'current'
+                )
+                return
+            self.parent.file_folder_addition(_path, current_hash, not is_directory, self.logger, self.directory_path,
+                                             timings=self._timings(received, started))
+        except Exception as e:
+            self.logger.error(f"Creation error: {str(e)}", extra={"event": "error", "path": _path})
 
-            dir_path = str(self._get_directory_path(_path))
-            file_path = str(_path)
-            original_hash = self.database_instance.get_current_baseline(dir_path).get(file_path, {}).get('hash', '')
-            self.parent.file_folder_modification(_path, current_hash, original_hash, is_file, self.logger, self.database_instance)
+    def _handle_modified(self, _path, is_directory, received):
+        try:
+            started = time.perf_counter()
+            current_hash = self._current_hash(_path, is_directory)
+            timings = self._timings(received, started)
+            baseline = self.parent.manager.baseline_entry(self.directory_path, _path) or {}
+            self.parent.file_folder_modification(
+                _path, current_hash, baseline.get('hash', ''), not is_directory, self.logger, self.directory_path,
+                timings=timings, flagged=baseline.get('status', 'current') != 'current'
+            )
         except Exception as e:
-            self.logger.error(f"Modification error: {str(e)}")
+            self.logger.error(f"Modification error: {str(e)}", extra={"event": "error", "path": _path})
 
-    def on_deleted(self, event):
+    def _handle_deleted(self, _path, is_directory, received):
         try:
-            _path = event.src_path
-            if event.is_directory:
-                is_file = False
-            else:
-                is_file = True
-            dir_path = str(self._get_directory_path(_path))
-            file_path = str(_path)
-            original_hash = self.database_instance.get_current_baseline(dir_path).get(file_path, {}).get('hash', '')
-            self.parent.file_folder_deletion(_path, original_hash, is_file, self.logger, self.database_instance)
+            baseline = self.parent.manager.baseline_entry(self.directory_path, _path) or {}
+            self.parent.file_folder_deletion(
+                _path, baseline.get('hash', ''), not is_directory, self.logger, self.directory_path,
+                baseline.get('last_modified'), timings=self._timings(received)
+            )
         except Exception as e:
-            self.logger.error(f"Deletion error: {str(e)}")
+            self.logger.error(f"Deletion error: {str(e)}", extra={"event": "error", "path": _path})
 
 
 class monitor_changes:
     def __init__(self):
-        self.logs_dir = Path(__file__).resolve().parent.parent / "../logs"
+        self.logs_dir = Path(LOGS_DIR)
         self.logs_dir.mkdir(exist_ok=True, parents=True)
 
         # Persistent state
@@ -86,132 +115,275 @@ class monitor_changes:
             "modified": {},
             "deleted": {},
         }
-        self.current_directories = []
-        self.event_handlers = []
+        self._changes_lock = threading.Lock()
+        # Hashes a restore is renaming into place, by path, until its baseline rows commit
+        self.expected_hashes = {}
         self.current_logger = None
+        # Per-directory timing of the last start-up (reconcile or baseline)
+        self.startup_metrics = {}
 
         # Core Components
-        self.observer = Observer()
         self.backup_instance = Backup()
         self.fim_instance = FIM_monitor()
         self.configure_logger = configure_logger()
-
-    def file_folder_addition(self, _path, current_hash, is_file, logger, database_instance):
+        self.manager = MonitorManager(self)
+        self.version_store = VersionStore(self.backup_instance) if VERSIONING_ENABLED else None
+
+    @property
+    def current_directories(self):
+        return self.manager.roots()
+
+    def _directory_for(self, path):
+        """Monitored root that contains path."""
+        path = str(path)
+        for dir_path in self.current_directories:
+            if path == dir_path or path.startswith(os.path.join(dir_path, "")):
+                return dir_path
+        return os.path.dirname(path)
+
+    def _report(self, status, _path, current_hash, is_file, directory, last_modified):
+        """Publish a change to live subscribers and queue it for the DB writer."""
+        item_type = "file" if is_file else "folder"
+        change_event_bus.publish(status, str(_path), directory, item_type, current_hash)
+        self.manager.db_writer.submit(directory, str(_path), current_hash, item_type, last_modified, status)
+        if is_file and status in ("added", "modified") and self.version_store is not None:
+            copy_engine.submit(self.version_store.capture, directory, str(_path))
+        elif status == "deleted" and self.version_store is not None:
+            copy_engine.submit(self.version_store.record_deletion, directory, str(_path))
+
+    @staticmethod
+    def _event_fields(status, _path, digest, is_file, directory, timings=None):
+        """Structured fields of a change alert (JSON log lines)."""
+        return {"event": status, "path": str(_path), "digest": digest,
+                "item_type": "file" if is_file else "folder", "directory": directory, **(timings or {})}
+
+    def file_folder_addition(self, _path, current_hash, is_file, logger, directory, timings=None):
         change_type = "File" if is_file else "Folder"
-        if _path not in self.reported_changes["added"]:
-            logger.warning(f"{change_type} is added: {_path}")
+        with self._changes_lock:
+            if _path in self.reported_changes["added"] or self.expected_hashes.get(_path) == current_hash:
+                return
+            last_modified = self.fim_instance.get_formatted_time(os.path.getmtime(_path))
             self.reported_changes["added"][_path] = {
                 "hash": current_hash,
-                "last_modified": self.fim_instance.get_formatted_time(os.path.getmtime(_path))
+                "type": "file" if is_file else "folder",
+                "last_modified": last_modified
             }
+        logger.warning(f"{change_type} is added: {_path}",
+                       extra=self._event_fields("added", _path, current_hash, is_file, directory, timings))
+        self._report("added", _path, current_hash, is_file, directory, last_modified)
 
-    def file_folder_modification(self, _path, current_hash, original_hash, is_file, logger, database_instance):
+    def file_folder_modification(self, _path, current_hash, original_hash, is_file, logger, directory, timings=None,
+                                 flagged=False):
+        """`flagged`: the stored row is flagged, so a return to original_hash clears it."""
         change_type = "File" if is_file else "Folder"
 
-        if current_hash != original_hash:
-            if _path not in self.reported_changes["modified"]:
-                logger.error(f"{change_type} modified: {_path}")
+        with self._changes_lock:
+            back_to_baseline = current_hash == original_hash
+            unchanged = back_to_baseline or self.expected_hashes.get(_path) == current_hash
+            if unchanged:
+                cleared = self.reported_changes["modified"].pop(_path, None) is not None or flagged
+                previous = None
+            else:
+                cleared = False
+                previous = self.reported_changes["modified"].get(_path)
+                if previous is not None and previous.get("hash", original_hash) == current_hash:
+                    return
+                last_modified = self.fim_instance.get_formatted_time(os.path.getmtime(_path))
                 self.reported_changes["modified"][_path] = {
                     "hash": current_hash,
-                    "last_modified": self.fim_instance.get_formatted_time(os.path.getmtime(_path))
+                    "type": "file" if is_file else "folder",
+                    "last_modified": last_modified
                 }
-            else:
-                previous_hash = self.reported_changes["modified"][_path].get("hash", original_hash)
-                if current_hash != previous_hash:
-                    print(f"logger: {logger}\n")
-                    logger.error(f"{change_type} modified again: {_path}")
-                    self.reported_changes["modified"][_path] = {
-                        "hash": current_hash,
-                        "last_modified": self.fim_instance.get_formatted_time(os.path.getmtime(_path))
-                    }
+        if unchanged:
+            if back_to_baseline and cleared:
+                self.file_folder_cleared(_path, current_hash, is_file, logger, directory, timings)
+            return
+
+        fields = self._event_fields("modified", _path, current_hash, is_file, directory, timings)
+        fields["baseline_digest"] = original_hash
+        if previous is None:
+            logger.error(f"{change_type} modified: {_path}", extra=fields)
         else:
-            if _path in self.reported_changes["modified"]:
-                del self.reported_changes["modified"][_path]
+            logger.error(f"{change_type} modified again: {_path}", extra=fields)
+        self._report("modified", _path, current_hash, is_file, directory, last_modified)
 
-    def file_folder_deletion(self, _path, original_hash, is_file, logger, database_instance):
+    def file_folder_deletion(self, _path, original_hash, is_file, logger, directory, last_modified=None, timings=None):
         change_type = "File" if is_file else "Folder"
 
-        if _path not in self.reported_changes["deleted"]:
-            last_modified = database_instance.get_current_baseline(_path).get('last_modified', datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-            logger.warning(f"{change_type} deleted: {_path}")
+        with self._changes_lock:
+            if _path in self.reported_changes["deleted"]:
+                return
+            last_modified = last_modified or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             self.reported_changes["deleted"][_path] = {
                 "hash": original_hash,
+                "type": "file" if is_file else "folder",
                 "last_modified": last_modified
             }
+        logger.warning(f"{change_type} deleted: {_path}",
+                       extra=self._event_fields("deleted", _path, original_hash, is_file, directory, timings))
+        self._report("deleted", _path, original_hash, is_file, directory, last_modified)
 
-    def monitor_changes(self, auth_username, directories, excluded_files, db_session):
-        """Monitor specified directories for changes using Watchdog."""
+    def file_folder_cleared(self, _path, current_hash, is_file, logger, directory, timings=None):
+        """A flagged path is back to its baseline content: drop its alerts and mark the row current again."""
+        change_type = "File" if is_file else "Folder"
+        with self._changes_lock:
+            for changes in self.reported_changes.values():
+                changes.pop(_path, None)
+        last_modified = self.fim_instance.get_formatted_time(os.path.getmtime(_path))
+        logger.info(f"{change_type} back to baseline: {_path}",
+                    extra=self._event_fields("current", _path, current_hash, is_file, directory, timings))
+        self.manager.db_writer.submit(directory, str(_path), current_hash, "file" if is_file else "folder",
+                                      last_modified, "current")
+
+    def reconcile_directory(self, auth_username, directory, known_state, job=None):
+        """
+        Diff the disk against the last recorded state of directory and report
+        what changed while the monitor was down as regular change events.
+        Only files whose mtime moved (and new files) are re-hashed.
+        Returns the number of offline changes found.
+        """
+        logger = self.configure_logger._get_or_create_logger(auth_username, directory)
+        if job:
+            job.set_message(f"Reconciling {directory}")
+            job.set_total(files=sum(1 for entry in known_state.values() if entry.get("type") == "file"))
+
+        changes = 0
+        reported = set()
+        for entry in verify.verify_directory(directory, known_state, job=job, fim_instance=self.fim_instance):
+            _path, is_file = entry["path"], entry["type"] == "file"
+            reported.add(_path)
+            if entry["status"] == "added":
+                self.file_folder_addition(_path, entry["current_hash"], is_file, logger, directory)
+            elif entry["status"] == "modified":
+                self.file_folder_modification(_path, entry["current_hash"], entry["baseline_hash"], is_file, logger, directory)
+            else:
+                self.file_folder_deletion(
+                    _path, entry["baseline_hash"], is_file, logger, directory,
+                    known_state[_path].get("last_modified")
+                )
+            changes += 1
+
+        # Flagged files were all hashed; those not reported are back to their baseline
+        for _path, known in known_state.items():
+            if (known.get("flagged") and known["hash"] is not None and known["type"] == "file"
+                    and _path not in reported and os.path.isfile(_path)):
+                self.file_folder_cleared(_path, known["hash"], True, logger, directory)
+        return changes
+
+    def expect_restored(self, hashes):
+        """
+        Register the hashes a restore is about to rename into place, so
+        their events raise no alerts until the baseline rows are written
+        (acknowledge_restored drops them; events handled later compare
+        against the new baseline). A None hash withdraws one (the rename failed).
+        """
+        with self._changes_lock:
+            for path, expected in hashes.items():
+                if expected is None:
+                    self.expected_hashes.pop(path, None)
+                else:
+                    self.expected_hashes[path] = expected
+
+    def acknowledge_restored(self, paths):
+        """Forget reported changes and restore expectations for restored paths so new tampering alerts again."""
+        with self._changes_lock:
+            for changes in self.reported_changes.values():
+                for path in paths:
+                    changes.pop(path, None)
+            for path in paths:
+                self.expected_hashes.pop(path, None)
+
+    def prepare_directory(self, auth_username, directory, db_session, job=None):
+        """
+        Get one directory ready to watch. The first time it is backed up and
+        baselined; after that the existing baseline is reconciled with the
+        disk instead, so offline changes are reported rather than absorbed
+        into a new baseline (and the backup is not overwritten with them).
+        """
+        if not os.path.exists(directory):
+            raise FileNotFoundError(f"Directory {directory} does not exist")
+
+        started = time.perf_counter()
+        known_state = DatabaseOperation(db_session).get_known_state(directory)
+
+        if known_state:
+            mode = "reconciled"
+            changes = self.reconcile_directory(auth_username, directory, known_state, job=job)
+        else:
+            mode = "baselined"
+            changes = 0
+            try:
+                self.backup_instance.create_backup(directory, auth_username)
+            except Exception as e:
+                print(f"Failed to create backup for {directory}")
+                return False
+
+            # tracking_directory writes the baseline in batches
+            self.fim_instance.tracking_directory(auth_username, directory, db_session, job=job)
+
+        elapsed = time.perf_counter() - started
+        self.startup_metrics[directory] = {
+            "mode": mode,
+            "seconds": round(elapsed, 3),
+            "known_entries": len(known_state),
+            "offline_changes": changes,
+        }
+        logger = self.configure_logger._get_or_create_logger(auth_username, directory)
+        logger.info(f"Startup {mode} {directory} in {elapsed:.2f}s ({changes} offline changes)",
+                    extra={"event": "startup", "mode": mode, "directory": directory,
+                           "duration_ms": round(elapsed * 1000, 3), "offline_changes": changes})
+        return True
+
+    def start_monitoring(self, auth_username, directories, excluded_files, db_session=None, job=None):
+        """
+        Reconcile (or, the first time, back up and baseline) the directories,
+        then add each one as a root of the shared monitor manager. Roots that
+        are already watched are left alone, so other directories are never
+        rescanned. Returns once watching has started. With a `job`, the scan
+        reports progress and can be cancelled.
+        """
+        owns_session = db_session is None
+        if owns_session:
+            db_session = FimSessionLocal()
         try:
-            self.current_directories = directories
-            database_instance = DatabaseOperation(db_session) if db_session else None
-
-            for directory in self.current_directories:
-                if not os.path.exists(directory):
-                    raise FileNotFoundError(f"Directory {directory} does not exist")
-                try:
-                    self.backup_instance.create_backup(directory, auth_username)
-                except Exception as e:
-                    print(f"Failed to create backup for {directory}")
-                    continue
-
-                baseline = self.fim_instance.tracking_directory(auth_username, directory, db_session)
-                if database_instance:
-                    for path, data in baseline.items():
-                        database_instance.record_file_event(
-                            directory_path=directory,
-                            item_path=path,
-                            item_hash=data['hash'],
-                            item_type=data['type'],
-                            last_modified=data['last_modified'],
-                            status='current'
-                        )
-
-            for directory in self.current_directories:
-                if directory in excluded_files:
+            for directory in directories:
+                if self.manager.is_watching(directory) or directory in excluded_files:
                     continue
-
-                logger = self.configure_logger._get_or_create_logger(auth_username, directory)
-                logger.info(f"Starting monitoring for {directory}")
-
-                event_handler = FIMEventHandler(self, logger, db_session)
-                event_handler.directory_path = directory
-                self.observer.schedule(event_handler, directory, recursive=True)
-                self.event_handlers.append(event_handler)
-
-            self.observer.start()
+                if self.prepare_directory(auth_username, directory, db_session, job=job):
+                    self.manager.add_root(directory, auth_username)
+        finally:
+            if owns_session:
+                db_session.close()
+
+    def stop_monitoring(self, directories=None):
+        """Stop watching the given roots (all roots when None). Returns the roots stopped."""
+        if directories is None:
+            stopped = self.manager.roots()
+            self.manager.stop_all()
+            return stopped
+        return [directory for directory in directories if self.manager.remove_root(directory)]
+
+    def monitor_changes(self, auth_username, directories, excluded_files, db_session=None):
+        """Monitor specified directories for changes using Watchdog (blocks until Ctrl+C)."""
+        try:
+            self.start_monitoring(auth_username, directories, excluded_files, db_session)
             try:
                 while True:
                     time.sleep(1)  # Main thread sleep
             except KeyboardInterrupt:
                 print("\nShutdown down...")
-                self.observer.stop()
-                self.observer.join()
+                # Drains the hashing pool and flushes pending change records
+                self.manager.shutdown()
                 self.configure_logger.shutdown()
-                self._save_reported_changes(db_session)
                 print("Shutdown complete.")
         except Exception as e:
             if self.current_logger:
                 self.current_logger.error(f"Monitoring error: {e}")
             else:
-                self.observer.stop()
-                self.observer.join()  # Ensure observer is stopped even on error
+                self.manager.shutdown()  # Ensure observer is stopped even on error
                 self.configure_logger.shutdown()
                 print("Shutdown complete.")
 
-    def _save_reported_changes(self, db_session):
-        database_instance = DatabaseOperation(db_session)
-        for change_type, changes in self.reported_changes.items():
-            for path, data in changes.items():
-                directory = os.path.dirname(path)
-                database_instance.record_file_event(
-                    directory_path=directory,
-                    item_path=path,
-                    item_hash=data['hash'],
-                    item_type=data['type'],
-                    last_modified=data['last_modified'],
-                    status=change_type
-                )
-
     def view_baseline(self, db_session=None):
         """View ALL baselines with datetime serialization support"""
         try:
@@ -241,7 +413,7 @@ class monitor_changes:
         except Exception as e:
             print(f"Error viewing baseline: {str(e)}")
 
-    def reset_baseline(self, auth_username: str, directories: list[str], db_session=None):
+    def reset_baseline(self, auth_username: str, directories: list[str], db_session=None, job=None):
         """Safely reset baseline for specified directories using SQLAlchemy ORM."""
         if not db_session:
             print("No database session provide.")
@@ -256,15 +428,17 @@ class monitor_changes:
                     continue
 
                 database_instance.delete_directory_records(directory)
-                self.fim_instance.tracking_directory(auth_username, directory, db_session)
+                self.fim_instance.tracking_directory(auth_username, directory, db_session, job=job)
 
                 print(f"✅ Reset baseline for {directory}")
 
+            except JobCancelled:
+                raise
             except Exception as e:
                 print(f"❌ Failed resetting baseline for {directory}: {str(e)}")
 
-    def view_logs(self, directory=None):
-        """View logs safely with path validation"""
+    def view_logs(self, directory=None, lines=50):
+        """Print the last `lines` records of a directory's log (or of every log)"""
         try:
             if directory:
                 norm_dir = Path(directory).resolve()
@@ -272,16 +446,17 @@ class monitor_changes:
                     print(f"Directory {directory} does not exist")
                     return
 
-                log_file = self.logs_dir / f"FIM_{norm_dir.name}.log"
-                if log_file.exists():
-                    with open(log_file, 'r', encoding='utf-8') as f:
-                        print(f.read())
-                else:
+                log_files = [Path(log_path_for(str(norm_dir)))]
+                if not log_reader.segments(str(log_files[0])):
                     print(f"No logs for {directory}")
+                    return
             else:
-                for log_path in self.logs_dir.glob("FIM_*.log"):
+                log_files = sorted(self.logs_dir.glob("FIM_*.log"))
+
+            for log_path in log_files:
+                if not directory:
                     print(f"\n=== Logs for {log_path.stem} ===")
-                    with open(log_path, 'r', encoding='utf-8') as f:
-                        print(f.read())  # Show first 4KB per file [read(4096)]
+                for record in log_reader.tail(str(log_path), lines):
+                    print(log_reader.format_record(record))
         except Exception as e:
             print(f"Log viewing error: {str(e)}")
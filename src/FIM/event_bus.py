@@ -0,0 +1,170 @@
+"""
+event_bus.py
+-------------
+In-process fan-out of monitor change events to live subscribers (the SSE
+stream in the API).
+
+The watchdog thread publishes each event once. Every subscriber owns a
+bounded buffer and its own filters, so a slow client can only lose its own
+events: when its buffer is full it is either trimmed (drop-oldest) or
+flagged for a resync, and it must re-read /api/fim/changes. A short history
+ring lets reconnecting clients resume from the last sequence number they saw.
+
+Sequence numbers start from the process start time in milliseconds, so ids
+from an earlier server process are always behind this one's history and a
+client reconnecting across a restart is told to resync instead of missing
+events. `detected_at` is UTC, like the rows behind /api/fim/changes.
+"""
+
+import asyncio
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+
+DROP_OLDEST = "drop_oldest"
+RESYNC = "resync"
+
+
+class Subscription:
+    def __init__(self, directories: Optional[Iterable[str]], statuses: Optional[Iterable[str]],
+                 maxsize: int, policy: str, loop: asyncio.AbstractEventLoop):
+        self.directories = tuple(directories or ())
+        self.statuses = frozenset(statuses or ())
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self.needs_resync = False
+        self._buffer: deque = deque()
+        self._lock = threading.Lock()
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._notified = False
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        if self.statuses and event["status"] not in self.statuses:
+            return False
+        if self.directories and not any(
+            event["directory"] == d or event["path"].startswith(os.path.join(d, "")) for d in self.directories
+        ):
+            return False
+        return True
+
+    def offer(self, event: Dict[str, Any]):
+        """Called from the producer thread; never blocks on the consumer."""
+        if not self.matches(event):
+            return
+        with self._lock:
+            if len(self._buffer) >= self.maxsize:
+                if self.policy == RESYNC:
+                    self.dropped += len(self._buffer) + 1
+                    self._buffer.clear()
+                    self.needs_resync = True
+                else:
+                    self._buffer.popleft()
+                    self._buffer.append(event)
+                    self.dropped += 1
+            elif not self.needs_resync:
+                self._buffer.append(event)
+            else:
+                self.dropped += 1
+            if self._notified:
+                return
+            self._notified = True
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            pass  # Consumer's event loop already closed
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait until events are buffered; False on timeout."""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def drain(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            events = list(self._buffer)
+            self._buffer.clear()
+            self._notified = False
+            self._wakeup.clear()
+            return events
+
+    def take_resync(self) -> Optional[int]:
+        """Return (and reset) the dropped count if this subscriber must resync."""
+        with self._lock:
+            if not self.needs_resync:
+                return None
+            dropped, self.dropped, self.needs_resync = self.dropped, 0, False
+            self._buffer.clear()
+            return dropped
+
+
+class ChangeEventBus:
+    def __init__(self, history_size: int = 10000):
+        self._history: deque = deque(maxlen=history_size)
+        self._subscribers: set = set()
+        self._lock = threading.Lock()
+        # Per-process epoch: ids never repeat across restarts
+        self.last_seq = int(time.time() * 1000)
+        self._seq = itertools.count(self.last_seq + 1)
+
+    def publish(self, status: str, path: str, directory: str, item_type: str,
+                item_hash: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            seq = next(self._seq)
+            event = {
+                "seq": seq,
+                "status": status,
+                "path": str(path),
+                "directory": str(directory),
+                "type": item_type,
+                "hash": item_hash,
+                "detected_at": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()),
+            }
+            self._history.append(event)
+            self.last_seq = seq
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            subscriber.offer(event)
+        return event
+
+    def subscribe(self, directories=None, statuses=None, last_seq: Optional[int] = None,
+                  maxsize: int = 1000, policy: str = DROP_OLDEST) -> Subscription:
+        """
+        Register a subscriber on the running event loop. With `last_seq`,
+        buffered history after it is replayed; if that history has already
+        been evicted, or last_seq is ahead of this bus (it came from another
+        process), the subscriber starts in resync state.
+        """
+        subscription = Subscription(directories, statuses, maxsize, policy, asyncio.get_running_loop())
+        with self._lock:
+            if last_seq is not None and last_seq > self.last_seq:
+                subscription.needs_resync = True
+            elif last_seq is not None and last_seq < self.last_seq:
+                oldest = self._history[0]["seq"] if self._history else self.last_seq + 1
+                if last_seq + 1 < oldest:
+                    subscription.needs_resync = True
+                else:
+                    for event in self._history:
+                        if event["seq"] > last_seq:
+                            subscription.offer(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+change_event_bus = ChangeEventBus()
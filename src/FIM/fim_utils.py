@@ -6,10 +6,13 @@ from typing import Dict, Any, Optional
 from sqlalchemy.orm import Session
 
 from src.utils.database import DatabaseOperation
+from src.utils.io_budget import io_budget
 from src.config.logging_config import configure_logger
 
 
 class FIM_monitor:
+    DB_BATCH_SIZE = 500
+
     def __init__(self, db_session: Optional[Session] = None):
         self.current_entries: Dict[str, Dict[str, Any]] = {}
         self.configure_logger = configure_logger()
@@ -19,17 +22,39 @@ class FIM_monitor:
         """Convert a timestamp to a readable format."""
         return time.strftime(r"%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
 
-    def tracking_directory(self, auth_user, directory: str, db_session: Optional[Session] = None) -> Dict[str, Dict[str, Any]]:
+    def measure_tree(self, directory: str):
+        """Count files and bytes under directory (stat only, no reads)."""
+        files_total = bytes_total = 0
+        for root, _, files in os.walk(directory):
+            for file in files:
+                try:
+                    bytes_total += os.path.getsize(os.path.join(root, file))
+                    files_total += 1
+                except OSError:
+                    continue
+        return files_total, bytes_total
+
+    def tracking_directory(self, auth_user, directory: str, db_session: Optional[Session] = None, job=None) -> Dict[str, Dict[str, Any]]:
         """
         Track the monitored directory and store baseline in the database.
         Returns a dictionary of file/folder metadata.
+        With a `job` (src.utils.jobs.Job), progress is reported per file and
+        cancellation is honoured between files.
         """
         self.current_entries = {}
         self.logger = self.configure_logger._get_or_create_logger(auth_user, directory)
 
         database_instance = DatabaseOperation(db_session) if db_session else None
+        pending: Dict[str, Dict[str, Any]] = {}
+
+        if job:
+            job.set_message(f"Scanning {directory}")
+            job.set_total(*self.measure_tree(directory))
 
         for root, dirs, files in os.walk(directory):
+            if job:
+                job.check_cancelled()
+
             # ---------------- Handle Folders ----------------
             for folder in dirs:
                 folder_path = os.path.join(root, folder)
@@ -57,21 +82,7 @@ class FIM_monitor:
                     "last_modified": last_modified,
                 }
 
-                if database_instance:
-                    try:
-                        database_instance.record_file_event(
-                            directory_path=directory,
-                            item_path=folder_path,
-                            item_hash=folder_hash,
-                            item_type='folder',
-                            last_modified=last_modified,
-                            status='current'
-                        )
-                    except Exception as e:
-                        if self.logger:
-                            self.logger.error(f"DB insert failed for folder {folder_path}: {e}")
-                        else:
-                            print(f"DB insert failed for folder {folder_path}: {e}")
+                pending[folder_path] = self.current_entries[folder_path]
 
             # ---------------- Handle Files ----------------
             for file in files:
@@ -100,26 +111,30 @@ class FIM_monitor:
                     "size": os.path.getsize(file_path) if os.path.exists(file_path) else 0,
                     "last_modified": last_modified,
                 }
+                if job:
+                    job.advance(files=1, bytes_=self.current_entries[file_path]["size"])
+                    job.check_cancelled()
 
-                if database_instance:
-                    try:
-                        database_instance.record_file_event(
-                            directory_path=directory,
-                            item_path=file_path,
-                            item_hash=file_hash,
-                            item_type='file',
-                            last_modified=last_modified,
-                            status='current'
-                        )
-                    except Exception as e:
-                        if self.logger:
-                            self.logger.error(f"DB insert failed for file {file_path}: {e}")
-                        else:
-                            print(f"DB insert failed for file {file_path}: {e}")
-                        print(f"DB insert failed for file {file_path}: {e}")
+                pending[file_path] = self.current_entries[file_path]
 
+            if len(pending) >= self.DB_BATCH_SIZE:
+                self._flush_baseline(database_instance, directory, pending)
+
+        self._flush_baseline(database_instance, directory, pending)
         return self.current_entries
 
+    def _flush_baseline(self, database_instance: Optional[DatabaseOperation], directory: str, pending: Dict[str, Dict[str, Any]]):
+        """Write the pending baseline entries in one batch and clear them."""
+        if database_instance and pending:
+            try:
+                database_instance.record_file_events(directory, pending, status='current')
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"DB insert failed for {len(pending)} items in {directory}: {e}")
+                else:
+                    print(f"DB insert failed for {len(pending)} items in {directory}: {e}")
+        pending.clear()
+
     # ---------------- Hash Functions ----------------
 
     def calculate_hash(self, file_path: str) -> Optional[str]:
@@ -128,6 +143,7 @@ class FIM_monitor:
         try:
             with open(file_path, "rb") as f:
                 while chunk := f.read(4096):
+                    io_budget.consume(len(chunk))
                     sha256.update(chunk)
             sha256.update(os.path.basename(file_path).encode())
             return sha256.hexdigest()
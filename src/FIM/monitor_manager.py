@@ -0,0 +1,206 @@
+"""
+monitor_manager.py
+-------------------
+Long-lived owner of the watchdog Observer for every monitored root.
+
+Roots can be scheduled and unscheduled individually at runtime without
+touching the others. All roots share one hashing pool and one DB writer:
+
+- HashingPool: N single-thread lanes. Events are routed to a lane by path,
+  so events for one path stay in order while different paths hash in
+  parallel off the watchdog thread.
+- DatabaseWriter: one thread that batches change events into
+  DatabaseOperation.record_file_events.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from watchdog.observers import Observer
+
+from src.api.database.connection import FimSessionLocal
+from src.utils.database import DatabaseOperation
+
+
+class HashingPool:
+    def __init__(self, workers: int):
+        self._lanes = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"fim-hash-{i}") for i in range(max(1, workers))
+        ]
+
+    def submit(self, key: str, fn, *args):
+        lane = self._lanes[hash(key) % len(self._lanes)]
+        return lane.submit(fn, *args)
+
+    def shutdown(self, wait: bool = True):
+        for lane in self._lanes:
+            lane.shutdown(wait=wait)
+
+
+class DatabaseWriter:
+    """Single writer thread that records change events in batches."""
+
+    _STOP = object()
+
+    def __init__(self, session_factory=FimSessionLocal, batch_size: int = 500, flush_interval: float = 0.5):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="fim-db-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, directory: str, item_path: str, item_hash: str, item_type: str, last_modified, status: str):
+        self._ensure_started()
+        self._queue.put((directory, item_path, {
+            "hash": item_hash or "",
+            "type": item_type,
+            "last_modified": last_modified,
+        }, status))
+
+    def _run(self):
+        database_instance = DatabaseOperation(self.session_factory())
+        pending: Dict[Tuple[str, str], Tuple[dict, str]] = {}
+        deadline = time.monotonic() + self.flush_interval
+
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is self._STOP:
+                self._flush(database_instance, pending)
+                return
+            if item is not None:
+                directory, item_path, data, status = item
+                # The latest event for a path wins within a batch (one row per path)
+                pending.pop((directory, item_path), None)
+                pending[(directory, item_path)] = (data, status)
+
+            if len(pending) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(database_instance, pending)
+                deadline = time.monotonic() + self.flush_interval
+
+    def _flush(self, database_instance: DatabaseOperation, pending: Dict):
+        if not pending:
+            return
+        groups: Dict[Tuple[str, str], Dict[str, dict]] = {}
+        for (directory, item_path), (data, status) in pending.items():
+            groups.setdefault((directory, status), {})[item_path] = data
+        pending.clear()
+
+        for (directory, status), entries in groups.items():
+            try:
+                database_instance.record_file_events(directory, entries, status)
+            except Exception as e:
+                print(f"Failed to record {len(entries)} '{status}' events for {directory}: {e}")
+
+    def stop(self):
+        with self._lock:
+            thread = self._thread
+        if thread and thread.is_alive():
+            self._queue.put(self._STOP)
+            thread.join()
+
+
+class MonitorManager:
+    def __init__(self, monitor, hash_workers: Optional[int] = None):
+        self.monitor = monitor
+        workers = hash_workers or int(os.getenv("FIM_HASH_WORKERS", str(min(8, os.cpu_count() or 1))))
+        self.hash_pool = HashingPool(workers)
+        self.db_writer = DatabaseWriter()
+        self._observer: Optional[Observer] = None
+        self._watches: Dict[str, tuple] = {}
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    # ---------------- Roots ----------------
+
+    def _ensure_observer(self):
+        if self._observer is None or not self._observer.is_alive():
+            self._observer = Observer()
+            self._observer.start()
+
+    def add_root(self, root: str, auth_username: str) -> bool:
+        """Schedule a watch for root. Returns False if it is already watched."""
+        from src.FIM.FIM import FIMEventHandler
+
+        root = os.path.normpath(root)
+        with self._lock:
+            if root in self._watches:
+                return False
+            logger = self.monitor.configure_logger._get_or_create_logger(auth_username, root)
+            handler = FIMEventHandler(self.monitor, logger, root)
+            self._ensure_observer()
+            watch = self._observer.schedule(handler, root, recursive=True)  # type: ignore[union-attr]
+            self._watches[root] = (watch, handler)
+            logger.info(f"Starting monitoring for {root}")
+            return True
+
+    def remove_root(self, root: str) -> bool:
+        """Unschedule root's watch, leaving every other root running."""
+        root = os.path.normpath(root)
+        with self._lock:
+            entry = self._watches.pop(root, None)
+            if entry is None:
+                return False
+            watch, handler = entry
+            if self._observer is not None:
+                self._observer.unschedule(watch)
+            handler.logger.info(f"Stopped monitoring for {root}")
+            return True
+
+    def roots(self) -> List[str]:
+        with self._lock:
+            return list(self._watches)
+
+    def is_watching(self, root: str) -> bool:
+        with self._lock:
+            return os.path.normpath(root) in self._watches
+
+    @property
+    def is_running(self) -> bool:
+        with self._lock:
+            return bool(self._watches) and self._observer is not None and self._observer.is_alive()
+
+    def stop_all(self):
+        """Unschedule every root and stop the observer thread."""
+        with self._lock:
+            self._watches.clear()
+            observer, self._observer = self._observer, None
+        if observer is not None and observer.is_alive():
+            observer.unschedule_all()
+            observer.stop()
+            observer.join()
+
+    def shutdown(self):
+        """stop_all, then drain pending hashing work and DB writes."""
+        self.stop_all()
+        self.hash_pool.shutdown(wait=True)
+        self.db_writer.stop()
+
+    # ---------------- Shared services for event handlers ----------------
+
+    def baseline_entry(self, directory: str, item_path: str) -> Optional[dict]:
+        """Trusted baseline of one path (also while flagged), via a per-lane DB session."""
+        database_instance = getattr(self._local, "database_instance", None)
+        if database_instance is None:
+            database_instance = DatabaseOperation(FimSessionLocal())
+            self._local.database_instance = database_instance
+        try:
+            return database_instance.get_baseline_entry(directory, item_path)
+        finally:
+            # End the read transaction so the next lookup sees new commits
+            database_instance.db.rollback()
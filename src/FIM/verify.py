@@ -0,0 +1,266 @@
+"""
+verify.py
+----------
+On-demand verification of the current disk state against the stored
+baseline, without restarting monitoring (which would re-baseline and
+silently accept offline tampering).
+
+Files are compared with a stat fast path first: a file whose mtime still
+matches its baseline `last_modified` is taken as unchanged unless
+`rehash=True`. Suspects and new files are hashed in parallel. Folders are
+compared by existence only; changes inside them surface as file entries.
+
+The baseline is every recorded path that is not deleted. Rows the monitor
+already flagged (added/modified) are compared against their baseline hash,
+not the observed one (for rows flagged before baseline hashes were kept:
+the newest backup snapshot entry whose content is not the flagged one).
+Flagged files always get hashed and report as changed until they match it
+again.
+
+Diff entries are dicts:
+    {"status", "path", "directory", "type", "baseline_hash", "current_hash"}
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from src.FIM.fim_utils import FIM_monitor
+from src.utils.backup import Backup
+from src.utils.database import DatabaseOperation
+
+VERIFY_WORKERS = int(os.getenv("FIM_VERIFY_WORKERS", str(min(8, os.cpu_count() or 1))))
+REPORT_HISTORY = 50
+
+
+def _stat_time(path: str) -> Optional[datetime]:
+    """mtime truncated to seconds, matching how the baseline stores it."""
+    try:
+        return datetime.fromtimestamp(int(os.stat(path).st_mtime))
+    except OSError:
+        return None
+
+
+def _in_scope(path: str, scope: Optional[List[str]]) -> bool:
+    if scope is None:
+        return True
+    return any(path == target or path.startswith(os.path.join(target, "")) for target in scope)
+
+
+def _walk_scope(directory: str, scope: Optional[List[str]]) -> Iterator[tuple]:
+    """Yield (path, is_file) for everything on disk under directory (or just the scoped paths)."""
+    for target in scope or [directory]:
+        if os.path.isfile(target):
+            yield target, True
+            continue
+        if target != directory and os.path.isdir(target):
+            yield target, False
+        for root, dirs, files in os.walk(target):
+            for folder in dirs:
+                yield os.path.join(root, folder), False
+            for file in files:
+                yield os.path.join(root, file), True
+
+
+def resolve_targets(targets: Iterable[str], monitored: Iterable[str]) -> Dict[str, Optional[List[str]]]:
+    """
+    Group requested paths by their monitored root. A monitored root maps to
+    None (verify all of it); paths inside a root map to that list of paths.
+    Raises ValueError for a path outside every monitored root.
+    """
+    roots = sorted((os.path.normpath(d) for d in monitored), key=len, reverse=True)
+    grouped: Dict[str, Optional[List[str]]] = {}
+    for target in targets:
+        target = os.path.normpath(target)
+        root = next((r for r in roots if target == r or target.startswith(os.path.join(r, ""))), None)
+        if root is None:
+            raise ValueError(f"Path is not under a monitored directory: {target}")
+        if target == root:
+            grouped[root] = None
+        elif grouped.get(root, []) is not None:
+            grouped.setdefault(root, []).append(target)  # type: ignore[union-attr]
+    return grouped
+
+
+def verify_directory(directory: str, baseline: Dict[str, dict], scope: Optional[List[str]] = None,
+                     rehash: bool = False, job=None, workers: int = VERIFY_WORKERS,
+                     fim_instance: Optional[FIM_monitor] = None) -> Iterator[dict]:
+    """Yield diff entries for directory (limited to `scope` paths if given) against baseline."""
+    fim_instance = fim_instance or FIM_monitor()
+    seen = set()
+    window: deque = deque()
+
+    def _entry(status, path, item_type, baseline_hash, current_hash):
+        return {
+            "status": status,
+            "path": path,
+            "directory": directory,
+            "type": item_type,
+            "baseline_hash": baseline_hash,
+            "current_hash": current_hash,
+        }
+
+    def _resolve(item):
+        path, future, known = item
+        current_hash = future.result()
+        if job:
+            job.advance(files=1, bytes_=os.path.getsize(path) if os.path.exists(path) else 0)
+        if known is None or (known["hash"] is None and known.get("status") == "added"):
+            return _entry("added", path, "file", None, current_hash)
+        if current_hash != known["hash"]:
+            return _entry("modified", path, "file", known["hash"], current_hash)
+        return None
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="fim-verify") as pool:
+        for path, is_file in _walk_scope(directory, scope):
+            if job:
+                job.check_cancelled()
+            seen.add(path)
+            known = baseline.get(path)
+
+            if not is_file:
+                if known is None:
+                    yield _entry("added", path, "folder", None, None)
+                continue
+
+            if (known is not None and not known.get("flagged") and not rehash
+                    and _stat_time(path) == known["last_modified"]):
+                if job:
+                    job.advance(files=1)
+                continue
+
+            window.append((path, pool.submit(fim_instance.calculate_hash, path), known))
+            # Bound in-flight hashes so huge trees don't queue every file at once
+            while len(window) > workers * 4:
+                entry = _resolve(window.popleft())
+                if entry:
+                    yield entry
+
+        while window:
+            entry = _resolve(window.popleft())
+            if entry:
+                yield entry
+
+    for path, known in baseline.items():
+        if path not in seen and _in_scope(path, scope) and (known["hash"] is not None or known.get("status") != "added"):
+            yield _entry("deleted", path, known.get("type", "file"), known["hash"], None)
+
+
+class VerifyReport:
+    """Diff entries of one verify run; readers can follow it while it is produced."""
+
+    def __init__(self):
+        self.entries: List[dict] = []
+        self.counts = {"added": 0, "modified": 0, "deleted": 0}
+        self.done = False
+        self._cond = threading.Condition()
+
+    def add(self, entry: dict):
+        with self._cond:
+            self.entries.append(entry)
+            self.counts[entry["status"]] += 1
+            self._cond.notify_all()
+
+    def finish(self):
+        with self._cond:
+            self.done = True
+            self._cond.notify_all()
+
+    def follow(self, poll: float = 1.0, is_finished: Optional[Callable[[], bool]] = None) -> Iterator[dict]:
+        """
+        Yield every entry, blocking for new ones until the run finishes.
+        `is_finished` covers runs that end without calling finish() (e.g. a
+        job cancelled before it started).
+        """
+        position = 0
+        while True:
+            with self._cond:
+                while position >= len(self.entries) and not self.done:
+                    if is_finished and is_finished():
+                        self.done = True
+                        break
+                    self._cond.wait(poll)
+                batch = self.entries[position:]
+                finished = self.done
+            position += len(batch)
+            yield from batch
+            if finished and position >= len(self.entries):
+                return
+
+    def summary(self) -> dict:
+        with self._cond:
+            return {"total_changes": len(self.entries), **self.counts}
+
+
+_reports: "OrderedDict[str, VerifyReport]" = OrderedDict()
+_reports_lock = threading.Lock()
+
+
+def register_report(job_id: str, report: VerifyReport) -> VerifyReport:
+    with _reports_lock:
+        _reports[job_id] = report
+        while len(_reports) > REPORT_HISTORY:
+            _reports.popitem(last=False)
+    return report
+
+
+def get_report(job_id: str) -> Optional[VerifyReport]:
+    with _reports_lock:
+        return _reports.get(job_id)
+
+
+def trusted_hashes(backup: Backup, directory: str, flagged: Dict[str, str]) -> Dict[str, str]:
+    """
+    Last trusted hash of each flagged path: its entry in the newest snapshot
+    of directory whose content differs from the flagged hash. Paths no
+    snapshot vouches for are left out.
+    """
+    pending = dict(flagged)
+    trusted: Dict[str, str] = {}
+    for snapshot in reversed(backup.list_snapshots(directory)):
+        for entry in backup.read_manifest(snapshot):
+            path = os.path.join(directory, *entry["path"].split("/"))
+            if entry["type"] == "file" and path in pending and entry.get("fim_hash") != pending[path]:
+                trusted[path] = entry["fim_hash"]
+                del pending[path]
+        if not pending:
+            break
+    return trusted
+
+
+def load_baseline(database_instance: DatabaseOperation, directory: str, backup: Optional[Backup] = None) -> Dict[str, dict]:
+    """
+    Known state of directory, with flagged rows carrying their trusted hash.
+    Rows flagged before baseline hashes were recorded fall back to the snapshots.
+    """
+    baseline = database_instance.get_known_state(directory)
+    unknown = [path for path, entry in baseline.items()
+               if entry["flagged"] and entry["hash"] is None and entry["status"] == "modified" and entry["type"] == "file"]
+    if unknown:
+        observed = database_instance.get_flagged_hashes(directory)
+        trusted = trusted_hashes(backup or Backup(), directory, {path: observed.get(path) for path in unknown})
+        for path in unknown:
+            baseline[path]["hash"] = trusted.get(path)
+    return baseline
+
+
+def run_verify(db_session, targets: Dict[str, Optional[List[str]]], report: VerifyReport,
+               rehash: bool = False, job=None, backup: Optional[Backup] = None) -> dict:
+    """Verify each monitored root in targets, filling report. Returns the summary."""
+    started = time.perf_counter()
+    database_instance = DatabaseOperation(db_session)
+    try:
+        for directory, scope in targets.items():
+            baseline = load_baseline(database_instance, directory, backup)
+            if job:
+                job.set_message(f"Verifying {directory}")
+                job.set_total(files=sum(1 for entry in baseline.values() if entry.get("type") == "file"))
+            for entry in verify_directory(directory, baseline, scope, rehash, job):
+                report.add(entry)
+    finally:
+        report.finish()
+    return {**report.summary(), "elapsed_seconds": round(time.perf_counter() - started, 3)}
@@ -3,27 +3,36 @@ connection.py
 --------------
 Handles database connections for both authentication (auth_db)
 and File Integrity Monitoring (fim_db) databases using SQLAlchemy ORM.
+
+MySQL is used when AUTH_DATABASE_URL / FIM_DATABASE_URL point at it. When a
+URL is not set, an embedded SQLite database under data/ is used instead, so
+edge agents can run without a network round trip per file event. The schema
+is identical on both backends.
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.pool import QueuePool, StaticPool
 from dotenv import load_dotenv
+from pathlib import Path
 import os
 
 # Load environment variables from .env
 load_dotenv()
 
-# Fetch database URLs
-AUTH_DATABASE_URL = os.getenv("AUTH_DATABASE_URL")
-FIM_DATABASE_URL = os.getenv("FIM_DATABASE_URL")
+DATA_DIR = Path(__file__).resolve().parent.parent.parent.parent / "data"
+
+
+def _default_sqlite_url(name: str) -> str:
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    return f"sqlite:///{DATA_DIR / name}"
 
-# --- Validate environment variables ---
-if not AUTH_DATABASE_URL:
-    raise RuntimeError("❌ Missing AUTH_DATABASE_URL in .env file")
 
-if not FIM_DATABASE_URL:
-    raise RuntimeError("❌ Missing FIM_DATABASE_URL in .env file")
+# Fetch database URLs (embedded SQLite when unset)
+AUTH_DATABASE_URL = os.getenv("AUTH_DATABASE_URL") or _default_sqlite_url("auth.db")
+FIM_DATABASE_URL = os.getenv("FIM_DATABASE_URL") or _default_sqlite_url("fim.db")
 
 # --- MySQL Connection Options ---
 # Common connection options for MySQL to handle timeouts and connection issues
@@ -39,9 +48,101 @@ mysql_connection_options = {
     }
 }
 
-# --- Create SQLAlchemy engines with MySQL optimizations ---
-auth_engine = create_engine(AUTH_DATABASE_URL, **mysql_connection_options)
-fim_engine = create_engine(FIM_DATABASE_URL, **mysql_connection_options)
+# --- SQLite Connection Options ---
+# Connections are shared between API threads and the monitor thread; SQLite
+# itself serializes writers, busy_timeout makes them wait instead of failing.
+sqlite_connection_options = {
+    "echo": False,
+    "connect_args": {
+        "check_same_thread": False,
+        "timeout": 30,
+    }
+}
+
+# Applied to every new SQLite connection
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",      # Readers don't block the writer
+    "synchronous": "NORMAL",    # Durable at checkpoints, safe with WAL
+    "cache_size": -65536,       # 64 MB page cache (negative = KiB)
+    "temp_store": "MEMORY",
+    "mmap_size": 268435456,     # 256 MB memory-mapped reads
+    "busy_timeout": 30000,
+    "foreign_keys": "ON",
+}
+
+
+def is_sqlite_url(url) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def engine_options(url) -> dict:
+    """Choose engine options for the URL's dialect."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        options = {**sqlite_connection_options, "connect_args": dict(sqlite_connection_options["connect_args"])}
+        if parsed.database in (None, "", ":memory:"):
+            options["poolclass"] = StaticPool  # One shared in-memory database
+        return options
+    if parsed.get_backend_name() == "mysql":
+        return mysql_connection_options
+    return {"pool_pre_ping": True}
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+    finally:
+        cursor.close()
+
+
+def build_engine(url):
+    engine = create_engine(url, **engine_options(url))
+    if is_sqlite_url(url):
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+
+# --- Async engine options ---
+# Async endpoints don't hold a threadpool slot per query, so the pool, not
+# Starlette's threadpool, bounds DB concurrency.
+ASYNC_DRIVERS = {"mysql": "aiomysql", "sqlite": "aiosqlite"}
+ASYNC_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+
+
+def async_url(url):
+    """Map a sync URL (mysql+pymysql, sqlite) to its async driver."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"No async driver configured for {backend}")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def async_engine_options(url) -> dict:
+    options = {key: value for key, value in engine_options(url).items() if key != "poolclass"}
+    if not is_sqlite_url(url):
+        options.update({
+            "pool_size": ASYNC_POOL_SIZE,
+            "max_overflow": ASYNC_POOL_SIZE // 2,
+            "pool_timeout": 10,
+        })
+    elif make_url(url).database in (None, "", ":memory:"):
+        options["poolclass"] = StaticPool
+    return options
+
+
+def build_async_engine(url):
+    engine = create_async_engine(async_url(url), **async_engine_options(url))
+    if is_sqlite_url(url):
+        event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+
+# --- Create SQLAlchemy engines with per-dialect options ---
+auth_engine = build_engine(AUTH_DATABASE_URL)
+fim_engine = build_engine(FIM_DATABASE_URL)
 
 # --- Define separate Base classes for ORM models ---
 AuthBase = declarative_base()
@@ -51,6 +152,34 @@ FimBase = declarative_base()
 AuthSessionLocal = sessionmaker(bind=auth_engine, autoflush=False, autocommit=False)
 FimSessionLocal = sessionmaker(bind=fim_engine, autoflush=False, autocommit=False)
 
+# --- Async engine/session, created on first use so the async driver is only
+# required by processes that serve the async endpoints ---
+_fim_async_engine = None
+_FimAsyncSessionLocal = None
+
+
+def get_fim_async_engine():
+    global _fim_async_engine
+    if _fim_async_engine is None:
+        _fim_async_engine = build_async_engine(FIM_DATABASE_URL)
+    return _fim_async_engine
+
+
+def FimAsyncSessionLocal() -> AsyncSession:
+    global _FimAsyncSessionLocal
+    if _FimAsyncSessionLocal is None:
+        _FimAsyncSessionLocal = async_sessionmaker(
+            bind=get_fim_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _FimAsyncSessionLocal()
+
+async def dispose_async_engine():
+    global _fim_async_engine, _FimAsyncSessionLocal
+    if _fim_async_engine is not None:
+        await _fim_async_engine.dispose()
+        _fim_async_engine = None
+        _FimAsyncSessionLocal = None
+
 # --- Dependency functions for FastAPI ---
 def get_auth_db():
     """Yields a session connected to the authentication database."""
@@ -68,14 +197,22 @@ def get_fim_db():
     finally:
         db.close()
 
+async def get_fim_async_db():
+    """Yields an async session connected to the FIM database."""
+    db = FimAsyncSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
+
 # --- Test connection function (optional) ---
 def test_connections():
     """Test database connections on startup"""
     try:
         with auth_engine.connect() as conn:
-            print("✅ Authentication database connection successful")
+            print(f"✅ Authentication database connection successful ({auth_engine.dialect.name})")
         with fim_engine.connect() as conn:
-            print("✅ FIM database connection successful")
+            print(f"✅ FIM database connection successful ({fim_engine.dialect.name})")
     except Exception as e:
         print(f"❌ Database connection failed: {e}")
         raise
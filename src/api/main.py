@@ -1,9 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from src.api.routes import auth_routes, fim_routes
 from src.api.routes import auth_routes
-from src.api.database.connection import AuthBase, FimBase, auth_engine, fim_engine, test_connections
+from src.api.database.connection import (
+    AuthBase, FimBase, auth_engine, fim_engine, test_connections, dispose_async_engine
+)
 from src.api.models import user_model, fim_models
+from src.api.models.fim_models import upgrade_fim_schema
+from src.utils.log_search import get_log_search_index
 
 app = FastAPI(title="File Integrity Monitoring API")
 
@@ -34,7 +39,15 @@ def on_startup():
     test_connections()
 
     AuthBase.metadata.create_all(bind=auth_engine)
-    FimBase.metadata.create_all(bind=fim_engine)
+    upgrade_fim_schema(fim_engine)
+    get_log_search_index().start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Stop watching, flush pending change records and release pooled async connections."""
+    await run_in_threadpool(get_log_search_index().stop)
+    await run_in_threadpool(fim_routes.fim_monitor.manager.shutdown)
+    await dispose_async_engine()
 
 @app.get("/")
 def root():
@@ -4,7 +4,7 @@ fim_models.py
 Contains ORM models for File Integrity Monitoring (fim_db)
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, UniqueConstraint, inspect, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from src.api.database.connection import FimBase
@@ -25,8 +25,45 @@ class FileMetadata(FimBase):
     item_path = Column(String(500), nullable=False)
     item_type = Column(String(10), nullable=False)
     hash = Column(String(128), nullable=False)
+    # Last trusted (baseline) hash. `hash` is the last observed one, so the
+    # two differ while a row is flagged added/modified/deleted.
+    baseline_hash = Column(String(128), nullable=True)
     last_modified = Column(DateTime, nullable=False)
     status = Column(String(50), nullable=False)
     detected_at = Column(DateTime, default=datetime.utcnow)
     
     directory = relationship("Directory", back_populates="files")
+
+    __table_args__ = (
+        # Keyset pagination of /changes and /baseline filters on status and
+        # walks (detected_at, id) backwards.
+        Index("ix_file_metadata_status_detected", "status", "detected_at", "id"),
+        Index("ix_file_metadata_directory_path", "directory_id", "item_path"),
+    )
+
+
+class ChangeRollup(FimBase):
+    """Change counts per directory and status in minute/hour/day buckets."""
+    __tablename__ = "change_rollups"
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(String(10), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    directory_id = Column(Integer, ForeignKey('directories.id'), nullable=False)
+    status = Column(String(50), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("granularity", "directory_id", "status", "bucket_start", name="uq_change_rollup_bucket"),
+        Index("ix_change_rollups_granularity_bucket", "granularity", "bucket_start"),
+    )
+
+
+def upgrade_fim_schema(engine):
+    """Create missing tables and add columns introduced after a database was created."""
+    FimBase.metadata.create_all(bind=engine)
+    columns = {column["name"] for column in inspect(engine).get_columns("file_metadata")}
+    if "baseline_hash" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE file_metadata ADD COLUMN baseline_hash VARCHAR(128)"))
+            # Trusted hashes of rows flagged before the column existed are unknown
+            conn.execute(text("UPDATE file_metadata SET baseline_hash = hash WHERE status = 'current'"))
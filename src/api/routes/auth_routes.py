@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from src.api.schemas.user_schema import UserCreate, UserLogin, UserResponse
 from src.api.database.connection import get_auth_db
-from src.api.services.auth_service import register_user, login_user
+from src.api.services.auth_service import register_user, register_user_async, login_user_async, invalidate_user_cache
 from src.api.utils.jwt_utils import verify_token
 from src.api.models.user_model import User
 
@@ -17,12 +17,12 @@ def verify_admin_access(token_data: dict, db: Session) -> User:
     return admin
 
 @router.post("/register")
-def register(user: UserCreate, db: Session = Depends(get_auth_db)):
-    return register_user(db, user.username, user.email, user.password, is_admin=True)
+async def register(user: UserCreate, db: Session = Depends(get_auth_db)):
+    return await register_user_async(db, user.username, user.email, user.password, is_admin=True)
 
 @router.post("/login")
-def login(user: UserLogin, db: Session = Depends(get_auth_db)):
-    return login_user(db, user.email, user.password)
+async def login(user: UserLogin, db: Session = Depends(get_auth_db)):
+    return await login_user_async(db, user.email, user.password)
 
 @router.get("/me")
 def get_me(token_data: dict = Depends(verify_token), db: Session = Depends(get_auth_db)):
@@ -102,6 +102,7 @@ def update_user(
 
     db.commit()
     db.refresh(existing_user)
+    invalidate_user_cache()
 
     return {
         "id": existing_user.id,
@@ -128,6 +129,7 @@ def delete_user(
 
     db.delete(user)
     db.commit()
+    invalidate_user_cache()
     return {"message": "User deleted successfully"}
 
 @router.put("/users/{user_id}/admin")
@@ -149,6 +151,7 @@ def toggle_admin_status(
     user.is_admin = not user.is_admin  # type:ignore
     db.commit()
     db.refresh(user)
+    invalidate_user_cache()
 
     return {
         "id": user.id,
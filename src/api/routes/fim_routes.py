@@ -1,15 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional, cast
+from typing import List, Literal, Optional, cast
+from datetime import datetime
 import os
+import json
 from pathlib import Path
 
-from src.api.database.connection import get_auth_db, get_fim_db
+from src.api.database.connection import FimSessionLocal, get_auth_db, get_fim_db, get_fim_async_db
 from src.api.utils.jwt_utils import verify_token
 from src.api.models.user_model import User
-from src.api.models.fim_models import Directory, FileMetadata
+from src.api.services.auth_service import get_admin_user
+from src.api.models.fim_models import Directory
+from src.api.services import fim_service
+from src.api.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from src.api.utils.cache import cached_read, conditional_response, compute_etag
 from src.FIM.FIM import monitor_changes
-from src.utils.backup import Backup
+from src.config.logging_config import LOGS_DIR, log_path_for
+from src.FIM.event_bus import change_event_bus, DROP_OLDEST
+from src.FIM import verify
+from src.utils.restore import RestoreEngine
+from src.utils import export, log_reader
+from src.utils.log_search import get_log_search_index
+from src.utils.jobs import FINISHED_STATES, Job, JobLimitExceeded, job_manager
+from src.utils.database import rollup_bucket
 
 # Import schemas
 from src.api.schemas.fim_schema import (
@@ -17,8 +34,12 @@ from src.api.schemas.fim_schema import (
     FIMStopRequest, 
     FIMAddPathRequest,
     FIMRestoreRequest,
+    FIMVerifyRequest,
     FIMStatusResponse,
     FIMChangesResponse,
+    FIMBaselineResponse,
+    FIMBaselineSummaryResponse,
+    FIMTimeseriesResponse,
     FIMLogsResponse
 )
 
@@ -37,9 +58,9 @@ def handle_fim_errors(func):
 
 # Helper function to verify admin access
 def verify_admin_access(token_data: dict = Depends(verify_token), db: Session = Depends(get_auth_db)) -> User:
-    """Verify that the current user is an admin"""
-    admin = db.query(User).filter(User.email == token_data["sub"]).first()
-    if not admin or not getattr(admin, 'is_admin', False):
+    """Verify that the current user is an admin (short-TTL cached per email)"""
+    admin = get_admin_user(db, token_data["sub"])
+    if admin is None:
         raise HTTPException(status_code=403, detail="Admin access required")
     return admin
 
@@ -49,15 +70,65 @@ router = APIRouter(prefix="/api/fim", tags=["File Integrity Monitoring"])
 fim_monitor = monitor_changes()
 
 
-@router.post("/start", summary="Start monitoring directories")
+def _start_monitoring_job(job: Job, username: str, directories: List[str], excluded_files: List[str]):
+    db = FimSessionLocal()
+    try:
+        fim_monitor.start_monitoring(username, directories, excluded_files, db, job=job)
+        job.set_message("Monitoring started")
+        return {
+            "directories": directories,
+            "active_directories": fim_monitor.current_directories,
+            "startup": {d: fim_monitor.startup_metrics.get(d) for d in directories},
+        }
+    finally:
+        db.close()
+
+
+def _reset_baseline_job(job: Job, username: str, directories: List[str]):
+    db = FimSessionLocal()
+    try:
+        fim_monitor.reset_baseline(username, directories, db, job=job)
+        return {"directories": directories}
+    finally:
+        db.close()
+
+
+def _verify_job(job: Job, targets: dict, rehash: bool, report: verify.VerifyReport):
+    db = FimSessionLocal()
+    try:
+        return verify.run_verify(db, targets, report, rehash, job=job, backup=fim_monitor.backup_instance)
+    finally:
+        db.close()
+
+
+def _restore_job(job: Job, source_dir: str, target: str, snapshot_id: Optional[str], prune: bool,
+                 at: Optional[float] = None):
+    db = FimSessionLocal()
+    try:
+        return RestoreEngine(fim_monitor.backup_instance, fim_monitor.version_store).restore(
+            source_dir, target, db, snapshot_id=snapshot_id, prune=prune, job=job,
+            on_restored=fim_monitor.acknowledge_restored, on_restoring=fim_monitor.expect_restored, at=at,
+        )
+    finally:
+        db.close()
+
+
+def _submit_job(kind: str, func, *args, user: str, params: dict):
+    try:
+        return job_manager.submit(kind, func, *args, params=params, user=user)
+    except JobLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+
+
+@router.post("/start", status_code=202, summary="Start monitoring directories")
 def start_fim_monitoring(
     request: FIMStartRequest,
-    background_tasks: BackgroundTasks,
     admin_user: User = Depends(verify_admin_access),
     fim_db: Session = Depends(get_fim_db)
 ):
     """
     Start monitoring specified directories for file integrity changes.
+    Backup and baseline scanning run as a job; poll /jobs/{job_id} for progress.
     """
     try:
         # Verify directories exist
@@ -76,151 +147,287 @@ def start_fim_monitoring(
         
         fim_db.commit()
 
-        background_tasks.add_task(
-            fim_monitor.monitor_changes,
-            admin_user.username,
+        job = _submit_job(
+            "start_monitoring",
+            _start_monitoring_job,
+            cast(str, admin_user.username),
             request.directories,
             request.excluded_files or [],
-            fim_db
+            user=cast(str, admin_user.username),
+            params={"directories": request.directories, "excluded_files": request.excluded_files or []},
         )
 
         return {
-            "message": "FIM monitoring started successfully",
+            "message": "FIM monitoring start queued",
+            "job_id": job.id,
             "directories": request.directories,
             "excluded_files": request.excluded_files or []
         }
 
     except Exception as e:
         fim_db.rollback()
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=f"Failed to start monitoring: {str(e)}")
 
 @router.post("/stop", summary="Stop monitoring directories")
 def stop_fim_monitoring(
     request: FIMStopRequest,
+    admin_user: User = Depends(verify_admin_access),
 ):
     """
-    Stop monitoring specified directories.
+    Stop monitoring specified directories. Other roots keep running;
+    omitting `directories` stops all of them.
     """
     try:
-        # Stop the observer if it's running
-        if hasattr(fim_monitor, 'observer') and fim_monitor.observer.is_alive():
-            fim_monitor.observer.stop()
-            fim_monitor.observer.join()
+        stopped = fim_monitor.stop_monitoring(request.directories)
 
         return {
             "message": "FIM monitoring stopped successfully",
-            "stopped_directories": request.directories
+            "stopped_directories": stopped,
+            "active_directories": fim_monitor.current_directories
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to stop monitoring: {str(e)}")
 
 @router.get("/status", response_model=FIMStatusResponse, summary="Get monitoring status")
-def get_fim_status(
-    fim_db: Session = Depends(get_fim_db)
+async def get_fim_status(
+    request: Request,
+    fim_db: AsyncSession = Depends(get_fim_async_db)
 ):
     """
     Get current FIM monitoring status and watched directories.
+    Supports conditional GET: an unchanged status returns 304.
     """
     try:
-        is_monitoring = (
-            hasattr(fim_monitor, 'observer') and 
-            fim_monitor.observer.is_alive()
-        )
+        is_monitoring = fim_monitor.manager.is_running
 
-        dir_records = fim_db.query(Directory).all()
-        watched_directories = [str(d.path) for d in dir_records]
+        async def _load():
+            result = await fim_db.execute(select(Directory.path))
+            return [str(path) for path in result.scalars()]
 
-        return FIMStatusResponse(
+        watched_directories, _ = await cached_read(("status",), _load)
+
+        payload = FIMStatusResponse(
             is_monitoring=is_monitoring,
             watched_directories=watched_directories,
-            total_watched=len(watched_directories)
-        )
+            total_watched=len(watched_directories),
+            active_directories=fim_monitor.current_directories,
+            startup_metrics=fim_monitor.startup_metrics
+        ).model_dump()
+        return conditional_response(request, payload, compute_etag(payload))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get status: {str(e)}")
 
 @router.get("/changes", response_model=FIMChangesResponse, summary="Get detected changes")
-def get_fim_changes(
+async def get_fim_changes(
     directory: Optional[str] = None,
-    fim_db: Session = Depends(get_fim_db)
+    status: Optional[str] = Query(None, description="Comma-separated subset of added,modified,deleted"),
+    item_type: Optional[str] = Query(None, description="'file' or 'folder'"),
+    path_prefix: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fim_db: AsyncSession = Depends(get_fim_async_db)
 ):
     """
-    Fetch latest detected file changes from FIM database.
+    Fetch detected file changes from FIM database, newest first.
+    Pass the returned `next_cursor` back as `cursor` to fetch the next page.
     """
     try:
-        query = (
-            fim_db.query(FileMetadata, Directory.path)
-            .join(Directory, FileMetadata.directory_id == Directory.id)
-            .filter(FileMetadata.status != 'current')
+        statuses = fim_service.CHANGE_STATUSES
+        if status:
+            statuses = tuple(s.strip() for s in status.split(",") if s.strip())
+            invalid = set(statuses) - set(fim_service.CHANGE_STATUSES)
+            if invalid:
+                raise HTTPException(status_code=400, detail=f"Invalid status filter: {', '.join(sorted(invalid))}")
+
+        stmt = fim_service.file_events_query(
+            statuses, directory, item_type, path_prefix, since, until, cursor, limit
         )
-
-        if directory:
-            query = query.filter(Directory.path == directory)
-
-        changes_data = query.order_by(FileMetadata.detected_at.desc()).all()
-        
-        # Organize changes by type
-        changes = {"added": {}, "modified": {}, "deleted": {}}
-        
-        for item, dir_path in changes_data:
-            change_info = {
-                "hash": item.hash,
-                "last_modified": item.last_modified.strftime("%Y-%m-%d %H:%M:%S") if item.last_modified else None,
-                "type": item.item_type,
-                "detected_at": item.detected_at.strftime("%Y-%m-%d %H:%M:%S") if item.detected_at else None
-            }
-            changes[item.status][item.item_path] = change_info
-
-        total_changes = sum(len(changes[status]) for status in changes)
+        result = await fim_db.execute(stmt)
+        rows, next_cursor = fim_service.split_page(result.all(), limit)
+        changes = fim_service.group_changes(rows)
 
         return FIMChangesResponse(
             added=changes["added"],
             modified=changes["modified"],
             deleted=changes["deleted"],
-            total_changes=total_changes
+            total_changes=len(rows),
+            next_cursor=next_cursor
         )
 
     except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=f"Failed to get changes: {str(e)}")
 
+@router.get("/changes/timeseries", response_model=FIMTimeseriesResponse, summary="Get change counts over time")
+async def get_change_timeseries(
+    request: Request,
+    bucket: Literal["minute", "hour", "day"] = "hour",
+    directory: Optional[str] = None,
+    status: Optional[str] = Query(None, description="Comma-separated subset of added,modified,deleted"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fim_db: AsyncSession = Depends(get_fim_async_db)
+):
+    """
+    Change counts per time bucket and status, served from the precomputed
+    change_rollups table rather than by scanning file_metadata.
+    """
+    try:
+        statuses = fim_service.CHANGE_STATUSES
+        if status:
+            statuses = tuple(s.strip() for s in status.split(",") if s.strip())
+            invalid = set(statuses) - set(fim_service.CHANGE_STATUSES)
+            if invalid:
+                raise HTTPException(status_code=400, detail=f"Invalid status filter: {', '.join(sorted(invalid))}")
+
+        # Align the default window to a bucket boundary so repeated polls share a cache entry
+        since = since or rollup_bucket(datetime.utcnow() - fim_service.TIMESERIES_DEFAULT_WINDOW[bucket], bucket)
+
+        async def _load():
+            result = await fim_db.execute(
+                fim_service.timeseries_query(bucket, since, until, directory, statuses)
+            )
+            return FIMTimeseriesResponse(
+                granularity=bucket,
+                since=since.strftime("%Y-%m-%d %H:%M:%S"),
+                until=until.strftime("%Y-%m-%d %H:%M:%S") if until else None,
+                points=[
+                    {"bucket_start": bucket_start.strftime("%Y-%m-%d %H:%M:%S"), "status": row_status, "count": int(count)}
+                    for bucket_start, row_status, count in result.all()
+                ]
+            ).model_dump()
+
+        payload, etag = await cached_read(("timeseries", bucket, directory, statuses, since, until), _load)
+        return conditional_response(request, payload, etag)
+
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=f"Failed to get change timeseries: {str(e)}")
+
+STREAM_HEARTBEAT_SECONDS = 15
+
+
+def _sse(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    message = f"event: {event}\n"
+    if event_id is not None:
+        message = f"id: {event_id}\n" + message
+    return message + f"data: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+@router.get("/stream", summary="Live change stream (Server-Sent Events)")
+async def stream_fim_changes(
+    request: Request,
+    directory: Optional[List[str]] = Query(None),
+    status: Optional[str] = Query(None, description="Comma-separated subset of added,modified,deleted"),
+    cursor: Optional[int] = Query(None, description="Resume after this event id (same as Last-Event-ID)"),
+    buffer_size: int = Query(1000, ge=10, le=10000),
+    overflow: Literal["drop_oldest", "resync"] = DROP_OLDEST,
+):
+    """
+    Push detected changes to the client as they happen.
+
+    Each `change` event carries its sequence number as the SSE id, so
+    EventSource reconnects resume automatically via Last-Event-ID. If the
+    requested position is no longer buffered, or the subscriber's buffer
+    overflows under the `resync` policy, a `resync` event is sent and the
+    client should re-read /api/fim/changes before continuing.
+    """
+    statuses = [s.strip() for s in status.split(",") if s.strip()] if status else None
+    last_event_id = request.headers.get("last-event-id")
+    if cursor is None and last_event_id and last_event_id.isdigit():
+        cursor = int(last_event_id)
+
+    subscription = change_event_bus.subscribe(directory, statuses, cursor, buffer_size, overflow)
+
+    async def _events():
+        try:
+            yield _sse("ready", {"cursor": change_event_bus.last_seq})
+            while not await request.is_disconnected():
+                dropped = subscription.take_resync()
+                if dropped is not None:
+                    yield _sse("resync", {"cursor": change_event_bus.last_seq, "dropped": dropped})
+
+                if not await subscription.wait(STREAM_HEARTBEAT_SECONDS):
+                    yield ": keep-alive\n\n"
+                    continue
+
+                events = subscription.drain()
+                if events:
+                    yield "".join(_sse("change", event, event["seq"]) for event in events)
+        finally:
+            change_event_bus.unsubscribe(subscription)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(_events(), media_type="text/event-stream", headers=headers)
+
+def _read_log_window(log_path: Path, tail: Optional[int], since: Optional[datetime], until: Optional[datetime],
+                     levels: Optional[List[str]], limit: int, cursor: Optional[str]):
+    """Records of one log for the requested window, plus the next-page cursor."""
+    until_ts = log_reader.to_epoch(until) if until else None
+    if tail is not None:
+        return log_reader.tail(str(log_path), tail, until=until_ts, levels=levels), None
+    return log_reader.read_window(
+        str(log_path), since=log_reader.to_epoch(since) if since else None, until=until_ts,
+        levels=levels, limit=limit, cursor=cursor,
+    )
+
+
 @router.get("/logs", response_model=List[FIMLogsResponse], summary="Retrieve FIM logs")
-def get_fim_logs(
+async def get_fim_logs(
     directory: Optional[str] = None,
+    tail: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Last N records"),
+    since: Optional[datetime] = Query(None, description="Records at or after this time (log timezone if naive)"),
+    until: Optional[datetime] = Query(None, description="Records at or before this time"),
+    level: Optional[List[str]] = Query(None, description="Only these levels (repeatable), e.g. WARNING, ERROR"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page (requires directory)"),
 ):
     """
-    Retrieve logs from FIM log files.
+    Retrieve a window of FIM log records, seeking through the rotated log
+    segments and their time index instead of reading whole files.
+    With `since` or `cursor` the records are paged forward from that point
+    (`limit` per page, follow `next_cursor`); otherwise the last `tail`
+    (default `limit`) records are returned.
     """
     try:
-        logs_dir = Path(__file__).resolve().parent.parent.parent / "logs"
-        logs = []
+        if cursor and not directory:
+            raise HTTPException(status_code=400, detail="cursor requires directory")
+        if tail is None and since is None and cursor is None:
+            tail = limit
 
+        logs_dir = Path(LOGS_DIR)
         if directory:
             # Get specific directory logs
-            norm_dir = Path(directory).resolve().name
-            log_file = logs_dir / f"FIM_{norm_dir}.log"
-            
-            if log_file.exists():
-                with open(log_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    logs.append(FIMLogsResponse(
-                        directory=directory,
-                        log_file=str(log_file),
-                        content=content
-                    ))
-            else:
+            log_file = Path(log_path_for(str(Path(directory).resolve())))
+            if not log_reader.segments(str(log_file)):
                 raise HTTPException(status_code=404, detail=f"No logs found for directory: {directory}")
+            targets = [(directory, log_file)]
         else:
-            for log_path in logs_dir.glob("FIM_*.log"):
-                directory_name = log_path.stem.replace("FIM_", "")
-                
-                with open(log_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    logs.append(FIMLogsResponse(
-                        directory=directory_name,
-                        log_file=str(log_path),
-                        content=content
-                    ))
+            targets = [(log_path.stem.replace("FIM_", ""), log_path) for log_path in sorted(logs_dir.glob("FIM_*.log"))]
+
+        logs = []
+        for name, log_path in targets:
+            try:
+                records, next_cursor = await run_in_threadpool(
+                    _read_log_window, log_path, tail, since, until, level, limit, cursor
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            logs.append(FIMLogsResponse(
+                directory=name,
+                log_file=str(log_path),
+                content="\n".join(log_reader.format_record(record) for record in records),
+                records=records,
+                next_cursor=next_cursor,
+            ))
 
         if not logs:
             raise HTTPException(status_code=404, detail="No FIM logs found")
@@ -232,44 +439,147 @@ def get_fim_logs(
             raise e
         raise HTTPException(status_code=500, detail=f"Failed to retrieve logs: {str(e)}")
 
-@router.post("/restore", summary="Restore files from backup")
+def _search_logs(refresh: bool, **filters):
+    index = get_log_search_index()
+    indexed = index.update() if refresh else 0
+    return index.search(**filters), indexed
+
+
+@router.get("/logs/search", summary="Search FIM logs")
+async def search_fim_logs(
+    q: Optional[str] = Query(None, description='Full-text query over message and path: words, "phrases", prefix*, AND/OR/NOT'),
+    path: Optional[str] = Query(None, description="A path, or a folder to match everything under it"),
+    user: Optional[str] = None,
+    directory: Optional[str] = None,
+    level: Optional[List[str]] = Query(None, description="Only these levels (repeatable)"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    refresh: bool = Query(False, description="Index newly written log lines before searching"),
+    admin_user: User = Depends(verify_admin_access)
+):
+    """
+    Search the log index, newest first. The index is kept up to date in the
+    background (every FIM_LOG_SEARCH_INTERVAL seconds); `refresh` also indexes
+    the lines written since the last update before searching.
+    """
+    try:
+        results, indexed = await run_in_threadpool(
+            _search_logs, refresh,
+            text=q, path=path, user=user,
+            directory=str(Path(directory).resolve()) if directory else None,
+            levels=level,
+            since=log_reader.to_epoch(since) if since else None,
+            until=log_reader.to_epoch(until) if until else None,
+            limit=limit,
+        )
+        return {"results": results, "count": len(results), "newly_indexed": indexed}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=f"Log search failed: {str(e)}")
+
+@router.post("/restore", status_code=202, summary="Restore files from backup")
 def restore_files(
     request: FIMRestoreRequest,
     admin_user: User = Depends(verify_admin_access),
+    fim_db: Session = Depends(get_fim_db)
 ):
     """
-    Restore files or directories from backup.
+    Restore a file or directory from the newest clean backup snapshot (or
+    `snapshot_id`), or as it was at time `at` using the captured version
+    history. Runs as a job; poll /jobs/{job_id} for progress.
     """
     try:
-        backup_instance = Backup()
-        
-        # Restore the specified path
-        result = backup_instance.restore_backup(
+        monitored = [str(path) for (path,) in fim_db.query(Directory.path).all()]
+        try:
+            source_dir = next(iter(verify.resolve_targets([request.path_to_restore], monitored)))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        job = _submit_job(
+            "restore",
+            _restore_job,
+            source_dir,
             request.path_to_restore,
-            admin_user.username  # ✅ Use admin_user
+            request.snapshot_id,
+            request.prune,
+            log_reader.to_epoch(request.at) if request.at else None,
+            user=cast(str, admin_user.username),
+            params={"path_to_restore": request.path_to_restore, "snapshot_id": request.snapshot_id,
+                    "prune": request.prune, "at": request.at.isoformat() if request.at else None},
         )
-
-        if result:
-            return {
-                "message": "Restore completed successfully",
-                "restored_path": request.path_to_restore
-            }
-        else:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Failed to restore: {request.path_to_restore}"
-            )
+        return {
+            "message": "Restore queued",
+            "job_id": job.id,
+            "restored_path": request.path_to_restore
+        }
 
     except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=f"Restore failed: {str(e)}")
 
-@router.post("/add-path", summary="Add directory to monitor")
+@router.get("/backups", summary="Backup session history")
+def list_backup_sessions(
+    directory: Optional[str] = Query(None, description="Only sessions of this directory"),
+    status: Optional[Literal["success", "failed"]] = Query(None),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    admin_user: User = Depends(verify_admin_access)
+):
+    """Backup sessions, newest first, read through the session log index."""
+    try:
+        sessions = fim_monitor.backup_instance.session_log.sessions(
+            directory=os.path.abspath(directory) if directory else None,
+            status=status,
+            since=log_reader.to_epoch(since) if since else None,
+            until=log_reader.to_epoch(until) if until else None,
+            limit=limit,
+        )
+        return {"sessions": sessions, "count": len(sessions)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read backup sessions: {str(e)}")
+
+@router.get("/versions", summary="Version history of a file")
+def list_versions(
+    path: str = Query(..., description="Absolute path of a file inside a monitored directory"),
+    admin_user: User = Depends(verify_admin_access),
+    fim_db: Session = Depends(get_fim_db)
+):
+    """Stored versions of one file, newest first, plus version store usage."""
+    try:
+        if fim_monitor.version_store is None:
+            raise HTTPException(status_code=404, detail="Versioning is disabled (FIM_VERSIONING=0)")
+        monitored = [str(p) for (p,) in fim_db.query(Directory.path).all()]
+        try:
+            source_dir = next(iter(verify.resolve_targets([path], monitored)))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        rel = os.path.relpath(os.path.abspath(path), source_dir).replace(os.sep, "/")
+        return {
+            "path": path,
+            "versions": fim_monitor.version_store.history(source_dir, rel),
+            "store": fim_monitor.version_store.stats(),
+        }
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=f"Failed to list versions: {str(e)}")
+
+@router.post("/add-path", status_code=202, summary="Add directory to monitor")
 def add_monitoring_path(
     request: FIMAddPathRequest,
+    admin_user: User = Depends(verify_admin_access),
     fim_db: Session = Depends(get_fim_db)
 ):
     """
-    Add a new directory to the monitoring list.
+    Add a new directory to the running monitor. Only the new directory is
+    backed up and baselined; roots already being watched are not rescanned.
+    Poll /jobs/{job_id} for progress.
     """
     try:
         if not os.path.exists(request.directory):
@@ -278,27 +588,32 @@ def add_monitoring_path(
                 detail=f"Directory does not exist: {request.directory}"
             )
 
-        # Check if directory already exists in database
-        existing_dir = fim_db.query(Directory).filter(Directory.path == request.directory).first()
-        if existing_dir:
+        if fim_monitor.manager.is_watching(request.directory):
             raise HTTPException(
                 status_code=400, 
                 detail="Directory is already being monitored"
             )
 
-        new_dir = Directory(path=request.directory)
-        fim_db.add(new_dir)
-        fim_db.commit()
-
-        # Update in-memory directories if monitoring is active
-        if hasattr(fim_monitor, 'current_directories'):
-            if request.directory not in fim_monitor.current_directories:
-                fim_monitor.current_directories.append(request.directory)
+        existing_dir = fim_db.query(Directory).filter(Directory.path == request.directory).first()
+        if not existing_dir:
+            fim_db.add(Directory(path=request.directory))
+            fim_db.commit()
+
+        job = _submit_job(
+            "add_path",
+            _start_monitoring_job,
+            cast(str, admin_user.username),
+            [request.directory],
+            [],
+            user=cast(str, admin_user.username),
+            params={"directories": [request.directory]},
+        )
 
         return {
-            "message": "Directory added to monitoring",
+            "message": "Directory add queued",
+            "job_id": job.id,
             "directory": request.directory,
-            "total_monitored": len(fim_monitor.current_directories) if hasattr(fim_monitor, 'current_directories') else 1
+            "total_monitored": len(fim_monitor.current_directories) + 1
         }
 
     except Exception as e:
@@ -307,65 +622,219 @@ def add_monitoring_path(
             raise e
         raise HTTPException(status_code=500, detail=f"Failed to add directory: {str(e)}")
 
-@router.post("/reset-baseline", summary="Reset baseline for directories")
+@router.post("/reset-baseline", status_code=202, summary="Reset baseline for directories")
 def reset_baseline(
     request: FIMStartRequest,
     admin_user: User = Depends(verify_admin_access),
 ):
     """
     Reset baseline for specified directories.
+    The rescan runs as a job; poll /jobs/{job_id} for progress.
     """
     try:
-        fim_monitor.reset_baseline(cast(str, admin_user.username), request.directories)
+        job = _submit_job(
+            "reset_baseline",
+            _reset_baseline_job,
+            cast(str, admin_user.username),
+            request.directories,
+            user=cast(str, admin_user.username),
+            params={"directories": request.directories},
+        )
 
         return {
-            "message": "Baseline reset successfully",
+            "message": "Baseline reset queued",
+            "job_id": job.id,
             "directories": request.directories
         }
 
     except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=f"Failed to reset baseline: {str(e)}")
 
-@router.get("/baseline", summary="Get current baseline")
-def get_baseline(
-    directory: Optional[str] = None,
+@router.post("/verify", status_code=202, summary="Verify disk state against the baseline")
+def verify_fim_baseline(
+    request: FIMVerifyRequest,
+    admin_user: User = Depends(verify_admin_access),
     fim_db: Session = Depends(get_fim_db)
 ):
     """
-    Get current baseline data for directories.
+    Compare the current disk state with the stored baseline without
+    re-baselining. Runs as a job; stream the diff from /verify/{job_id}/diff
+    and poll /jobs/{job_id} for progress. With no directories or paths,
+    every monitored directory is verified.
     """
     try:
-        query = (
-            fim_db.query(FileMetadata, Directory.path)
-            .join(Directory, FileMetadata.directory_id == Directory.id)
-            .filter(FileMetadata.status == 'current')
+        monitored = [str(path) for (path,) in fim_db.query(Directory.path).all()]
+        requested = (request.directories or []) + (request.paths or [])
+        try:
+            targets = verify.resolve_targets(requested or monitored, monitored)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not targets:
+            raise HTTPException(status_code=400, detail="No monitored directories to verify")
+
+        report = verify.VerifyReport()
+        job = _submit_job(
+            "verify",
+            _verify_job,
+            targets,
+            request.rehash,
+            report,
+            user=cast(str, admin_user.username),
+            params={"targets": targets, "rehash": request.rehash},
         )
+        verify.register_report(job.id, report)
+        return {
+            "message": "Verification queued",
+            "job_id": job.id,
+            "directories": list(targets)
+        }
 
-        if directory:
-            query = query.filter(Directory.path == directory)
-            if not query.first():
-                raise HTTPException(status_code=404, detail=f"Directory not found: {directory}")
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=f"Failed to start verification: {str(e)}")
+
+@router.get("/verify/{job_id}/diff", summary="Stream a verification diff")
+def stream_verify_diff(job_id: str, admin_user: User = Depends(verify_admin_access)):
+    """
+    NDJSON stream of added/modified/deleted entries found by a verify job.
+    Entries are sent as they are found; the stream ends when the job does.
+    """
+    report = verify.get_report(job_id)
+    job = job_manager.get(job_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"Verification not found: {job_id}")
 
-        baseline_data = query.all()
+    def _stream():
+        is_finished = (lambda: job.status in FINISHED_STATES) if job else None
+        for entry in report.follow(is_finished=is_finished):
+            yield json.dumps(entry) + "\n"
 
-        baseline = {}
-        for item, dir_path in baseline_data:
-            if dir_path not in baseline:
-                baseline[dir_path] = {}
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
 
-            baseline[dir_path][item.item_path] = {
-                "type": item.item_type,
-                "hash": item.hash,
-                "last_modified": item.last_modified.strftime("%Y-%m-%d %H:%M:%S") if item.last_modified else None,
-                "detected_at": item.detected_at.strftime("%Y-%m-%d %H:%M:%S") if item.detected_at else None
-            }
+@router.get("/jobs", summary="List background jobs")
+def list_jobs(admin_user: User = Depends(verify_admin_access)):
+    """
+    List recent and running jobs with their status and progress.
+    """
+    return [job.to_dict() for job in job_manager.list()]
 
-        return {
-            "baseline": baseline,
-            "total_items": len(baseline_data)
-        }
+@router.get("/jobs/{job_id}", summary="Get job status and progress")
+def get_job(job_id: str, admin_user: User = Depends(verify_admin_access)):
+    """
+    Status, files/bytes processed and ETA of a job.
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job.to_dict()
+
+@router.post("/jobs/{job_id}/cancel", summary="Cancel a job")
+def cancel_job(job_id: str, admin_user: User = Depends(verify_admin_access)):
+    """
+    Request cancellation; the job stops at its next checkpoint.
+    """
+    job = job_manager.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job.to_dict()
+
+@router.get("/baseline", response_model=FIMBaselineResponse, summary="Get current baseline")
+async def get_baseline(
+    request: Request,
+    directory: Optional[str] = None,
+    item_type: Optional[str] = Query(None, description="'file' or 'folder'"),
+    path_prefix: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fim_db: AsyncSession = Depends(get_fim_async_db)
+):
+    """
+    Get current baseline data for directories, one page at a time.
+    Pass the returned `next_cursor` back as `cursor` to fetch the next page.
+    Supports conditional GET: an unchanged page returns 304.
+    """
+    try:
+        async def _load():
+            stmt = fim_service.file_events_query(
+                ("current",), directory, item_type, path_prefix, since, until, cursor, limit
+            )
+            result = await fim_db.execute(stmt)
+            rows, next_cursor = fim_service.split_page(result.all(), limit)
+
+            if directory and not rows and not cursor:
+                exists = await fim_db.execute(fim_service.directory_exists_query(directory))
+                if exists.first() is None:
+                    raise HTTPException(status_code=404, detail=f"Directory not found: {directory}")
+
+            return FIMBaselineResponse(
+                baseline=fim_service.group_baseline(rows),
+                total_items=len(rows),
+                next_cursor=next_cursor
+            ).model_dump()
+
+        cache_key = ("baseline", directory, item_type, path_prefix, since, until, cursor, limit)
+        payload, etag = await cached_read(cache_key, _load)
+        return conditional_response(request, payload, etag)
 
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=f"Failed to get baseline: {str(e)}")
+
+@router.get("/baseline/summary", response_model=FIMBaselineSummaryResponse, summary="Get baseline summary")
+async def get_baseline_summary(
+    request: Request,
+    fim_db: AsyncSession = Depends(get_fim_async_db)
+):
+    """
+    Per-directory file and folder counts of the current baseline.
+    Supports conditional GET: an unchanged summary returns 304.
+    """
+    try:
+        async def _load():
+            result = await fim_db.execute(fim_service.baseline_summary_query())
+            return FIMBaselineSummaryResponse(
+                directories=fim_service.group_baseline_summary(result.all())
+            ).model_dump()
+
+        payload, etag = await cached_read(("baseline_summary",), _load)
+        return conditional_response(request, payload, etag)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get baseline summary: {str(e)}")
+
+@router.get("/export/{kind}", summary="Stream baseline or change history export")
+def export_fim_data(
+    kind: str,
+    format: str = Query("ndjson", description="'ndjson' or 'csv'"),
+    gzip: bool = False,
+    directory: Optional[str] = None,
+    admin_user: User = Depends(verify_admin_access),
+):
+    """
+    Stream the baseline (`kind=baseline`) or change history (`kind=changes`)
+    row by row as NDJSON or CSV, optionally gzip-compressed.
+    """
+    if kind not in export.EXPORT_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown export: {kind}")
+    if format not in export.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}")
+
+    def _stream():
+        # The response outlives the request dependencies, so the export
+        # owns its session for the lifetime of the stream.
+        db = FimSessionLocal()
+        try:
+            yield from export.stream_export(db, kind, format, directory, gzip)
+        finally:
+            db.close()
+
+    filename = f"fim_{kind}.{format}" + (".gz" if gzip else "")
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    media_type = "application/gzip" if gzip else export.MEDIA_TYPES[format]
+    return StreamingResponse(_stream(), media_type=media_type, headers=headers)
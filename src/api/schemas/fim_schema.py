@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from datetime import datetime
 from typing import List, Optional, Dict, Any
 
 class FIMStartRequest(BaseModel):
@@ -6,26 +7,64 @@ class FIMStartRequest(BaseModel):
     excluded_files: Optional[List[str]] = []
 
 class FIMStopRequest(BaseModel):
-    directories: List[str]
+    directories: Optional[List[str]] = None
 
 class FIMAddPathRequest(BaseModel):
     directory: str
 
+class FIMVerifyRequest(BaseModel):
+    directories: Optional[List[str]] = None
+    paths: Optional[List[str]] = None
+    rehash: bool = False
+
 class FIMRestoreRequest(BaseModel):
     path_to_restore: str
+    snapshot_id: Optional[str] = None
+    prune: bool = False
+    at: Optional[datetime] = None
 
 class FIMStatusResponse(BaseModel):
     is_monitoring: bool
     watched_directories: List[str]
     total_watched: int
+    active_directories: List[str] = []
+    startup_metrics: Dict[str, Any] = {}
 
 class FIMChangesResponse(BaseModel):
     added: Dict[str, Any]
     modified: Dict[str, Any]
     deleted: Dict[str, Any]
     total_changes: int
+    next_cursor: Optional[str] = None
+
+class FIMBaselineResponse(BaseModel):
+    baseline: Dict[str, Dict[str, Any]]
+    total_items: int
+    next_cursor: Optional[str] = None
+
+class FIMDirectorySummary(BaseModel):
+    directory: str
+    files: int
+    folders: int
+    total_items: int
+
+class FIMBaselineSummaryResponse(BaseModel):
+    directories: List[FIMDirectorySummary]
+
+class FIMTimeseriesPoint(BaseModel):
+    bucket_start: str
+    status: str
+    count: int
+
+class FIMTimeseriesResponse(BaseModel):
+    granularity: str
+    since: str
+    until: Optional[str] = None
+    points: List[FIMTimeseriesPoint]
 
 class FIMLogsResponse(BaseModel):
     directory: str
     log_file: str
     content: str
+    records: List[Dict[str, Any]] = []
+    next_cursor: Optional[str] = None
@@ -1,22 +1,48 @@
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
 from src.api.models.user_model import User
-from src.api.utils.password_utils import hash_password, verify_password
+from src.api.utils.cache import TTLCache
+from src.api.utils.password_utils import hash_password, verify_password, hash_password_async, verify_password_async
 from src.api.utils.jwt_utils import create_access_token
-from typing import cast
+from typing import Optional, cast
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
-def register_user(db: Session, username: str, email: str, password: str, is_admin: bool = False):
-    logger.info(f"🔍 Register attempt - Username: {username}, Email: {email}")
+# Admin users by email, as detached (read-only) User objects. Cleared by
+# invalidate_user_cache() whenever auth_routes changes a user.
+admin_cache = TTLCache(
+    maxsize=int(os.getenv("AUTH_ADMIN_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("AUTH_ADMIN_CACHE_TTL", "30")),
+)
+
+
+def invalidate_user_cache():
+    admin_cache.clear()
+
+
+def get_admin_user(db: Session, email: str) -> Optional[User]:
+    """Return the admin User for email (cached), or None if not an admin."""
+    admin = admin_cache.get(email)
+    if admin is not None:
+        return admin
+
+    admin = db.query(User).filter(User.email == email).first()
+    if not admin or not getattr(admin, 'is_admin', False):
+        return None
+    db.expunge(admin)
+    admin_cache.set(email, admin)
+    return admin
 
+
+def _create_user(db: Session, username: str, email: str, hashed_pw: str, is_admin: bool):
     existing_user = db.query(User).filter(User.email == email).first()
     if existing_user:
         logger.warning(f"❌ Email already registered: {email}")
         raise HTTPException(status_code=400, detail="Email already registered.")
 
-    hashed_pw = hash_password(password)
     logger.info(f"🔍 Password hashed: {hashed_pw[:20]}...")
 
     new_user = User(
@@ -28,6 +54,7 @@ def register_user(db: Session, username: str, email: str, password: str, is_admi
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    invalidate_user_cache()
 
     logger.info(f"User registered - ID: {new_user.id}, Admin: {new_user.is_admin}")
 
@@ -48,7 +75,19 @@ def register_user(db: Session, username: str, email: str, password: str, is_admi
     }
 
 
-def login_user(db: Session, email: str, password: str):
+def register_user(db: Session, username: str, email: str, password: str, is_admin: bool = False):
+    logger.info(f"🔍 Register attempt - Username: {username}, Email: {email}")
+    return _create_user(db, username, email, hash_password(password), is_admin)
+
+
+async def register_user_async(db: Session, username: str, email: str, password: str, is_admin: bool = False):
+    """register_user with hashing on the bcrypt executor and DB work in the threadpool."""
+    logger.info(f"🔍 Register attempt - Username: {username}, Email: {email}")
+    hashed_pw = await hash_password_async(password)
+    return await run_in_threadpool(_create_user, db, username, email, hashed_pw, is_admin)
+
+
+def _find_login_user(db: Session, email: str) -> User:
     user = db.query(User).filter(User.email == email).first()
 
     if not user:
@@ -59,9 +98,10 @@ def login_user(db: Session, email: str, password: str):
         )
 
     logger.info(f"🔍 User found - ID: {user.id}, Username: {user.username}, Admin: {user.is_admin}")
+    return user
 
-    # Verify password
-    is_valid = verify_password(password, cast(str, user.hashed_password))
+
+def _login_response(user: User, email: str, is_valid: bool):
     logger.info(f"🔍 Password valid: {is_valid}")
     
     if not is_valid:
@@ -86,3 +126,19 @@ def login_user(db: Session, email: str, password: str):
         "message": f"Welcome back, {user.username}!" + 
                   (" (Administrator)" if cast(bool, user.is_admin) else "")
     }
+
+
+def login_user(db: Session, email: str, password: str):
+    user = _find_login_user(db, email)
+
+    # Verify password
+    is_valid = verify_password(password, cast(str, user.hashed_password))
+    return _login_response(user, email, is_valid)
+
+
+async def login_user_async(db: Session, email: str, password: str):
+    """login_user with bcrypt on the bounded executor instead of a request thread."""
+    user = await run_in_threadpool(_find_login_user, db, email)
+
+    is_valid = await verify_password_async(password, cast(str, user.hashed_password))
+    return _login_response(user, email, is_valid)
@@ -0,0 +1,171 @@
+"""
+fim_service.py
+---------------
+Query builders for the FIM read endpoints.
+
+Every query selects plain columns (no ORM entity loading), applies its filters
+in SQL and pages with a keyset on (detected_at, id) in descending order.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import Select, and_, func, or_, select
+
+from src.api.models.fim_models import ChangeRollup, Directory, FileMetadata
+from src.api.utils.pagination import decode_cursor, encode_cursor
+
+CHANGE_STATUSES = ("added", "modified", "deleted")
+
+# Default look-back window per rollup granularity
+TIMESERIES_DEFAULT_WINDOW = {
+    "minute": timedelta(hours=1),
+    "hour": timedelta(days=1),
+    "day": timedelta(days=30),
+}
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def file_events_query(
+    statuses: Sequence[str],
+    directory: Optional[str] = None,
+    item_type: Optional[str] = None,
+    path_prefix: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+) -> Select:
+    """
+    Build a column-only, keyset-paginated query over file_metadata.
+    Fetches limit + 1 rows so the caller can tell whether another page exists.
+    """
+    stmt = (
+        select(
+            FileMetadata.id,
+            FileMetadata.item_path,
+            FileMetadata.item_type,
+            FileMetadata.hash,
+            FileMetadata.last_modified,
+            FileMetadata.status,
+            FileMetadata.detected_at,
+            Directory.path.label("directory"),
+        )
+        .join(Directory, FileMetadata.directory_id == Directory.id)
+        .where(FileMetadata.status.in_(list(statuses)))
+    )
+
+    if directory:
+        stmt = stmt.where(Directory.path == directory)
+    if item_type:
+        stmt = stmt.where(FileMetadata.item_type == item_type)
+    if path_prefix:
+        stmt = stmt.where(FileMetadata.item_path.like(_escape_like(path_prefix) + "%", escape="\\"))
+    if since:
+        stmt = stmt.where(FileMetadata.detected_at >= since)
+    if until:
+        stmt = stmt.where(FileMetadata.detected_at < until)
+
+    if cursor:
+        cursor_time, cursor_id = decode_cursor(cursor)
+        if cursor_time is None:
+            stmt = stmt.where(FileMetadata.detected_at.is_(None), FileMetadata.id < cursor_id)
+        else:
+            stmt = stmt.where(or_(
+                FileMetadata.detected_at < cursor_time,
+                and_(FileMetadata.detected_at == cursor_time, FileMetadata.id < cursor_id),
+                FileMetadata.detected_at.is_(None),
+            ))
+
+    return stmt.order_by(FileMetadata.detected_at.desc(), FileMetadata.id.desc()).limit(limit + 1)
+
+
+def directory_exists_query(directory: str) -> Select:
+    return select(Directory.id).where(Directory.path == directory).limit(1)
+
+
+def baseline_summary_query() -> Select:
+    return (
+        select(Directory.path, FileMetadata.item_type, func.count(FileMetadata.id))
+        .join(FileMetadata, FileMetadata.directory_id == Directory.id)
+        .where(FileMetadata.status == "current")
+        .group_by(Directory.path, FileMetadata.item_type)
+        .order_by(Directory.path)
+    )
+
+
+def group_baseline_summary(rows) -> List[Dict[str, Any]]:
+    summary: Dict[str, Dict[str, Any]] = {}
+    for path, item_type, count in rows:
+        entry = summary.setdefault(path, {"directory": path, "files": 0, "folders": 0, "total_items": 0})
+        if item_type == "folder":
+            entry["folders"] += count
+        else:
+            entry["files"] += count
+        entry["total_items"] += count
+    return list(summary.values())
+
+
+def timeseries_query(
+    granularity: str,
+    since: datetime,
+    until: Optional[datetime] = None,
+    directory: Optional[str] = None,
+    statuses: Sequence[str] = CHANGE_STATUSES,
+) -> Select:
+    """Sum rollup counts per (bucket, status), optionally for one directory."""
+    stmt = (
+        select(ChangeRollup.bucket_start, ChangeRollup.status, func.sum(ChangeRollup.count))
+        .where(
+            ChangeRollup.granularity == granularity,
+            ChangeRollup.bucket_start >= since,
+            ChangeRollup.status.in_(list(statuses)),
+        )
+        .group_by(ChangeRollup.bucket_start, ChangeRollup.status)
+        .order_by(ChangeRollup.bucket_start)
+    )
+    if until:
+        stmt = stmt.where(ChangeRollup.bucket_start < until)
+    if directory:
+        stmt = stmt.join(Directory, ChangeRollup.directory_id == Directory.id).where(Directory.path == directory)
+    return stmt
+
+
+def split_page(rows: List[Any], limit: int):
+    """Trim the look-ahead row and return (page_rows, next_cursor)."""
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    return page, encode_cursor(last.detected_at, last.id)
+
+
+def _format_time(value: Optional[datetime]) -> Optional[str]:
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else None
+
+
+def group_changes(rows) -> Dict[str, Dict[str, Any]]:
+    changes: Dict[str, Dict[str, Any]] = {status: {} for status in CHANGE_STATUSES}
+    for row in rows:
+        changes.setdefault(row.status, {})[row.item_path] = {
+            "hash": row.hash,
+            "last_modified": _format_time(row.last_modified),
+            "type": row.item_type,
+            "detected_at": _format_time(row.detected_at),
+        }
+    return changes
+
+
+def group_baseline(rows) -> Dict[str, Dict[str, Any]]:
+    baseline: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        baseline.setdefault(row.directory, {})[row.item_path] = {
+            "type": row.item_type,
+            "hash": row.hash,
+            "last_modified": _format_time(row.last_modified),
+            "detected_at": _format_time(row.detected_at),
+        }
+    return baseline
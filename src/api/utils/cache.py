@@ -0,0 +1,104 @@
+"""
+cache.py
+---------
+In-process TTL/LRU cache for the FIM read models polled by the dashboard
+(/status, /baseline, /baseline/summary), plus ETag helpers for conditional GET.
+
+Entries expire after FIM_READ_CACHE_TTL seconds and the whole cache is
+cleared whenever a FIM database session commits (monitor events, baseline
+resets, added paths), so polls never see data older than the last write made
+by this process. Writes from other processes are picked up within the TTL.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+
+from src.api.database.connection import FimSessionLocal
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 5.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+read_model_cache = TTLCache(
+    maxsize=int(os.getenv("FIM_READ_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("FIM_READ_CACHE_TTL", "5")),
+)
+
+
+@event.listens_for(FimSessionLocal, "after_commit")
+def _invalidate_read_models(session):
+    read_model_cache.clear()
+
+
+def compute_etag(payload: Any) -> str:
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return 'W/"' + hashlib.sha1(body.encode()).hexdigest()[:20] + '"'
+
+
+async def cached_read(key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+    """Return (payload, etag) from the cache, loading and caching on a miss."""
+    entry = read_model_cache.get(key)
+    if entry is None:
+        payload = await loader()
+        entry = (payload, compute_etag(payload))
+        read_model_cache.set(key, entry)
+    return entry
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {tag.strip() for tag in header.split(",")}
+    return "*" in candidates or etag in candidates or etag.removeprefix("W/") in candidates
+
+
+def conditional_response(request: Request, payload: Any, etag: str) -> Response:
+    """304 with no body if the client already has `etag`, else the JSON payload."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
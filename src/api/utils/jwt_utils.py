@@ -1,4 +1,5 @@
 import jwt
+import time
 from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
@@ -6,12 +7,20 @@ from jwt import PyJWTError
 from dotenv import load_dotenv
 import os
 
+from src.api.utils.cache import TTLCache
+
 load_dotenv()
 
 SECRET_KEY = os.getenv("API_SECRET_KEY", "supersecretkey")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
+# Decoded tokens are reused for a short time; an entry is never served past the token's own exp.
+token_cache = TTLCache(
+    maxsize=int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("AUTH_TOKEN_CACHE_TTL", "30")),
+)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 def create_access_token(data: dict):
@@ -21,8 +30,12 @@ def create_access_token(data: dict):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def verify_token(token: str = Depends(oauth2_scheme)):
+    cached = token_cache.get(token)
+    if cached is not None and cached.get("exp", 0) > time.time():
+        return cached
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        token_cache.set(token, payload)
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired.")
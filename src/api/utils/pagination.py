@@ -0,0 +1,35 @@
+"""
+pagination.py
+--------------
+Opaque keyset cursors for paginated FIM endpoints.
+
+A cursor encodes the (detected_at, id) of the last row on a page, so the next
+page starts strictly after it without OFFSET scans.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(detected_at: Optional[datetime], row_id: int) -> str:
+    payload = {"t": detected_at.isoformat() if detected_at else None, "i": row_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """Decode a cursor produced by encode_cursor, raising 400 if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        detected_at = datetime.fromisoformat(payload["t"]) if payload["t"] else None
+        return detected_at, int(payload["i"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
@@ -1,9 +1,36 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+import asyncio
 import bcrypt
+import os
+import threading
 
 # Use a simpler approach with direct bcrypt
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt is deliberately slow, so it runs on its own small pool instead of the
+# request threadpool. Work beyond BCRYPT_MAX_PENDING is rejected with 503 so
+# login bursts cannot starve the rest of the API.
+BCRYPT_MAX_WORKERS = int(os.getenv("BCRYPT_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", "64"))
+
+_bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_MAX_WORKERS, thread_name_prefix="bcrypt")
+_bcrypt_slots = threading.BoundedSemaphore(BCRYPT_MAX_PENDING)
+
+
+async def _run_bcrypt(func, *args):
+    if not _bcrypt_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=503,
+            detail="Too many concurrent authentication requests, retry shortly.",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_bcrypt_executor, func, *args)
+    finally:
+        _bcrypt_slots.release()
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verify a password against its hash using bcrypt directly
@@ -42,3 +69,12 @@ def hash_password(password: str) -> str:
     except Exception as e:
         print(f"❌ Password hashing error: {e}")
         raise e
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the bounded bcrypt executor."""
+    return await _run_bcrypt(verify_password, plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    """hash_password on the bounded bcrypt executor."""
+    return await _run_bcrypt(hash_password, password)
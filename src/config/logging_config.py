@@ -1,38 +1,338 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+from collections import OrderedDict
+from datetime import datetime
 from pathlib import Path
 import re
+import struct
+import time
+from zoneinfo import ZoneInfo
 
-from src.utils.timestamp import timezone
+# Log output: "text" (the legacy "time | level | user | message" lines in
+# <name>.log), "json" (one JSON object per line in <name>.jsonl) or "both".
+LOG_FORMAT = os.getenv("FIM_LOG_FORMAT", "both").lower()
+LOG_TIMEZONE = ZoneInfo(os.getenv("FIM_LOG_TIMEZONE", "Asia/Kolkata"))
+TEXT_FORMAT = "%(asctime)s | %(levelname)s | %(username)s | %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+LOGS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "logs"))
+# Upper bound on log files held open at once, however many roots are monitored
+MAX_OPEN_LOG_FILES = int(os.getenv("FIM_LOG_MAX_OPEN_FILES", "64"))
+# Rotation thresholds (0 disables) and spacing of the sparse time index
+LOG_MAX_BYTES = int(float(os.getenv("FIM_LOG_MAX_MB", "256")) * 1024 * 1024)
+LOG_MAX_AGE = float(os.getenv("FIM_LOG_MAX_AGE_HOURS", "24")) * 3600
+LOG_INDEX_INTERVAL = int(os.getenv("FIM_LOG_INDEX_KB", "64")) * 1024
+INDEX_ENTRY = struct.Struct(">dQ")  # record time (epoch), byte offset
+
+# Attributes every LogRecord has; anything else was passed via `extra=`
+# and becomes a field of the JSON line (event, path, digest, timings...).
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "username"}
 
 
 class UsernameFilter(logging.Filter):
     def __init__(self, username):
         super().__init__()
         self.username = username
-    
+
     def filter(self, record):
         record.username = self.username
         return True
 
 
+class TextFormatter(logging.Formatter):
+    """Legacy text lines, with timestamps in FIM_LOG_TIMEZONE."""
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT, datefmt=DATE_FORMAT)
+
+    def formatTime(self, record, datefmt=None):
+        return datetime.fromtimestamp(record.created, LOG_TIMEZONE).strftime(datefmt or DATE_FORMAT)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: standard fields plus everything passed via `extra=`."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, LOG_TIMEZONE).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "user": getattr(record, "username", None),
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def sanitize_basename(directory):
+    """
+    Extract and sanitize the final directory name
+    Example:
+    - Input: '/var/log/app' → Returns: 'app'
+    - Input: 'C:\\Program Files\\App' → Returns: 'App'
+    """
+    basename = os.path.basename(os.path.normpath(directory))
+    return re.sub(r'[\\/*?:"<>|]', '_', basename).strip('_')
+
+
+def log_path_for(directory, suffix=".log"):
+    """Log file of a monitored directory (suffix ".log" or ".jsonl")."""
+    return os.path.join(LOGS_DIR, f"FIM_{sanitize_basename(directory)}{suffix}")
+
+
+class LogSink:
+    """
+    Append handles shared by every log file, at most `max_open` open at a
+    time. The least recently written file is closed to make room and
+    reopened on its next record, so thousands of per-directory logs fit in
+    a fixed number of file descriptors. Each record is flushed as written,
+    so readers always see complete lines.
+
+    Files are rotated once they pass FIM_LOG_MAX_MB or FIM_LOG_MAX_AGE_HOURS:
+    `FIM_x.log` becomes the segment `FIM_x.log.<YYYYmmddTHHMMSS>`. Every
+    segment has a sparse index, `<segment>.idx`, of (record time, byte
+    offset) pairs written every FIM_LOG_INDEX_KB bytes, so readers can seek
+    to a time instead of scanning (see src.utils.log_reader).
+    """
+
+    def __init__(self, max_open: int = MAX_OPEN_LOG_FILES, max_bytes: int = LOG_MAX_BYTES,
+                 max_age: float = LOG_MAX_AGE, index_interval: int = LOG_INDEX_INTERVAL):
+        self.max_open = max(1, max_open)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.index_interval = index_interval
+        self._files = OrderedDict()
+        # path -> [segment start time, size, size at the last index entry]
+        self._state = {}
+        self._lock = threading.Lock()
+        self.opens = 0
+        self.rotations = 0
+
+    def _load_state(self, path):
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        started, indexed_at = None, None
+        try:
+            with open(f"{path}.idx", "rb") as f:
+                data = f.read()
+            if len(data) >= INDEX_ENTRY.size:
+                started = INDEX_ENTRY.unpack_from(data, 0)[0]
+                indexed_at = INDEX_ENTRY.unpack_from(data, len(data) - len(data) % INDEX_ENTRY.size - INDEX_ENTRY.size)[1]
+        except OSError:
+            pass
+        return [started, size, indexed_at]
+
+    def _rotate_locked(self, path):
+        f = self._files.pop(path, None)
+        if f is not None:
+            f.close()
+        segment = f"{path}.{datetime.now(LOG_TIMEZONE):%Y%m%dT%H%M%S}"
+        n = 1
+        while os.path.exists(segment):
+            segment = f"{path}.{datetime.now(LOG_TIMEZONE):%Y%m%dT%H%M%S}-{n}"
+            n += 1
+        os.replace(path, segment)
+        if os.path.exists(f"{path}.idx"):
+            os.replace(f"{path}.idx", f"{segment}.idx")
+        self._state[path] = [None, 0, None]
+        self.rotations += 1
+
+    def write(self, path, line, created=None):
+        created = created or time.time()
+        data = (line + "\n").encode("utf-8")
+        with self._lock:
+            state = self._state.get(path)
+            if state is None:
+                state = self._state[path] = self._load_state(path)
+            started, size, indexed_at = state
+            if size and ((self.max_bytes and size + len(data) > self.max_bytes)
+                         or (self.max_age and started is not None and created - started >= self.max_age)):
+                self._rotate_locked(path)
+                started, size, indexed_at = state = self._state[path]
+
+            f = self._files.get(path)
+            if f is None:
+                while len(self._files) >= self.max_open:
+                    self._files.popitem(last=False)[1].close()
+                f = open(path, "ab")
+                self._files[path] = f
+                self.opens += 1
+            else:
+                self._files.move_to_end(path)
+
+            if indexed_at is None or size - indexed_at >= self.index_interval:
+                # Opened and closed per entry: one entry per index_interval bytes
+                with open(f"{path}.idx", "ab") as idx:
+                    idx.write(INDEX_ENTRY.pack(created, size))
+                state[2] = size
+                if started is None:
+                    state[0] = created
+            f.write(data)
+            f.flush()
+            state[1] = size + len(data)
+
+    def close(self, path=None):
+        """Close one file's handle (or all of them)."""
+        with self._lock:
+            paths = [path] if path is not None else list(self._files)
+            for p in paths:
+                f = self._files.pop(p, None)
+                if f is not None:
+                    f.close()
+                self._state.pop(p, None)
+
+    def stats(self):
+        with self._lock:
+            return {"open_files": len(self._files), "max_open": self.max_open, "opens": self.opens,
+                    "rotations": self.rotations}
+
+
+log_sink = LogSink()
+
+
+class SinkHandler(logging.Handler):
+    """Writes formatted records for one log file through the shared sink."""
+
+    def __init__(self, path, sink: LogSink = log_sink):
+        super().__init__()
+        self.path = path
+        self.sink = sink
+
+    def emit(self, record):
+        try:
+            self.sink.write(self.path, self.format(record), record.created)
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.sink.close(self.path)
+        super().close()
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues a copy of each record with its message merged and any traceback
+    kept apart as `exc_text` (the stock handler folds it into the message),
+    so JSON lines carry it in their "exc" field.
+    """
+
+    _traceback_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or self._traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _RoutingHandler(logging.Handler):
+    """Runs on the listener thread: hands each record to its logger's file handlers."""
+
+    def __init__(self):
+        super().__init__()
+        self.routes = {}
+
+    def handle(self, record):
+        for handler in self.routes.get(record.name, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+
+class LogPipeline:
+    """
+    Process-wide asynchronous logging. Loggers only enqueue records through
+    a QueueHandler (no I/O on the calling thread); one listener thread
+    formats them and writes to the files.
+    """
+
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.router = _RoutingHandler()
+        self.listener = None
+        self._lock = threading.Lock()
+
+    def _start_locked(self):
+        if self.listener is None:
+            self.listener = logging.handlers.QueueListener(self.queue, self.router)
+            self.listener.start()
+
+    def _stop_locked(self):
+        """Stop the listener after it has written everything queued so far."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def attach(self, logger, base_path, file_name=None):
+        """Route logger to <base_path>.log / .jsonl (per FIM_LOG_FORMAT) via the queue."""
+        handlers = []
+        if LOG_FORMAT in ("text", "both"):
+            handlers.append(SinkHandler(file_name or f"{base_path}.log"))
+            handlers[-1].setFormatter(TextFormatter())
+        if LOG_FORMAT in ("json", "both"):
+            handlers.append(SinkHandler(f"{base_path}.jsonl"))
+            handlers[-1].setFormatter(JsonFormatter())
+        with self._lock:
+            self.router.routes[logger.name] = handlers
+            self._start_locked()
+        logger.addHandler(_QueueHandler(self.queue))
+
+    def detach(self, loggers):
+        """Flush pending records, then close the given loggers' files."""
+        with self._lock:
+            self._stop_locked()
+            for logger in loggers:
+                for handler in logger.handlers[:]:
+                    logger.removeHandler(handler)
+                for handler in self.router.routes.pop(logger.name, ()):
+                    handler.close()
+            if self.router.routes:
+                self._start_locked()
+
+    def flush(self):
+        """Block until every record queued so far is written."""
+        with self._lock:
+            self._stop_locked()
+            if self.router.routes:
+                self._start_locked()
+
+    def close(self):
+        with self._lock:
+            self._stop_locked()
+            for handlers in self.router.routes.values():
+                for handler in handlers:
+                    handler.close()
+            self.router.routes.clear()
+
+
+log_pipeline = LogPipeline()
+atexit.register(log_pipeline.close)
+
+
 class configure_logger:
+    # One registry for the whole process: every instance hands out the same
+    # loggers, so a directory never gets a second set of files.
+    loggers = {}
+
     def __init__(self):
-        """Initialize logger registry and ensure logs directory exists"""
-        self.loggers = {}
-        self.logs_dir = os.path.abspath(os.path.join(
-            os.path.dirname(__file__), "..", "..", "logs"))
+        """Ensure logs directory exists"""
+        self.logs_dir = LOGS_DIR
         Path(self.logs_dir).mkdir(parents=True, exist_ok=True)
 
     def _sanitize_basename(self, directory):
-        """
-        Extract and sanitize the final directory name
-        Example: 
-        - Input: '/var/log/app' → Returns: 'app'
-        - Input: 'C:\\Program Files\\App' → Returns: 'App'
-        """
-        basename = os.path.basename(os.path.normpath(directory))
-        return re.sub(r'[\\/*?:"<>|]', '_', basename).strip('_')
+        return sanitize_basename(directory)
 
     def _setup_logger(self, name, username=None):
         """Setup a dedicated logger for database operation"""
@@ -43,21 +343,13 @@ class configure_logger:
         """
         Get or create a global logger for DB, Backup, Authentication
         """
-        if name is self.loggers:
+        if name in self.loggers:
             return self.loggers[name]
 
         logger = logging.getLogger(f"FIM_{name}")
 
         if not logger.handlers:
-            log_file = os.path.join(self.logs_dir, f"{name}.log")
-
-            handler = logging.FileHandler(log_file, encoding='utf-8')
-            handler.setFormatter(logging.Formatter(
-                "%(asctime)s | %(levelname)s | %(username)s | %(message)s",
-                datefmt=timezone()[0]
-            ))
-
-            logger.addHandler(handler)
+            log_pipeline.attach(logger, os.path.join(self.logs_dir, name))
             logger.setLevel(logging.INFO)
             logger.propagate = False
             logger.addFilter(UsernameFilter(username))
@@ -84,24 +376,13 @@ class configure_logger:
         logger = logging.getLogger(f"FIM_{log_basename}")
 
         if not logger.handlers:  # Only configure if not already set up
-            log_file = os.path.join(self.logs_dir, f"FIM_{log_basename}.log")
-
-            handler = logging.FileHandler(
-                log_file if file_name is None else file_name,
-                encoding='utf-8'  # Ensure UTF-8 support for special characters
-            )
-            handler.setFormatter(logging.Formatter(
-                "%(asctime)s | %(levelname)s | %(username)s | %(message)s",
-                datefmt = timezone()[0]
-            ))
-
-            logger.addHandler(handler)
+            log_pipeline.attach(logger, os.path.join(self.logs_dir, f"FIM_{log_basename}"), file_name)
             logger.setLevel(logging.INFO)
             logger.propagate = False  # Prevent duplicate logs
 
             logger.addFilter(UsernameFilter(username))
 
-            logger.info(f"Initialized FIM logging for: {normalized_dir}")
+            logger.info(f"Initialized FIM logging for: {normalized_dir}", extra={"directory": normalized_dir})
 
         self.loggers[normalized_dir] = logger
         return logger
@@ -109,8 +390,5 @@ class configure_logger:
 
     def shutdown(self):
         """Safely close all logging resources"""
-        for logger in self.loggers.values():
-            for handler in logger.handlers[:]:
-                handler.close()
-                logger.removeHandler(handler)
+        log_pipeline.detach(self.loggers.values())
         self.loggers.clear()
@@ -4,6 +4,7 @@ import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.ensemble import IsolationForest
 from .log_parser import parse_log_file
+from . import log_reader
 
 MODEL_DIR = os.path.join("data", "models")
 MODEL_PATH = os.path.join(MODEL_DIR, "anomaly_model.pkl")
@@ -13,10 +14,12 @@ def train_anomaly_model():
     log_folder_path = 'logs'
     log_dfs = []
     for file in os.listdir(log_folder_path):
-        file_path = os.path.join(log_folder_path, file)
-        log_df = parse_log_file(file_path)
-        if log_df is not None and not log_df.empty:
-            log_dfs.append(log_df)
+        if not file.endswith(".log"):
+            continue  # rotated segments are read with their log; .jsonl/.idx are not text logs
+        for segment in log_reader.segments(os.path.join(log_folder_path, file)):
+            log_df = parse_log_file(segment)
+            if log_df is not None and not log_df.empty:
+                log_dfs.append(log_df)
 
     if not log_dfs:
         print("No log data available for training.")
@@ -1,69 +1,342 @@
 import os
-import shutil
+import stat
 import json
+import gzip
+import hashlib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Iterator, List, Optional
 
 from src.utils.timestamp import timezone
+from src.utils.snapshot_diff import sorted_walk
+from src.utils.copy_engine import CopyEngine, copy_engine
+from src.utils.io_budget import io_budget
+from src.utils.pack_store import PACK_MAX_OBJECT, PackStore
+from src.utils.backup_log import BackupSessionLog
+
+# Layout under FIM_BACKUP_ROOT:
+#   objects/<2 hex>/<sha256>                         file contents, stored once
+#   snapshots/<source key>/<snapshot id>.json        snapshot metadata and stats
+#   snapshots/<source key>/<snapshot id>.manifest.gz path -> object map (NDJSON, path-sorted)
+#   packs/pack-<id>.pack + .idx                      small objects, compressed (FIM_BACKUP_PACK)
+#   Backup_logs.jsonl + Backup_logs.idx               append-only session log and its index
+BACKUP_BASE = os.getenv("FIM_BACKUP_ROOT", "../FIM_Backup")
+PACK_CODEC = os.getenv("FIM_BACKUP_PACK", "")  # "", zlib, lzma, zstd or auto
+HASH_CHUNK_SIZE = 1024 * 1024
+
 
 class Backup:
-    def __init__(self):
-        self.backup_root = "../FIM_Backup/backup"
-        os.makedirs(self.backup_root, exist_ok=True)
-        self.meta_file_path = "../FIM_Backup/backup_metadata.json"  # where all the files hash and information will be stored.
-        self.backup_log_path = "../FIMbackup/Backup_logs.json"  # where all the backup logs will be stored.
-
-    def log_backup_session(self, current_log_data):
-        """Create a timestamped parent backup directory"""
-        with open(self.backup_log_path, "r") as file:
-            if os.path.exists(self.backup_log_path):
-                try:
-                    existing_data = json.load(file)
-                    if not isinstance(existing_data, list):
-                        existing_data = []
-                except (json.JSONDecodeError, FileNotFoundError):
-                    existing_data = []
-            else:
-                existing_data = []
-
-            backup_entry = {
-                "timestamp": timezone()[0],
-                "timezone": timezone()[1],
-                "user": current_log_data.auth_user,
-                "directory": current_log_data.source_dir,
-                "backup_type": current_log_data.backup_type,
-                "status": current_log_data.backup_status,
-                "duration_seconds": current_log_data.backup_duration,
-                "file_changes": current_log_data.files_changes
-            }
-            existing_data.append(backup_entry)
-
-        with open(self.backup_log_path, 'w') as file:
-            json.dump(existing_data, file, indent=4)
+    def __init__(self, backup_base: str = BACKUP_BASE, engine: CopyEngine = copy_engine, pack_codec: str = PACK_CODEC):
+        self.backup_base = backup_base
+        self.copy_engine = engine
+        self.objects_root = os.path.join(backup_base, "objects")
+        self.snapshots_root = os.path.join(backup_base, "snapshots")
+        for path in (self.objects_root, self.snapshots_root):
+            os.makedirs(path, exist_ok=True)
+        # Packs are opened whenever they exist, so objects stay readable
+        # even after packing is switched off
+        packs_root = os.path.join(backup_base, "packs")
+        self.pack_store: Optional[PackStore] = None
+        if pack_codec or os.path.isdir(packs_root):
+            self.pack_store = PackStore(packs_root, pack_codec or "zlib")
+        self.pack_small_files = bool(pack_codec)
+        self.meta_file_path = os.path.join(backup_base, "backup_metadata.json")  # where all the files hash and information will be stored.
+        self.session_log = BackupSessionLog(backup_base)  # append-only log of backup sessions
+        # Backups and version captures count as object users from storing an
+        # object until a manifest or version row references it; object
+        # collection (src.utils.versions) only runs while there are none.
+        self._object_users = 0
+        self._object_lock = threading.Lock()
+
+    def log_backup_session(self, session: dict) -> dict:
+        """Append one backup session to the session log (see src.utils.backup_log)."""
+        timestamp, tz = timezone()
+        return self.session_log.append({"timestamp": timestamp, "timezone": str(tz), **session})
+
+    # ---------------- Object store ----------------
+
+    @contextmanager
+    def using_objects(self):
+        """Keep object collection out while objects are stored and referenced."""
+        with self._object_lock:
+            self._object_users += 1
+        try:
+            yield
+        finally:
+            with self._object_lock:
+                self._object_users -= 1
+
+    @contextmanager
+    def collecting_objects(self):
+        """
+        Exclusive hold for deleting objects: yields True when no backup or
+        capture is in flight (new ones wait until the block ends), else False.
+        """
+        with self._object_lock:
+            yield self._object_users == 0
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_root, digest[:2], digest)
+
+    def has_object(self, digest: str) -> bool:
+        if os.path.exists(self.object_path(digest)):
+            return True
+        return self.pack_store is not None and self.pack_store.has(digest)
+
+    def read_object(self, digest: str) -> bytes:
+        """Object content from a loose file or its pack frame."""
+        path = self.object_path(digest)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return f.read()
+        data = self.pack_store.read(digest) if self.pack_store is not None else None
+        if data is None:
+            raise FileNotFoundError(f"Backup object not found: {digest}")
+        return data
+
+    @staticmethod
+    def _digests(data: bytes, basename: str):
+        content = hashlib.sha256(data)
+        fim_hash = content.copy()
+        fim_hash.update(basename.encode())
+        return content.hexdigest(), fim_hash.hexdigest()
+
+    @staticmethod
+    def hash_file(path: str, name: Optional[str] = None):
+        """
+        One read, two digests: the content sha256 that keys the object
+        store, and the FIM baseline hash (content + basename, as
+        FIM_monitor.calculate_hash) so restores can be checked against
+        the baseline. `name` overrides the basename (for a copy of a file).
+        """
+        content = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(HASH_CHUNK_SIZE):
+                io_budget.consume(len(chunk))
+                content.update(chunk)
+        fim_hash = content.copy()
+        fim_hash.update((name or os.path.basename(path)).encode())
+        return content.hexdigest(), fim_hash.hexdigest()
+
+    def _store_object(self, source_path: str):
+        """
+        Copy a file into the store. The copy is hashed and filed under the
+        digest of what was actually written, so a file changing mid-copy
+        never puts new bytes under an old digest. Returns (digest, fim hash,
+        bytes written, copy method); written is 0 and method None if the
+        content was already stored.
+        """
+        tmp_path = os.path.join(self.objects_root, f"incoming.{os.getpid()}-{threading.get_ident()}.tmp")
+        try:
+            method = self.copy_engine.copy_file(source_path, tmp_path)
+            digest, fim_hash = self.hash_file(tmp_path, os.path.basename(source_path))
+            target = self.object_path(digest)
+            if os.path.exists(target):
+                return digest, fim_hash, 0, None
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp_path, target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return digest, fim_hash, os.path.getsize(target), method
+
+    def _backup_file(self, path: str, pack: bool = True):
+        """
+        Hash one file and store its content. Runs on the copy engine's pool.
+        pack=False always stores a loose object, complete on return (a
+        packed object is only written out when create_backup flushes the pack).
+        """
+        if pack and self.pack_small_files and os.path.getsize(path) <= PACK_MAX_OBJECT:
+            # Small files are read once, hashed and packed from memory
+            with open(path, "rb") as f:
+                data = f.read()
+            io_budget.consume(len(data))
+            digest, fim_hash = self._digests(data, os.path.basename(path))
+            if self.has_object(digest):
+                return digest, fim_hash, 0, None
+            written = self.pack_store.add(digest, data)  # type: ignore[union-attr]
+            return digest, fim_hash, written, "pack" if written else None
+
+        digest, fim_hash = self.hash_file(path)
+        if os.path.exists(self.object_path(digest)):
+            return digest, fim_hash, 0, None
+        return self._store_object(path)
+
+    # ---------------- Snapshots ----------------
+
+    @staticmethod
+    def source_key(source_dir: str) -> str:
+        """Per-source snapshot folder: readable name plus a short hash of the full path."""
+        source_dir = os.path.abspath(source_dir)
+        digest = hashlib.sha256(source_dir.encode()).hexdigest()[:12]
+        return f"{os.path.basename(os.path.normpath(source_dir)) or 'root'}-{digest}"
+
+    def _snapshot_dir(self, source_dir: str) -> str:
+        return os.path.join(self.snapshots_root, self.source_key(source_dir))
+
+    def list_snapshots(self, source_dir: str) -> List[dict]:
+        """Metadata of every snapshot of source_dir, oldest first."""
+        snapshot_dir = self._snapshot_dir(source_dir)
+        if not os.path.isdir(snapshot_dir):
+            return []
+        snapshots = []
+        for name in sorted(os.listdir(snapshot_dir)):
+            if name.endswith(".json"):
+                with open(os.path.join(snapshot_dir, name), "r") as f:
+                    snapshots.append(json.load(f))
+        return snapshots
+
+    def latest_snapshot(self, source_dir: str) -> Optional[dict]:
+        snapshots = self.list_snapshots(source_dir)
+        return snapshots[-1] if snapshots else None
+
+    def read_manifest(self, snapshot: dict) -> Iterator[dict]:
+        """Stream a snapshot's manifest entries in path order."""
+        manifest_path = os.path.join(self._snapshot_dir(snapshot["source"]), snapshot["manifest"])
+        with gzip.open(manifest_path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
 
     def create_backup(self, source_dir, auth_username=None):
-        """Backup a directory into the current backup session folder"""
-        if not self.backup_root:
-            os.makedirs(self.backup_root, exist_ok=True)
+        """
+        Snapshot source_dir into the content-addressed store and return the
+        snapshot metadata (None on failure).
 
+        Files whose size and mtime match the previous snapshot reuse its
+        digests without being read, and content already in the store is not
+        copied again, so re-snapshotting a mostly unchanged tree is a stat
+        walk. The previous manifest is merge-joined with the path-sorted walk,
+        so memory stays flat.
+        """
         if not os.path.exists(source_dir):
             print(f"Source directory {source_dir} does not exist.")
             return None
 
+        source_dir = os.path.abspath(source_dir)
+        started = time.perf_counter()
+        snapshot_dir = self._snapshot_dir(source_dir)
+        os.makedirs(snapshot_dir, exist_ok=True)
+
+        snapshot_id = datetime.now(dt_timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        manifest_name = f"{snapshot_id}.manifest.gz"
+        manifest_path = os.path.join(snapshot_dir, manifest_name)
+        stats = {"files": 0, "folders": 0, "bytes": 0, "reused": 0, "new_objects": 0, "new_bytes": 0, "errors": 0}
+        methods: Dict[str, int] = {}
+
+        previous = self.latest_snapshot(source_dir)
+        previous_entries = self.read_manifest(previous) if previous else iter(())
+        prev = next(previous_entries, None)
+
+        # Manifest lines must stay path-sorted, so results are written in
+        # walk order; a bounded window of files hashes and copies in parallel.
+        window: deque = deque()
+
+        def _write(item, manifest):
+            entry, future = item
+            if future is not None:
+                try:
+                    entry["digest"], entry["fim_hash"], written, method = future.result()
+                except OSError as e:
+                    print(f"Backup skipped {os.path.join(source_dir, entry['path'])}: {e}")
+                    stats["errors"] += 1
+                    return
+                if written:
+                    stats["new_objects"] += 1
+                    stats["new_bytes"] += written
+                    methods[method] = methods.get(method, 0) + 1
+            if entry["type"] == "file":
+                stats["files"] += 1
+                stats["bytes"] += entry["size"]
+            manifest.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
         try:
-            dir_name = os.path.basename(os.path.normpath(source_dir))
-            backup_path = os.path.join(
-                self.backup_root,
-                dir_name
-            )
+            # Object collection waits until the manifest references what was stored
+            with self.using_objects(), gzip.open(f"{manifest_path}.tmp", "wt", encoding="utf-8") as manifest:
+                for rel, path, is_file in sorted_walk(source_dir):
+                    while prev is not None and prev["path"] < rel:
+                        prev = next(previous_entries, None)
+                    match = prev if prev is not None and prev["path"] == rel else None
 
-            shutil.copytree(
-                source_dir,
-                backup_path,
-                ignore=shutil.ignore_patterns('.*')
-            )
+                    try:
+                        st = os.lstat(path)
+                    except OSError:
+                        stats["errors"] += 1
+                        continue
 
-            print(f"Backed up '{dir_name}' to:\n{backup_path}")
-            return backup_path
+                    future = None
+                    if not is_file:
+                        entry = {"path": rel, "type": "folder", "mode": st.st_mode & 0o7777}
+                        stats["folders"] += 1
+                    elif not stat.S_ISREG(st.st_mode):
+                        continue  # symlinks, sockets, devices
+                    else:
+                        entry = {
+                            "path": rel, "type": "file", "size": st.st_size,
+                            "mtime_ns": st.st_mtime_ns, "mode": st.st_mode & 0o7777,
+                        }
+                        if (match and match.get("type") == "file" and match["size"] == st.st_size
+                                and match["mtime_ns"] == st.st_mtime_ns and self.has_object(match["digest"])):
+                            entry["digest"], entry["fim_hash"] = match["digest"], match["fim_hash"]
+                            stats["reused"] += 1
+                        else:
+                            future = self.copy_engine.submit(self._backup_file, path)
+
+                    window.append((entry, future))
+                    while len(window) > self.copy_engine.workers * 4:
+                        _write(window.popleft(), manifest)
+
+                while window:
+                    _write(window.popleft(), manifest)
+            if self.pack_store is not None:
+                # Objects must be durable before a manifest points at them
+                self.pack_store.flush()
+            os.replace(f"{manifest_path}.tmp", manifest_path)
 
         except Exception as e:
             print(f"Backup failed for {source_dir}: {str(e)}")
+            if os.path.exists(f"{manifest_path}.tmp"):
+                os.remove(f"{manifest_path}.tmp")
+            self.log_backup_session({
+                "user": auth_username,
+                "directory": source_dir,
+                "backup_type": "incremental" if previous else "full",
+                "status": "failed",
+                "duration_seconds": round(time.perf_counter() - started, 3),
+                "error": str(e),
+            })
             return None
+
+        duration = time.perf_counter() - started
+        snapshot = {
+            "id": snapshot_id,
+            "source": source_dir,
+            "user": auth_username,
+            "created_at": timezone()[0],
+            "manifest": manifest_name,
+            "parent": previous["id"] if previous else None,
+            "duration_seconds": round(duration, 3),
+            "throughput_mb_s": round(stats["new_bytes"] / duration / (1024 * 1024), 2) if duration > 0 else 0.0,
+            "copy_methods": methods,
+            **stats,
+        }
+        with open(os.path.join(snapshot_dir, f"{snapshot_id}.json"), "w") as f:
+            json.dump(snapshot, f, indent=4)
+        self.log_backup_session({
+            "user": auth_username,
+            "directory": source_dir,
+            "backup_type": "incremental" if previous else "full",
+            "status": "success",
+            "duration_seconds": snapshot["duration_seconds"],
+            "snapshot_id": snapshot_id,
+            "file_changes": {"new_objects": stats["new_objects"], "new_bytes": stats["new_bytes"],
+                             "reused": stats["reused"], "errors": stats["errors"]},
+        })
+
+        print(f"Backed up '{source_dir}' as snapshot {snapshot_id}: {stats['files']} files, "
+              f"{stats['reused']} unchanged, {stats['new_objects']} new objects "
+              f"({stats['new_bytes']} bytes) in {snapshot['duration_seconds']}s")
+        return snapshot
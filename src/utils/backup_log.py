@@ -0,0 +1,168 @@
+"""
+backup_log.py
+--------------
+Append-only backup session log.
+
+Each backup session is one JSON line appended to `Backup_logs.jsonl` and
+flushed to disk, so logging a session costs the same whatever the history
+length, and a crash can at worst tear the line being written. A small
+SQLite index (`Backup_logs.idx`) maps (directory, status, time) to byte
+offsets in the log. Queries such as "last successful backup of X" look up
+the index and read a single line.
+
+The log is the source of truth. The index records how far it has read the
+log and catches up from there on open, so it can be deleted and rebuilt at
+any time. A legacy `Backup_logs.json` array is imported once.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterator, List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    offset INTEGER PRIMARY KEY,
+    directory TEXT,
+    status TEXT,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_sessions_directory ON sessions (directory, status, ts);
+CREATE INDEX IF NOT EXISTS ix_sessions_ts ON sessions (ts);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+class BackupSessionLog:
+    def __init__(self, backup_base: str):
+        self.log_path = os.path.join(backup_base, "Backup_logs.jsonl")
+        self.index_path = os.path.join(backup_base, "Backup_logs.idx")
+        self.legacy_path = os.path.join(backup_base, "Backup_logs.json")
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+        with self._lock:
+            self._import_legacy()
+            self._catch_up()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------------- Writing ----------------
+
+    def append(self, session: dict) -> dict:
+        """Append one session (a `ts` epoch time is added if missing) and index it."""
+        session = dict(session)
+        session.setdefault("ts", time.time())
+        line = (json.dumps(session, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+        with self._lock:
+            self._catch_up()
+            with open(self.log_path, "ab") as f:
+                offset = f.tell()
+                if offset and not self._ends_with_newline(offset):
+                    # Terminate a line torn by an earlier crash
+                    f.write(b"\n")
+                    offset += 1
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._index([(offset, session)], offset + len(line))
+        return session
+
+    def _ends_with_newline(self, size: int) -> bool:
+        with open(self.log_path, "rb") as f:
+            f.seek(size - 1)
+            return f.read(1) == b"\n"
+
+    def _index(self, rows: List[tuple], indexed_to: int):
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO sessions (offset, directory, status, ts) VALUES (?, ?, ?, ?)",
+                [(offset, s.get("directory"), s.get("status"), float(s.get("ts") or 0)) for offset, s in rows],
+            )
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('indexed_to', ?)", (indexed_to,))
+
+    def _indexed_to(self) -> int:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'indexed_to'").fetchone()
+        return row[0] if row else 0
+
+    def _catch_up(self):
+        """Index complete lines appended since the last indexed offset (e.g. by another process)."""
+        if not os.path.exists(self.log_path):
+            return
+        start = self._indexed_to()
+        if os.path.getsize(self.log_path) <= start:
+            return
+        rows = []
+        position = start
+        with open(self.log_path, "rb") as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn tail, terminated by the next append
+                try:
+                    rows.append((position, json.loads(line)))
+                except ValueError:
+                    pass
+                position += len(line)
+        self._index(rows, position)
+
+    def _import_legacy(self):
+        """Move entries of the old whole-file JSON array into the log once."""
+        if not os.path.exists(self.legacy_path) or os.path.exists(self.log_path):
+            return
+        try:
+            with open(self.legacy_path, "r") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = []
+        with open(self.log_path, "ab") as f:
+            for entry in entries if isinstance(entries, list) else []:
+                if "ts" not in entry:
+                    try:
+                        entry["ts"] = time.mktime(time.strptime(entry["timestamp"], "%Y-%m-%d %H:%M:%S"))
+                    except (KeyError, TypeError, ValueError):
+                        entry["ts"] = 0.0
+                f.write((json.dumps(entry, separators=(",", ":"), default=str) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.legacy_path, f"{self.legacy_path}.migrated")
+
+    # ---------------- Queries ----------------
+
+    def _read_at(self, offsets: List[int]) -> Iterator[dict]:
+        with open(self.log_path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                yield json.loads(f.readline())
+
+    def sessions(self, directory: Optional[str] = None, status: Optional[str] = None,
+                 since: Optional[float] = None, until: Optional[float] = None, limit: int = 100) -> List[dict]:
+        """Sessions matching the filters, newest first; only the matching lines are read."""
+        with self._lock:
+            self._catch_up()
+        clauses, params = [], []
+        for column, value in (("directory = ?", directory), ("status = ?", status),
+                              ("ts >= ?", since), ("ts <= ?", until)):
+            if value is not None:
+                clauses.append(column)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        offsets = [row[0] for row in self._conn().execute(
+            f"SELECT offset FROM sessions {where} ORDER BY ts DESC, offset DESC LIMIT ?", params + [limit]
+        )]
+        return list(self._read_at(offsets)) if offsets else []
+
+    def last(self, directory: str, status: Optional[str] = "success") -> Optional[dict]:
+        """Most recent session for directory (by default the last successful one)."""
+        found = self.sessions(directory=os.path.abspath(directory), status=status, limit=1)
+        return found[0] if found else None
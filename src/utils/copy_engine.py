@@ -0,0 +1,184 @@
+"""
+copy_engine.py
+---------------
+Parallel file copy engine for backups.
+
+Each copy takes the cheapest path the filesystem supports:
+
+1. reflink (FICLONE ioctl): copy-on-write clone, no data is read or written
+   (btrfs, XFS with reflink, bcachefs, ...)
+2. os.copy_file_range: in-kernel copy for large files (falls back to
+   os.sendfile where copy_file_range is unavailable or refuses the pair)
+3. a plain read/write loop, used for small files and as the last fallback
+
+Paths that fail with "not supported" are remembered per (source device,
+target device) pair, so the engine stops retrying them. Data copies are
+charged to the shared I/O budget (src.utils.io_budget); reflinks are not,
+since they move no data.
+"""
+
+import errno
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from src.utils.io_budget import IOBudget, io_budget
+
+FICLONE = 0x40049409  # _IOW(0x94, 9, int), linux/fs.h
+LARGE_FILE_THRESHOLD = 1024 * 1024
+CHUNK_SIZE = 8 * 1024 * 1024
+COPY_WORKERS = int(os.getenv("FIM_COPY_WORKERS", str(min(16, (os.cpu_count() or 1) * 2))))
+
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EBADF}
+if hasattr(errno, "ENOTSUP"):
+    _UNSUPPORTED.add(errno.ENOTSUP)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+
+
+class CopyEngine:
+    def __init__(self, workers: int = COPY_WORKERS, budget: IOBudget = io_budget):
+        self.workers = max(1, workers)
+        self.budget = budget
+        self._disabled: Dict[str, set] = {"reflink": set(), "copy_file_range": set(), "sendfile": set()}
+        self._stats_lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.reset_stats()
+
+    # ---------------- Stats ----------------
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.stats = {"files": 0, "bytes": 0, "reflink": 0, "copy_file_range": 0, "sendfile": 0, "userspace": 0}
+            self._started = time.perf_counter()
+
+    def _record(self, method: str, nbytes: int):
+        with self._stats_lock:
+            self.stats["files"] += 1
+            self.stats["bytes"] += nbytes
+            self.stats[method] += 1
+
+    def report(self) -> dict:
+        """Copy counts per method, bytes and throughput since the last reset."""
+        with self._stats_lock:
+            elapsed = time.perf_counter() - self._started
+            stats = dict(self.stats)
+        stats["seconds"] = round(elapsed, 3)
+        stats["throughput_mb_s"] = round(stats["bytes"] / elapsed / (1024 * 1024), 2) if elapsed > 0 else 0.0
+        return stats
+
+    # ---------------- Copy paths ----------------
+
+    def _supported(self, method: str, devices) -> bool:
+        return devices not in self._disabled[method]
+
+    def _disable(self, method: str, devices, error: OSError) -> bool:
+        """Remember an unsupported method for this device pair; False if error is a real failure."""
+        if error.errno in _UNSUPPORTED:
+            self._disabled[method].add(devices)
+            return True
+        return False
+
+    def _reflink(self, src_fd: int, dst_fd: int):
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)  # type: ignore[union-attr]
+
+    def _copy_file_range(self, src_fd: int, dst_fd: int, size: int):
+        copied = 0
+        while copied < size:
+            self.budget.consume(min(CHUNK_SIZE, size - copied))
+            n = os.copy_file_range(src_fd, dst_fd, min(CHUNK_SIZE, size - copied))
+            if n == 0:
+                break
+            copied += n
+        return copied
+
+    def _sendfile(self, src_fd: int, dst_fd: int, size: int):
+        copied = 0
+        while copied < size:
+            self.budget.consume(min(CHUNK_SIZE, size - copied))
+            n = os.sendfile(dst_fd, src_fd, copied, min(CHUNK_SIZE, size - copied))
+            if n == 0:
+                break
+            copied += n
+        return copied
+
+    def _userspace(self, src_fd: int, dst_fd: int):
+        copied = 0
+        while True:
+            chunk = os.read(src_fd, CHUNK_SIZE)
+            if not chunk:
+                return copied
+            self.budget.consume(len(chunk))
+            view = memoryview(chunk)
+            while view:
+                written = os.write(dst_fd, view)
+                view = view[written:]
+            copied += len(chunk)
+
+    def copy_file(self, src: str, dst: str) -> str:
+        """Copy src to dst (created or truncated). Returns the method used."""
+        src_fd = os.open(src, os.O_RDONLY)
+        try:
+            st = os.fstat(src_fd)
+            dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            try:
+                devices = (st.st_dev, os.fstat(dst_fd).st_dev)
+                size = st.st_size
+
+                if fcntl is not None and size and self._supported("reflink", devices):
+                    try:
+                        self._reflink(src_fd, dst_fd)
+                        self._record("reflink", size)
+                        return "reflink"
+                    except OSError as e:
+                        if not self._disable("reflink", devices, e):
+                            raise
+
+                if size >= LARGE_FILE_THRESHOLD:
+                    for method, func in (("copy_file_range", self._copy_file_range), ("sendfile", self._sendfile)):
+                        if not hasattr(os, method) or not self._supported(method, devices):
+                            continue
+                        try:
+                            copied = func(src_fd, dst_fd, size)
+                            self._record(method, copied)
+                            return method
+                        except OSError as e:
+                            if not self._disable(method, devices, e):
+                                raise
+                            # Nothing usable was written; start over from the beginning
+                            os.lseek(src_fd, 0, os.SEEK_SET)
+                            os.ftruncate(dst_fd, 0)
+                            os.lseek(dst_fd, 0, os.SEEK_SET)
+
+                copied = self._userspace(src_fd, dst_fd)
+                self._record("userspace", copied)
+                return "userspace"
+            finally:
+                os.close(dst_fd)
+        finally:
+            os.close(src_fd)
+
+    # ---------------- Pool ----------------
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="fim-copy")
+        return self._pool
+
+    def submit(self, func, *args):
+        """Run func on the engine's worker pool (used for hash + copy of one file)."""
+        return self.pool.submit(func, *args)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+copy_engine = CopyEngine()
@@ -1,10 +1,74 @@
+import threading
+from collections import Counter
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from datetime import datetime
-from typing import Dict, List, Tuple, cast
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple, cast
 
 from src.api.database.connection import FimSessionLocal
-from src.api.models.fim_models import Directory, FileMetadata
+from src.api.models.fim_models import ChangeRollup, Directory, FileMetadata
+
+ROLLUP_GRANULARITIES = ("minute", "hour", "day")
+ROLLUP_STATUSES = ("added", "modified", "deleted")
+
+
+def rollup_bucket(timestamp: datetime, granularity: str) -> datetime:
+    """Truncate a timestamp to the start of its minute/hour/day bucket."""
+    if granularity == "minute":
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown rollup granularity: {granularity}")
+
+
+class DirectoryIdCache:
+    """
+    Process-wide directory path -> ID map shared by every DatabaseOperation.
+    Loaded from the `directories` table on first use, then kept in sync on
+    create/delete. API request threads and the monitor thread share it, so
+    every access goes through the lock.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self, db: Session):
+        """Populate the cache with every known directory (once per process)."""
+        with self._lock:
+            if self._loaded:
+                return
+        rows = db.query(Directory.path, Directory.id).all()
+        with self._lock:
+            if not self._loaded:
+                for path, dir_id in rows:
+                    self._ids.setdefault(path, dir_id)
+                self._loaded = True
+
+    def get(self, directory_path: str) -> Optional[int]:
+        with self._lock:
+            return self._ids.get(directory_path)
+
+    def set(self, directory_path: str, dir_id: int):
+        with self._lock:
+            self._ids[directory_path] = dir_id
+
+    def discard(self, directory_path: str):
+        with self._lock:
+            self._ids.pop(directory_path, None)
+
+    def clear(self):
+        """Drop everything; the next lookup reloads from the database."""
+        with self._lock:
+            self._ids.clear()
+            self._loaded = False
+
+
+directory_id_cache = DirectoryIdCache()
 
 
 class DatabaseOperation:
@@ -26,12 +90,20 @@ class DatabaseOperation:
     def get_or_create_directory(self, directory_path: str) -> int:
         """Get or create a directory record, return its ID."""
         try:
+            directory_id_cache.load(self.db)
+            dir_id = directory_id_cache.get(directory_path)
+            if dir_id is not None:
+                return dir_id
+
+            # Cache miss: the row may have been created by another process
             directory = self.db.query(Directory).filter_by(path=directory_path).first()
             if not directory:
                 directory = Directory(path=directory_path)
                 self.db.add(directory)
                 self._commit()
-            return cast(int, directory.id)
+            dir_id = cast(int, directory.id)
+            directory_id_cache.set(directory_path, dir_id)
+            return dir_id
         except SQLAlchemyError as e:
             self.db.rollback()
             raise RuntimeError(f"Error in get_or_create_directory: {e}")
@@ -49,14 +121,115 @@ class DatabaseOperation:
         try:
             directory = self.db.query(Directory).filter_by(path=directory_path).first()
             if directory:
+                self.db.query(ChangeRollup).filter_by(directory_id=directory.id).delete(synchronize_session=False)
+                self.db.query(FileMetadata).filter_by(directory_id=directory.id).delete(synchronize_session=False)
                 self.db.delete(directory)
                 self._commit()
         except SQLAlchemyError as e:
             self.db.rollback()
             raise RuntimeError(f"Error deleting directory: {e}")
+        finally:
+            directory_id_cache.discard(directory_path)
 
     # ------------------ File Metadata Operations ------------------
 
+    @staticmethod
+    def _to_datetime(value) -> Optional[datetime]:
+        """Accept datetimes or '%Y-%m-%d %H:%M:%S' strings (SQLite only takes datetimes)."""
+        if value is None or isinstance(value, datetime):
+            return value
+        return datetime.strptime(str(value), "%Y-%m-%d %H:%M:%S")
+
+    @staticmethod
+    def _apply_event(file_entry: FileMetadata, item_hash: str, last_modified, status: str) -> bool:
+        """Update an existing row; return True if this is a new event (status or hash changed)."""
+        changed = file_entry.status != status or file_entry.hash != item_hash
+        if changed:
+            # Keep detected_at meaningful for keyset pagination and incremental exports
+            file_entry.detected_at = datetime.utcnow()  # type:ignore[assignment]
+        if file_entry.baseline_hash is None and file_entry.status == "current":
+            file_entry.baseline_hash = file_entry.hash
+        if status == "current":
+            # Only a baseline write moves the trusted hash; events keep it
+            file_entry.baseline_hash = item_hash  # type: ignore[assignment]
+        file_entry.hash = item_hash  # type: ignore[assignment]
+        file_entry.last_modified = last_modified  # type:ignore[assignment]
+        file_entry.status = status  # type: ignore[assignment]
+        return changed
+
+    # ------------------ Change Rollups ------------------
+
+    def _upsert_rollup(self, granularity: str, bucket_start: datetime, dir_id: int, status: str, count: int):
+        dialect = self.db.get_bind().dialect.name
+        values = dict(
+            granularity=granularity, bucket_start=bucket_start,
+            directory_id=dir_id, status=status, count=count
+        )
+
+        if dialect == "mysql":
+            from sqlalchemy.dialects.mysql import insert as mysql_insert
+            stmt = mysql_insert(ChangeRollup).values(**values)
+            self.db.execute(stmt.on_duplicate_key_update(count=ChangeRollup.count + count))
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+            stmt = sqlite_insert(ChangeRollup).values(**values)
+            self.db.execute(stmt.on_conflict_do_update(
+                index_elements=["granularity", "directory_id", "status", "bucket_start"],
+                set_={"count": ChangeRollup.count + count},
+            ))
+        else:
+            result = self.db.execute(
+                update(ChangeRollup)
+                .where(
+                    ChangeRollup.granularity == granularity,
+                    ChangeRollup.bucket_start == bucket_start,
+                    ChangeRollup.directory_id == dir_id,
+                    ChangeRollup.status == status,
+                )
+                .values(count=ChangeRollup.count + count)
+            )
+            if result.rowcount == 0:  # type: ignore[attr-defined]
+                self.db.add(ChangeRollup(**values))
+
+    def _bump_rollups(self, dir_id: int, counts: Dict[str, int], detected_at: Optional[datetime] = None):
+        """Add change counts to every rollup granularity, in the caller's transaction."""
+        detected_at = detected_at or datetime.utcnow()
+        for status, count in counts.items():
+            if status not in ROLLUP_STATUSES or not count:
+                continue
+            for granularity in ROLLUP_GRANULARITIES:
+                self._upsert_rollup(granularity, rollup_bucket(detected_at, granularity), dir_id, status, count)
+
+    def rebuild_change_rollups(self, batch_size: int = 10000) -> int:
+        """
+        Recompute all rollups from file_metadata (one-off backfill for history
+        recorded before rollups existed). Returns the number of events counted.
+        """
+        try:
+            counts: Counter = Counter()
+            rows = self.db.query(
+                FileMetadata.directory_id, FileMetadata.status, FileMetadata.detected_at
+            ).filter(FileMetadata.status.in_(ROLLUP_STATUSES)).yield_per(batch_size)
+
+            total = 0
+            for dir_id, status, detected_at in rows:
+                if detected_at is None:
+                    continue
+                total += 1
+                for granularity in ROLLUP_GRANULARITIES:
+                    counts[(granularity, rollup_bucket(detected_at, granularity), dir_id, status)] += 1
+
+            self.db.query(ChangeRollup).delete(synchronize_session=False)
+            self.db.bulk_insert_mappings(ChangeRollup, [  # type: ignore[arg-type]
+                dict(granularity=g, bucket_start=b, directory_id=d, status=st, count=n)
+                for (g, b, d, st), n in counts.items()
+            ])
+            self._commit()
+            return total
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            raise RuntimeError(f"Error rebuilding change rollups: {e}")
+
     def record_file_event(
         self,
         directory_path: str,
@@ -76,43 +249,160 @@ class DatabaseOperation:
             )
 
             if file_entry:
-                file_entry.hash = item_hash  # type: ignore[assignment]
-                file_entry.last_modified = last_modified  # type:ignore[assignment]
-                file_entry.status = status  # type: ignore[assignment]
+                is_new_event = self._apply_event(file_entry, item_hash, self._to_datetime(last_modified), status)
             else:
+                is_new_event = True
                 new_entry = FileMetadata(
                     directory_id=dir_id,
                     item_path=item_path,
                     item_type=item_type,
                     hash=item_hash,  # type: ignore[arg-type]
-                    last_modified=last_modified,
+                    baseline_hash=item_hash if status == "current" else None,  # type: ignore[arg-type]
+                    last_modified=self._to_datetime(last_modified),
                     status=status  # type: ignore[arg-type]
                 )
                 self.db.add(new_entry)
 
+            if is_new_event:
+                self._bump_rollups(dir_id, {status: 1})
             self._commit()
 
         except SQLAlchemyError as e:
             self.db.rollback()
             raise RuntimeError(f"Error recording file event: {e}")
 
+    def record_file_events(
+        self,
+        directory_path: str,
+        entries: Dict[str, dict],
+        status: str,
+        batch_size: int = 500,
+    ) -> int:
+        """
+        Insert or update many items of one directory with the same status.
+        `entries` maps item_path -> {"hash", "type", "last_modified"}.
+        Existing rows are fetched and the batch committed once per
+        `batch_size` items instead of once per item.
+        """
+        try:
+            dir_id = self.get_or_create_directory(directory_path)
+            items = list(entries.items())
+
+            for start in range(0, len(items), batch_size):
+                chunk = items[start:start + batch_size]
+                existing = {
+                    entry.item_path: entry
+                    for entry in self.db.query(FileMetadata).filter(
+                        FileMetadata.directory_id == dir_id,
+                        FileMetadata.item_path.in_([path for path, _ in chunk]),
+                    )
+                }
+
+                new_events = 0
+                for item_path, data in chunk:
+                    last_modified = self._to_datetime(data.get("last_modified"))
+                    file_entry = existing.get(item_path)
+                    if file_entry:
+                        new_events += self._apply_event(file_entry, data["hash"], last_modified, status)
+                    else:
+                        new_events += 1
+                        self.db.add(FileMetadata(
+                            directory_id=dir_id,
+                            item_path=item_path,
+                            item_type=data.get("type", "file"),
+                            hash=data["hash"],
+                            baseline_hash=data["hash"] if status == "current" else None,
+                            last_modified=last_modified,
+                            status=status
+                        ))
+
+                self._bump_rollups(dir_id, {status: new_events})
+                self._commit()
+
+            return len(items)
+
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            raise RuntimeError(f"Error recording file events: {e}")
+
     def get_current_baseline(self, directory_path: str) -> Dict[str, dict]:
         """Fetch baseline (current) files for a directory."""
         try:
             result = (
-                self.db.query(FileMetadata.item_path, FileMetadata.hash, FileMetadata.last_modified)
+                self.db.query(FileMetadata.item_path, FileMetadata.hash, FileMetadata.last_modified, FileMetadata.item_type)
                 .join(Directory)
                 .filter(Directory.path == directory_path, FileMetadata.status == "current")
                 .all()
             )
 
             return {
-                row[0]: {"hash": row[1], "last_modified": row[2]}
+                row[0]: {"hash": row[1], "last_modified": row[2], "type": row[3]}
                 for row in result
             }
         except SQLAlchemyError as e:
             raise RuntimeError(f"Error fetching current baseline: {e}")
 
+    def get_known_state(self, directory_path: str) -> Dict[str, dict]:
+        """
+        Last recorded state of every path in a directory that still exists:
+        the baseline plus already reported additions and modifications.
+        `hash` is the trusted (baseline) hash; flagged rows carry
+        `flagged=True` and their hash is None if no trusted one is known.
+        """
+        try:
+            result = (
+                self.db.query(FileMetadata.item_path, FileMetadata.hash, FileMetadata.baseline_hash,
+                              FileMetadata.last_modified, FileMetadata.item_type, FileMetadata.status)
+                .join(Directory)
+                .filter(Directory.path == directory_path, FileMetadata.status != "deleted")
+                .all()
+            )
+
+            return {
+                row[0]: {"hash": row[1] if row[5] == "current" else row[2], "last_modified": row[3], "type": row[4],
+                         "status": row[5], "flagged": row[5] != "current"}
+                for row in result
+            }
+        except SQLAlchemyError as e:
+            raise RuntimeError(f"Error fetching known state: {e}")
+
+    def get_flagged_hashes(self, directory_path: str, path_prefix: Optional[str] = None) -> Dict[str, str]:
+        """Hashes reported as added/modified (i.e. not trusted) under a directory, by path."""
+        try:
+            query = (
+                self.db.query(FileMetadata.item_path, FileMetadata.hash)
+                .join(Directory)
+                .filter(Directory.path == directory_path, FileMetadata.status.in_(("added", "modified")))
+            )
+            if path_prefix:
+                query = query.filter(FileMetadata.item_path.startswith(path_prefix, autoescape=True))
+            return {row[0]: row[1] for row in query.all()}
+        except SQLAlchemyError as e:
+            raise RuntimeError(f"Error fetching flagged hashes: {e}")
+
+    def get_baseline_entry(self, directory_path: str, item_path: str) -> Optional[dict]:
+        """
+        Trusted baseline of a single path that is not deleted, or None:
+        its baseline hash, even while the row is flagged with another one.
+        """
+        try:
+            row = (
+                self.db.query(FileMetadata.baseline_hash, FileMetadata.last_modified, FileMetadata.status)
+                .join(Directory)
+                .filter(
+                    Directory.path == directory_path,
+                    FileMetadata.item_path == item_path,
+                    FileMetadata.status != "deleted",
+                    FileMetadata.baseline_hash.isnot(None),
+                )
+                .first()
+            )
+            if row is None:
+                return None
+            return {"hash": row[0], "last_modified": row[1], "status": row[2]}
+        except SQLAlchemyError as e:
+            raise RuntimeError(f"Error fetching baseline entry: {e}")
+
     def get_file_history(self, file_path: str, limit: int = 10) -> List[Tuple]:
         """Fetch file modification history."""
         try:
@@ -142,9 +432,8 @@ class DatabaseOperation:
         try:
             file_entry = self.db.query(FileMetadata).filter_by(item_path=file_path).first()
             if file_entry:
-                file_entry.hash = new_hash  # type:ignore[assignment]
-                file_entry.last_modified = last_modified  # type:ignore[assignment]
-                file_entry.status = status  # type: ignore[assignment]
+                if self._apply_event(file_entry, new_hash, self._to_datetime(last_modified), status):
+                    self._bump_rollups(cast(int, file_entry.directory_id), {status: 1})
                 self._commit()
         except SQLAlchemyError as e:
             self.db.rollback()
@@ -155,6 +444,8 @@ class DatabaseOperation:
         try:
             file_entry = self.db.query(FileMetadata).filter_by(item_path=file_path).first()
             if file_entry:
+                if file_entry.status != "deleted":
+                    self._bump_rollups(cast(int, file_entry.directory_id), {"deleted": 1})
                 file_entry.status = "deleted"  # type: ignore[assignment]
                 file_entry.detected_at = datetime.utcnow()  # type:ignore[assignment]
                 self._commit()
@@ -165,15 +456,14 @@ class DatabaseOperation:
     def get_recent_changes(self, hours: int = 24) -> List[Tuple]:
         """Fetch recent file changes."""
         try:
-            from sqlalchemy import text
-            query = text(f"""
-                SELECT d.path, f.item_path, f.status, f.detected_at
-                FROM file_metadata f
-                JOIN directories d ON f.directory_id = d.id
-                WHERE f.detected_at >= NOW() - INTERVAL {hours} HOUR
-                ORDER BY f.detected_at DESC
-            """)
-            result = self.db.execute(query).fetchall()
+            cutoff = datetime.utcnow() - timedelta(hours=hours)
+            result = (
+                self.db.query(Directory.path, FileMetadata.item_path, FileMetadata.status, FileMetadata.detected_at)
+                .join(Directory, FileMetadata.directory_id == Directory.id)
+                .filter(FileMetadata.detected_at >= cutoff)
+                .order_by(FileMetadata.detected_at.desc())
+                .all()
+            )
             # convert Sequence[Row[Any]] to List[Tuple] for the annotated return type
             return [tuple(row) for row in result]
         except SQLAlchemyError as e:
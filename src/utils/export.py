@@ -0,0 +1,156 @@
+"""
+export.py
+----------
+Streaming NDJSON / CSV export of FIM baselines and change history.
+
+Rows are pulled through a server-side cursor (`yield_per`) and serialized one
+at a time, so memory stays flat no matter how many rows are exported.
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.api.models.fim_models import Directory, FileMetadata
+from src.api.services.fim_service import CHANGE_STATUSES
+
+EXPORT_KINDS = ("baseline", "changes")
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_COLUMNS = ["directory", "item_path", "item_type", "hash", "last_modified", "status", "detected_at"]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+_CHUNK_SIZE = 64 * 1024
+
+
+def export_query(kind: str, directory: Optional[str] = None, dialect: Optional[str] = None):
+    """
+    Baselines are ordered by (directory, item_path) in byte order so exports
+    are path-sorted (snapshot_diff merges them); change history is ordered
+    by (detected_at, id), oldest first.
+    """
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f"Unknown export kind: {kind}")
+
+    stmt = (
+        select(
+            Directory.path.label("directory"),
+            FileMetadata.item_path,
+            FileMetadata.item_type,
+            FileMetadata.hash,
+            FileMetadata.last_modified,
+            FileMetadata.status,
+            FileMetadata.detected_at,
+            FileMetadata.id,
+        )
+        .join(Directory, FileMetadata.directory_id == Directory.id)
+    )
+    if directory:
+        stmt = stmt.where(Directory.path == directory)
+
+    if kind == "baseline":
+        directory_order, path_order = Directory.path, FileMetadata.item_path
+        if dialect == "mysql":
+            # The default collation is case-insensitive; the merge needs byte order
+            directory_order = Directory.path.collate("utf8mb4_bin")
+            path_order = FileMetadata.item_path.collate("utf8mb4_bin")
+        stmt = stmt.where(FileMetadata.status == "current").order_by(directory_order, path_order)
+    else:
+        stmt = stmt.where(FileMetadata.status.in_(CHANGE_STATUSES)).order_by(
+            FileMetadata.detected_at, FileMetadata.id
+        )
+    return stmt
+
+
+def iter_export_rows(db: Session, kind: str, directory: Optional[str] = None, batch_size: int = 1000):
+    """Yield export rows through a server-side cursor, batch_size rows at a time."""
+    stmt = export_query(kind, directory, db.get_bind().dialect.name).execution_options(yield_per=batch_size)
+    yield from db.execute(stmt)
+
+
+def _serialize_value(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return value
+
+
+def iter_ndjson(rows: Iterable) -> Iterator[str]:
+    for row in rows:
+        record = {column: _serialize_value(getattr(row, column)) for column in EXPORT_COLUMNS}
+        yield json.dumps(record, separators=(",", ":")) + "\n"
+
+
+def iter_csv(rows: Iterable) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def _flush():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return line
+
+    writer.writerow(EXPORT_COLUMNS)
+    yield _flush()
+    for row in rows:
+        writer.writerow([_serialize_value(getattr(row, column)) for column in EXPORT_COLUMNS])
+        yield _flush()
+
+
+def serialize_rows(rows: Iterable, fmt: str) -> Iterator[str]:
+    if fmt == "ndjson":
+        return iter_ndjson(rows)
+    if fmt == "csv":
+        return iter_csv(rows)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def encode_stream(lines: Iterable[str], compress: bool = False) -> Iterator[bytes]:
+    """
+    Encode text lines to ~64KB byte chunks, optionally gzip-compressed on the fly.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    pending = []
+    pending_size = 0
+
+    for line in lines:
+        data = line.encode("utf-8")
+        pending.append(data)
+        pending_size += len(data)
+        if pending_size >= _CHUNK_SIZE:
+            chunk = b"".join(pending)
+            pending, pending_size = [], 0
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+    chunk = b"".join(pending)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def stream_export(db: Session, kind: str, fmt: str, directory: Optional[str] = None,
+                  compress: bool = False) -> Iterator[bytes]:
+    """Yield the encoded export as byte chunks."""
+    rows = iter_export_rows(db, kind, directory)
+    return encode_stream(serialize_rows(rows, fmt), compress)
+
+
+def export_to_file(db: Session, kind: str, fmt: str, output_path: str,
+                   directory: Optional[str] = None, compress: bool = False) -> int:
+    """Write an export to output_path and return the number of bytes written."""
+    written = 0
+    with open(output_path, "wb") as f:
+        for chunk in stream_export(db, kind, fmt, directory, compress):
+            f.write(chunk)
+            written += len(chunk)
+    return written
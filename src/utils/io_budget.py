@@ -0,0 +1,50 @@
+"""
+io_budget.py
+-------------
+Process-wide disk read budget shared by baseline scans, verification and
+backups, so a backup or rescan of a large tree cannot saturate the disk
+the monitored services depend on.
+
+Token bucket in bytes: `consume(n)` returns immediately while there is
+budget and otherwise sleeps until the debt is paid off. A rate of 0 (the
+default) disables throttling. Configure with FIM_IO_BUDGET_MBPS.
+"""
+
+import os
+import threading
+import time
+
+
+class IOBudget:
+    def __init__(self, bytes_per_second: float = 0, burst_seconds: float = 1.0):
+        self.rate = float(bytes_per_second)
+        self.burst = self.rate * burst_seconds
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def set_rate(self, bytes_per_second: float, burst_seconds: float = 1.0):
+        with self._lock:
+            self.rate = float(bytes_per_second)
+            self.burst = self.rate * burst_seconds
+            self._tokens = min(self._tokens, self.burst)
+
+    def consume(self, nbytes: int):
+        """Charge nbytes against the budget, sleeping if it is overdrawn."""
+        if self.rate <= 0 or nbytes <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= nbytes
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+io_budget = IOBudget(float(os.getenv("FIM_IO_BUDGET_MBPS", "0")) * 1024 * 1024)
@@ -0,0 +1,193 @@
+"""
+jobs.py
+--------
+Background job manager for long FIM operations (baseline scans, resets,
+monitor start-up, verifications).
+
+Jobs run on a small worker pool instead of request workers. Each job
+reports progress (files and bytes processed, ETA) and can be cancelled
+cooperatively: the job function calls `job.check_cancelled()` between units
+of work.
+"""
+
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation was requested."""
+
+
+class JobLimitExceeded(Exception):
+    """Raised by JobManager.submit when the queue is full."""
+
+
+class Job:
+    def __init__(self, kind: str, params: Optional[Dict[str, Any]] = None, user: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.user = user
+        self.status = QUEUED
+        self.message = ""
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+        self.files_total = 0
+        self.files_done = 0
+        self.bytes_total = 0
+        self.bytes_done = 0
+
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    # ---------------- Progress (called from the job) ----------------
+
+    def set_total(self, files: int = 0, bytes_: int = 0):
+        with self._lock:
+            self.files_total += files
+            self.bytes_total += bytes_
+
+    def advance(self, files: int = 0, bytes_: int = 0):
+        with self._lock:
+            self.files_done += files
+            self.bytes_done += bytes_
+
+    def set_message(self, message: str):
+        self.message = message
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.id} cancelled")
+
+    # ---------------- Control ----------------
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def eta_seconds(self) -> Optional[float]:
+        """Linear ETA from bytes (or files when sizes are unknown)."""
+        if self.status != RUNNING or not self.started_at:
+            return None
+        done, total = (self.bytes_done, self.bytes_total) if self.bytes_total else (self.files_done, self.files_total)
+        if not total or not done:
+            return None
+        elapsed = time.time() - self.started_at
+        return max(0.0, elapsed * (total - done) / done)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            progress = {
+                "files_done": self.files_done,
+                "files_total": self.files_total,
+                "bytes_done": self.bytes_done,
+                "bytes_total": self.bytes_total,
+            }
+        eta = self.eta_seconds()
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "user": self.user,
+            "params": self.params,
+            "message": self.message,
+            "progress": progress,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    def __init__(self, max_workers: int = 2, max_queued: int = 16, history_size: int = 200):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.history_size = history_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fim-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, func: Callable[..., Any], *args, params: Optional[Dict[str, Any]] = None,
+               user: Optional[str] = None, **kwargs) -> Job:
+        """
+        Queue func(job, *args, **kwargs). The return value becomes job.result.
+        Raises JobLimitExceeded when running + queued jobs are at the limit.
+        """
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if job.status not in FINISHED_STATES)
+            if active >= self.max_workers + self.max_queued:
+                raise JobLimitExceeded(f"Too many active jobs ({active})")
+            job = Job(kind, params, user)
+            self._jobs[job.id] = job
+            self._prune()
+
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job: Job, func, args, kwargs):
+        if job.cancel_requested:
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = func(job, *args, **kwargs)
+            job.status = COMPLETED
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.status = FAILED
+            job.error = f"{e}"
+            traceback.print_exc()
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATES]
+        for job_id in finished[:max(0, len(self._jobs) - self.history_size)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.get(job_id)
+        if job and job.status not in FINISHED_STATES:
+            job.cancel()
+        return job
+
+
+job_manager = JobManager(
+    max_workers=int(os.getenv("FIM_JOB_WORKERS", "2")),
+    max_queued=int(os.getenv("FIM_JOB_QUEUE", "16")),
+)
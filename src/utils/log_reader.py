@@ -0,0 +1,293 @@
+"""
+log_reader.py
+--------------
+Windowed reads of the text FIM logs.
+
+A directory's log is a chain of segments: the rotated `FIM_x.log.<stamp>`
+files, oldest first, then the active `FIM_x.log`. Each segment has a sparse
+`.idx` of (record time, byte offset) pairs written by the log sink. Reads
+use it to seek straight to the requested window:
+
+- read_window(): records from `since` (or a cursor) forward, up to `limit`,
+  optionally stopping at `until`; returns a cursor for the next page
+- tail(): the last `n` records (optionally before `until`), read backwards
+  from the end in blocks
+
+Neither reads more of the file than the window, plus at most one index
+interval in front of it. A level filter can make the scan longer because
+it skips records that do not match.
+"""
+
+import base64
+import json
+import os
+import re
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.config.logging_config import INDEX_ENTRY, LOG_INDEX_INTERVAL, LOG_TIMEZONE
+
+LINE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) \| (\w+) \| (.*?) \| (.*)$")
+SEGMENT_SUFFIX_RE = re.compile(r"^\d{8}T\d{6}(-\d+)?$")
+BLOCK_SIZE = 64 * 1024
+
+
+def to_epoch(value: datetime) -> float:
+    """Epoch seconds of value; naive datetimes are taken as log-timezone time."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=LOG_TIMEZONE)
+    return value.timestamp()
+
+
+def parse_line(line: str) -> Optional[dict]:
+    """Fields of a record's first line, or None for a continuation line."""
+    match = LINE_RE.match(line)
+    if not match:
+        return None
+    timestamp, level, username, message = match.groups()
+    return {
+        "timestamp": timestamp,
+        "ts": to_epoch(datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")),
+        "level": level,
+        "username": username,
+        "message": message,
+    }
+
+
+def encode_cursor(segment: str, offset: int, started: Optional[float]) -> str:
+    """Opaque page cursor: segment name, byte offset and the segment's first indexed time."""
+    raw = json.dumps({"s": os.path.basename(segment), "o": offset, "t": started}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int, Optional[float]]:
+    """(segment name, offset, segment start); raises ValueError if malformed."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(payload["s"]), int(payload["o"]), payload.get("t")
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def segment_started(segment: str, active: bool) -> Optional[float]:
+    """Time of a segment's first record, from the first entry of its index."""
+    try:
+        with open(f"{segment}.idx", "rb") as f:
+            data = f.read(INDEX_ENTRY.size)
+    except FileNotFoundError:
+        index = load_index(segment, active)
+        return index[0][0] if index else None
+    return INDEX_ENTRY.unpack(data)[0] if len(data) == INDEX_ENTRY.size else None
+
+
+def segments(log_path: str) -> List[str]:
+    """Segments of a log, oldest first (rotated ones, then the active file)."""
+    folder, name = os.path.split(log_path)
+    rotated = []
+    if os.path.isdir(folder):
+        for entry in os.listdir(folder):
+            if entry.startswith(name + ".") and SEGMENT_SUFFIX_RE.match(entry[len(name) + 1:]):
+                rotated.append(os.path.join(folder, entry))
+    rotated.sort()
+    if os.path.exists(log_path):
+        rotated.append(log_path)
+    return rotated
+
+
+def chains(folder: str) -> Dict[str, List[str]]:
+    """segments() of every active log in folder, keyed by log path, from one listing."""
+    if not os.path.isdir(folder):
+        return {}
+    active, rotated = set(), {}
+    for entry in os.listdir(folder):
+        if entry.endswith(".log"):
+            active.add(entry)
+            continue
+        name, _, suffix = entry.rpartition(".")
+        if name.endswith(".log") and SEGMENT_SUFFIX_RE.match(suffix):
+            rotated.setdefault(name, []).append(os.path.join(folder, entry))
+    return {os.path.join(folder, name): sorted(rotated.get(name, [])) + [os.path.join(folder, name)]
+            for name in sorted(active)}
+
+
+def _build_index(segment: str) -> List[Tuple[float, int]]:
+    """Index a rotated segment written before indexing existed (one scan, then cached)."""
+    index: List[Tuple[float, int]] = []
+    position = 0
+    last = None
+    with open(segment, "rb") as f:
+        for raw in f:
+            fields = parse_line(raw.decode("utf-8", "replace").rstrip("\n"))
+            if fields and (last is None or position - last >= LOG_INDEX_INTERVAL):
+                index.append((fields["ts"], position))
+                last = position
+            position += len(raw)
+    with open(f"{segment}.idx", "wb") as f:
+        for entry in index:
+            f.write(INDEX_ENTRY.pack(*entry))
+    return index
+
+
+def load_index(segment: str, active: bool = False) -> List[Tuple[float, int]]:
+    """(time, offset) pairs of a segment. A missing index is built for rotated segments only."""
+    try:
+        with open(f"{segment}.idx", "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return [] if active else _build_index(segment)
+    usable = len(data) - len(data) % INDEX_ENTRY.size
+    return [INDEX_ENTRY.unpack_from(data, i) for i in range(0, usable, INDEX_ENTRY.size)]
+
+
+def _seek_offset(index: Sequence[Tuple[float, int]], since: float) -> int:
+    """Offset of the last indexed record strictly before `since` (records in the same second may precede it)."""
+    lo, hi = 0, len(index)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if index[mid][0] < since:
+            lo = mid + 1
+        else:
+            hi = mid
+    return index[lo - 1][1] if lo else 0
+
+
+def _matches(record: dict, since: Optional[float], until: Optional[float], levels) -> bool:
+    if since is not None and record["ts"] < since:
+        return False
+    if until is not None and record["ts"] > until:
+        return False
+    return not levels or record["level"] in levels
+
+
+def forward_records(segment: str, offset: int) -> Iterator[Tuple[int, dict]]:
+    """(start offset, record) from offset to the last complete line of a segment."""
+    with open(segment, "rb") as f:
+        f.seek(offset)
+        position = offset
+        current, start = None, offset
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break  # being written
+            line = raw.decode("utf-8", "replace").rstrip("\n")
+            fields = parse_line(line)
+            if fields is not None:
+                if current is not None:
+                    yield start, current
+                current, start = fields, position
+            elif current is not None:
+                current["message"] += "\n" + line
+            position += len(raw)
+        if current is not None:
+            yield start, current
+        # End marker so callers know where reading stopped
+        yield position, None
+
+
+def read_window(log_path: str, since: Optional[float] = None, until: Optional[float] = None,
+                levels: Optional[Sequence[str]] = None, limit: int = 100,
+                cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Up to `limit` records at or after `since` (or after `cursor`) and not
+    after `until`, oldest first, plus the cursor of the next page (None once
+    the end of the log or `until` is reached).
+    """
+    chain = segments(log_path)
+    levels = {level.upper() for level in levels} if levels else None
+    if not chain:
+        return [], None
+
+    first, offset = 0, 0
+    if cursor:
+        name, offset, started = decode_cursor(cursor)
+        names = [os.path.basename(segment) for segment in chain]
+        if name in names and segment_started(chain[names.index(name)], chain[names.index(name)] == log_path) == started:
+            first = names.index(name)
+        else:
+            # The active file was rotated since: find its segment by start time
+            renamed = [i for i, segment in enumerate(chain)
+                       if started is not None and segment_started(segment, segment == log_path) == started]
+            if renamed:
+                first = renamed[0]
+            else:
+                first = next((i for i, n in enumerate(names) if n > name), len(chain) - 1)
+                offset = 0
+    elif since is not None:
+        # Every record of segment i is no later than the first record of segment i + 1
+        indexes = [load_index(segment, segment == log_path) for segment in chain]
+        while first + 1 < len(chain) and indexes[first + 1] and indexes[first + 1][0][0] < since:
+            first += 1
+        offset = _seek_offset(indexes[first], since)
+
+    records: List[dict] = []
+    for i in range(first, len(chain)):
+        for start, record in forward_records(chain[i], offset if i == first else 0):
+            if record is None:
+                break
+            if until is not None and record["ts"] > until:
+                return records, None
+            if len(records) >= limit:
+                return records, encode_cursor(chain[i], start, segment_started(chain[i], chain[i] == log_path))
+            if _matches(record, since, until, levels):
+                records.append(record)
+    return records, None
+
+
+def _reverse_lines(segment: str, end: int) -> Iterator[bytes]:
+    """Lines of segment before byte offset `end`, last first, read in blocks."""
+    with open(segment, "rb") as f:
+        position, carry = end, b""
+        while position > 0:
+            size = min(BLOCK_SIZE, position)
+            position -= size
+            f.seek(position)
+            lines = (f.read(size) + carry).split(b"\n")
+            carry = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line
+        if carry:
+            yield carry
+
+
+def tail(log_path: str, n: int = 100, until: Optional[float] = None,
+         levels: Optional[Sequence[str]] = None) -> List[dict]:
+    """The last n records (not after `until`), oldest first."""
+    levels = {level.upper() for level in levels} if levels else None
+    found: List[dict] = []
+    for segment in reversed(segments(log_path)):
+        active = segment == log_path
+        end = os.path.getsize(segment)
+        if until is not None:
+            index = load_index(segment, active)
+            if index and index[0][0] > until:
+                continue
+            # First indexed record after `until`: nothing from there on can match
+            later = [offset for ts, offset in index if ts > until]
+            if later:
+                end = later[0]
+        if active:
+            # Drop a line still being written
+            with open(segment, "rb") as f:
+                f.seek(max(0, end - 1))
+                if end and f.read(1) != b"\n":
+                    end = max(0, end - len(next(_reverse_lines(segment, end), b"")))
+        continuation: List[str] = []
+        for raw in _reverse_lines(segment, end):
+            line = raw.decode("utf-8", "replace")
+            fields = parse_line(line)
+            if fields is None:
+                continuation.append(line)
+                continue
+            if continuation:
+                fields["message"] += "\n" + "\n".join(reversed(continuation))
+                continuation = []
+            if _matches(fields, None, until, levels):
+                found.append(fields)
+                if len(found) >= n:
+                    return list(reversed(found))
+    return list(reversed(found))
+
+
+def format_record(record: dict) -> str:
+    """A record back in the text log format."""
+    return f"{record['timestamp']} | {record['level']} | {record['username']} | {record['message']}"
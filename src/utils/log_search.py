@@ -0,0 +1,301 @@
+"""
+log_search.py
+--------------
+Full-text search index over the FIM text logs.
+
+Log records are parsed (see src.utils.log_reader) into
+`logs/log_search.db`, a SQLite database:
+
+- `records` holds timestamp, level, username, directory, path and message,
+  with B-tree indexes for path, user, directory, level and time filters
+- `records_fts` is an FTS5 index over message and path that stores no
+  content of its own (content='records'), for word and phrase queries
+- `progress` records, per log, the segment and byte offset indexed so far,
+  so each update only parses what was appended or rotated since
+
+The API keeps the index current from a background thread that updates it
+every FIM_LOG_SEARCH_INTERVAL seconds, so searches only read the database.
+Each update lists the logs folder once and remembers segment start times.
+
+The directory of a record comes from the "Initialized FIM logging for:"
+line at the top of each log, and the path from the end of the message
+(e.g. "File modified: /etc/passwd").
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.config.logging_config import LOG_TIMEZONE, LOGS_DIR
+from src.utils import log_reader
+
+INDEX_BATCH_SIZE = 5000
+UPDATE_INTERVAL = float(os.getenv("FIM_LOG_SEARCH_INTERVAL", "10"))
+SEARCH_DB_PATH = os.path.join(LOGS_DIR, "log_search.db")
+
+_PATH_RE = re.compile(r"(?:^|\s)(/\S*|[A-Za-z]:\\\S*)")
+_DIRECTORY_RE = re.compile(r"^Initialized FIM logging for: (.+)$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    level TEXT NOT NULL,
+    username TEXT,
+    directory TEXT,
+    path TEXT,
+    message TEXT NOT NULL,
+    log TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_records_ts ON records (ts);
+CREATE INDEX IF NOT EXISTS ix_records_path ON records (path, ts);
+CREATE INDEX IF NOT EXISTS ix_records_user ON records (username, ts);
+CREATE INDEX IF NOT EXISTS ix_records_directory ON records (directory, ts);
+CREATE INDEX IF NOT EXISTS ix_records_level ON records (level, ts);
+CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(
+    message, path, content='records', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS progress (
+    log TEXT PRIMARY KEY,
+    segment TEXT,
+    started REAL,
+    offset INTEGER NOT NULL,
+    directory TEXT
+);
+"""
+
+
+def extract_path(message: str) -> Optional[str]:
+    """Path a record is about: the text after the last ': ', else the first absolute path."""
+    first_line = message.split("\n", 1)[0]
+    head, sep, tail = first_line.rpartition(": ")
+    if sep and (tail.startswith("/") or re.match(r"^[A-Za-z]:\\", tail)):
+        return tail.strip()
+    match = _PATH_RE.search(first_line)
+    return match.group(1) if match else None
+
+
+class LogSearchIndex:
+    def __init__(self, db_path: str = SEARCH_DB_PATH, logs_dir: str = LOGS_DIR):
+        self.db_path = db_path
+        self.logs_dir = logs_dir
+        self._local = threading.local()
+        self._update_lock = threading.Lock()
+        # segment path -> (inode, start time); a rotation gives the active path a new inode
+        self._started: Dict[str, Tuple[int, float]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        conn = self._conn()
+        with conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------------- Indexing ----------------
+
+    def logs(self) -> List[str]:
+        """Active log files (each the head of a segment chain)."""
+        return list(log_reader.chains(self.logs_dir))
+
+    def update(self) -> int:
+        """Index everything appended to the logs since the last update. Returns new records."""
+        with self._update_lock:
+            chains = log_reader.chains(self.logs_dir)
+            present = {segment for chain in chains.values() for segment in chain}
+            for segment in self._started.keys() - present:
+                del self._started[segment]
+            return sum(self._update_log(log_path, chain) for log_path, chain in chains.items())
+
+    def _segment_started(self, segment: str, active: bool) -> Optional[float]:
+        try:
+            inode = os.stat(segment).st_ino
+        except FileNotFoundError:
+            return None
+        cached = self._started.get(segment)
+        if cached is not None and cached[0] == inode:
+            return cached[1]
+        started = log_reader.segment_started(segment, active)
+        if started is not None:
+            self._started[segment] = (inode, started)
+        return started
+
+    def _update_log(self, log_path: str, chain: List[str]) -> int:
+        conn = self._conn()
+        name = os.path.basename(log_path)
+        row = conn.execute("SELECT segment, started, offset, directory FROM progress WHERE log = ?", (name,)).fetchone()
+        started_of = {segment: self._segment_started(segment, segment == log_path) for segment in chain}
+
+        first, offset, directory = 0, 0, None
+        if row is not None:
+            segment_name, started, offset, directory = row
+            matches = [i for i, segment in enumerate(chain)
+                       if started is not None and started_of[segment] == started]
+            if not matches:
+                matches = [i for i, segment in enumerate(chain) if os.path.basename(segment) == segment_name]
+            if matches:
+                first = matches[0]
+            else:
+                # Indexed segment is gone; resume at the oldest remaining one
+                offset = 0
+        if directory is None and name.startswith("FIM_"):
+            directory = name[len("FIM_"):-len(".log")]
+
+        added = 0
+        for i in range(first, len(chain)):
+            segment = chain[i]
+            start = offset if i == first else 0
+            if start >= os.path.getsize(segment):
+                continue
+            batch = []
+            end = start
+            for end, record in log_reader.forward_records(segment, start):
+                if len(batch) >= INDEX_BATCH_SIZE:
+                    # `end` is where the next record starts: everything before it is in the batch
+                    added += self._insert(batch, (name, os.path.basename(segment), started_of[segment], end, directory))
+                    batch = []
+                if record is None:
+                    break
+                match = _DIRECTORY_RE.match(record["message"])
+                if match:
+                    directory = match.group(1).strip()
+                batch.append((record["ts"], record["level"], record["username"], directory,
+                              extract_path(record["message"]), record["message"], name))
+            added += self._insert(batch, (name, os.path.basename(segment), started_of[segment], end, directory))
+        return added
+
+    def _insert(self, batch: List[tuple], progress: tuple) -> int:
+        """Insert a batch and move the log's progress in the same transaction."""
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO progress (log, segment, started, offset, directory) VALUES (?, ?, ?, ?, ?)",
+                progress,
+            )
+            if not batch:
+                return 0
+            cursor = conn.execute("SELECT COALESCE(MAX(id), 0) FROM records")
+            first_id = cursor.fetchone()[0] + 1
+            conn.executemany(
+                "INSERT INTO records (id, ts, level, username, directory, path, message, log)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(first_id + i, *row) for i, row in enumerate(batch)],
+            )
+            conn.executemany(
+                "INSERT INTO records_fts (rowid, message, path) VALUES (?, ?, ?)",
+                [(first_id + i, row[5], row[4] or "") for i, row in enumerate(batch)],
+            )
+        return len(batch)
+
+    def rebuild(self) -> int:
+        """Drop the index and re-read every log from the start."""
+        with self._update_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute("DELETE FROM progress")
+                conn.execute("DELETE FROM records")
+                conn.execute("INSERT INTO records_fts (records_fts) VALUES ('delete-all')")
+        return self.update()
+
+    def start(self, interval: float = UPDATE_INTERVAL):
+        """Update the index every `interval` seconds from a daemon thread (no-op if running)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="fim-log-indexer", daemon=True)
+        self._thread.start()
+
+    def _run(self, interval: float):
+        while True:
+            try:
+                self.update()
+            except Exception as e:
+                print(f"Log index update failed: {e}")
+            if self._stop.wait(interval):
+                return
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # ---------------- Queries ----------------
+
+    def search(self, text: Optional[str] = None, path: Optional[str] = None, user: Optional[str] = None,
+               directory: Optional[str] = None, levels: Optional[Sequence[str]] = None,
+               since: Optional[float] = None, until: Optional[float] = None, limit: int = 100) -> List[Dict]:
+        """
+        Records matching every given filter, newest first.
+        `text` is an FTS5 query over message and path (words, "phrases",
+        prefix*, AND/OR/NOT); `path` matches the path or anything under it.
+        Raises ValueError for a malformed text query.
+        """
+        clauses, params = [], []
+        source = "records r"
+        if text:
+            source = "records_fts f JOIN records r ON r.id = f.rowid"
+            clauses.append("records_fts MATCH ?")
+            params.append(text)
+        if path:
+            path = path.rstrip("/\\") or path
+            clauses.append("(r.path = ? OR (r.path >= ? AND r.path < ?))")
+            params += [path, path + "/", path + "0"]
+        if user:
+            clauses.append("r.username = ?")
+            params.append(user)
+        if directory:
+            clauses.append("r.directory = ?")
+            params.append(directory)
+        if levels:
+            clauses.append(f"r.level IN ({','.join('?' * len(levels))})")
+            params += [level.upper() for level in levels]
+        if since is not None:
+            clauses.append("r.ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("r.ts <= ?")
+            params.append(until)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = (f"SELECT r.ts, r.level, r.username, r.directory, r.path, r.message, r.log FROM {source} {where}"
+                 " ORDER BY r.ts DESC, r.id DESC LIMIT ?")
+        try:
+            rows = self._conn().execute(query, params + [limit]).fetchall()
+        except sqlite3.OperationalError as e:
+            if text:
+                raise ValueError(f"Invalid search query: {e}")
+            raise
+        return [
+            {"timestamp": datetime.fromtimestamp(ts, LOG_TIMEZONE).strftime("%Y-%m-%d %H:%M:%S"), "ts": ts, "level": level,
+             "username": username, "directory": directory_, "path": path_, "message": message, "log": log}
+            for ts, level, username, directory_, path_, message, log in rows
+        ]
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        records = conn.execute("SELECT COALESCE(MAX(id), 0) FROM records").fetchone()[0]
+        return {"records": records, "logs": conn.execute("SELECT COUNT(*) FROM progress").fetchone()[0],
+                "db_bytes": os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0}
+
+
+_index: Optional[LogSearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_log_search_index() -> LogSearchIndex:
+    """Process-wide index, opened on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = LogSearchIndex()
+        return _index
@@ -0,0 +1,253 @@
+"""
+pack_store.py
+--------------
+Compressed pack files for the backup object store.
+
+Millions of small config files waste disk blocks and inodes as loose
+objects. With packing enabled, small objects are streamed into large pack
+files instead, each object compressed as its own frame so a single file can
+be read back without decompressing the rest of the pack.
+
+    packs/pack-<id>.pack   b"FIMPACK1" + codec name (8 bytes), then frames
+    packs/pack-<id>.idx    b"FIMIDX01" + codec + count, then fixed-size
+                           records sorted by digest:
+                           digest (32) | offset (8) | length (8) | size (8)
+
+Lookups binary-search the memory-mapped index. A pack only becomes visible
+once its index is written, so a crash mid-pack leaves an orphan .pack that
+is ignored.
+
+Codecs: zlib and lzma from the standard library, zstd when the `zstandard`
+package is installed ("auto" picks zstd if available, else zlib).
+"""
+
+import lzma
+import mmap
+import os
+import struct
+import threading
+import uuid
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+PACK_MAGIC = b"FIMPACK1"
+INDEX_MAGIC = b"FIMIDX01"
+CODEC_WIDTH = 8
+RECORD = struct.Struct(">32sQQQ")
+INDEX_HEADER = struct.Struct(f">8s{CODEC_WIDTH}sQ")
+
+PACK_TARGET_SIZE = 256 * 1024 * 1024
+PACK_MAX_OBJECT = 1024 * 1024
+PACK_CODECS = ("zlib", "lzma", "zstd")
+
+
+def _require_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstd packs require the zstandard package (pip install zstandard)")
+    return zstandard
+
+
+def zstd_available() -> bool:
+    try:
+        _require_zstandard()
+        return True
+    except RuntimeError:
+        return False
+
+
+def resolve_codec(codec: str) -> str:
+    if codec == "auto":
+        return "zstd" if zstd_available() else "zlib"
+    if codec not in PACK_CODECS:
+        raise ValueError(f"Unknown pack codec: {codec}")
+    if codec == "zstd":
+        _require_zstandard()
+    return codec
+
+
+def compress(codec: str, data: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.compress(data, 6)
+    if codec == "lzma":
+        return lzma.compress(data, preset=6)
+    return _require_zstandard().ZstdCompressor(level=10).compress(data)
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "lzma":
+        return lzma.decompress(data)
+    return _require_zstandard().ZstdDecompressor().decompress(data)
+
+
+class PackIndex:
+    """Read-only, memory-mapped view of one pack's index."""
+
+    def __init__(self, idx_path: str):
+        self.idx_path = idx_path
+        self.pack_path = idx_path[:-4] + ".pack"
+        with open(idx_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, codec, self.count = INDEX_HEADER.unpack_from(self._mmap, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"Not a pack index: {idx_path}")
+        self.codec = codec.rstrip(b"\0").decode()
+
+    def _record(self, i: int):
+        return RECORD.unpack_from(self._mmap, INDEX_HEADER.size + i * RECORD.size)
+
+    def lookup(self, digest: str) -> Optional[Tuple[int, int, int]]:
+        """(offset, length, size) of digest in the pack, or None."""
+        key = bytes.fromhex(digest)
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record = self._record(mid)
+            if record[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count:
+            record = self._record(lo)
+            if record[0] == key:
+                return record[1], record[2], record[3]
+        return None
+
+    def close(self):
+        self._mmap.close()
+
+
+class PackWriter:
+    """Appends compressed frames to one pack file; finish() writes its index."""
+
+    def __init__(self, packs_root: str, codec: str):
+        self.codec = codec
+        self.pack_path = os.path.join(packs_root, f"pack-{uuid.uuid4().hex}.pack")
+        self._file = open(self.pack_path, "wb")
+        self._file.write(PACK_MAGIC + codec.encode().ljust(CODEC_WIDTH, b"\0"))
+        self.entries: Dict[str, Tuple[int, int, int]] = {}
+
+    @property
+    def size(self) -> int:
+        return self._file.tell()
+
+    def add(self, digest: str, frame: bytes, size: int) -> int:
+        """Append one compressed frame. Returns its length."""
+        offset = self._file.tell()
+        self._file.write(frame)
+        self.entries[digest] = (offset, len(frame), size)
+        return len(frame)
+
+    def read(self, digest: str) -> Optional[bytes]:
+        """Read back an object that is not yet visible through an index."""
+        location = self.entries.get(digest)
+        if location is None:
+            return None
+        self._file.flush()
+        with open(self.pack_path, "rb") as f:
+            f.seek(location[0])
+            return decompress(self.codec, f.read(location[1]))
+
+    def finish(self) -> Optional[str]:
+        """fsync the pack, write its sorted index atomically; returns the index path."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        if not self.entries:
+            os.remove(self.pack_path)
+            return None
+
+        idx_path = self.pack_path[:-5] + ".idx"
+        with open(f"{idx_path}.tmp", "wb") as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, self.codec.encode().ljust(CODEC_WIDTH, b"\0"), len(self.entries)))
+            for digest in sorted(self.entries):
+                offset, length, size = self.entries[digest]
+                f.write(RECORD.pack(bytes.fromhex(digest), offset, length, size))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{idx_path}.tmp", idx_path)
+        return idx_path
+
+
+class PackStore:
+    def __init__(self, packs_root: str, codec: str = "auto", target_size: int = PACK_TARGET_SIZE):
+        self.packs_root = packs_root
+        self.codec = resolve_codec(codec)
+        self.target_size = target_size
+        os.makedirs(packs_root, exist_ok=True)
+        self._indexes: List[PackIndex] = []
+        self._loaded: set = set()
+        self._writer: Optional[PackWriter] = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """Pick up indexes written since the last scan (e.g. by another process)."""
+        for name in sorted(os.listdir(self.packs_root)):
+            if name.endswith(".idx") and name not in self._loaded:
+                self._indexes.append(PackIndex(os.path.join(self.packs_root, name)))
+                self._loaded.add(name)
+
+    def _find(self, digest: str):
+        for index in self._indexes:
+            location = index.lookup(digest)
+            if location is not None:
+                return index, location
+        return None
+
+    def has(self, digest: str) -> bool:
+        with self._lock:
+            if self._writer is not None and digest in self._writer.entries:
+                return True
+            return self._find(digest) is not None
+
+    def add(self, digest: str, data: bytes) -> int:
+        """Pack one object (no-op if already packed). Returns compressed bytes written."""
+        if self.has(digest):
+            return 0
+        # Compress outside the lock so copy workers compress in parallel
+        frame = compress(self.codec, data)
+        with self._lock:
+            if (self._writer is not None and digest in self._writer.entries) or self._find(digest):
+                return 0
+            if self._writer is None:
+                self._writer = PackWriter(self.packs_root, self.codec)
+            written = self._writer.add(digest, frame, len(data))
+            if self._writer.size >= self.target_size:
+                self._finish_locked()
+            return written
+
+    def _finish_locked(self):
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            idx_path = writer.finish()
+            if idx_path:
+                self._indexes.append(PackIndex(idx_path))
+                self._loaded.add(os.path.basename(idx_path))
+
+    def flush(self):
+        """Seal the open pack so everything added so far is durable and indexed."""
+        with self._lock:
+            self._finish_locked()
+
+    def read(self, digest: str) -> Optional[bytes]:
+        """Decompress one object by digest, reading only its frame."""
+        with self._lock:
+            if self._writer is not None and digest in self._writer.entries:
+                return self._writer.read(digest)
+            found = self._find(digest)
+        if found is None:
+            return None
+        index, (offset, length, _) = found
+        with open(index.pack_path, "rb") as f:
+            f.seek(offset)
+            return decompress(index.codec, f.read(length))
+
+    def stats(self) -> dict:
+        with self._lock:
+            objects = sum(index.count for index in self._indexes)
+            packed = sum(os.path.getsize(index.pack_path) for index in self._indexes)
+        return {"packs": len(self._indexes), "objects": objects, "pack_bytes": packed, "codec": self.codec}
@@ -0,0 +1,300 @@
+"""
+restore.py
+-----------
+Restore engine: pull one tampered file or a whole subtree back from the
+newest clean backup snapshot.
+
+- The newest clean snapshot is the newest one that holds none of the
+  content the monitor has flagged (added/modified rows) for the target
+  paths. A specific snapshot can be requested instead.
+- Objects are staged next to their destination in parallel on the copy
+  engine's pool, and each staged file is checked against its recorded
+  digest before anything is replaced.
+- For each batch the restored hashes are first registered with the
+  monitor (`on_restoring`), so the renames raise no alerts. Then each
+  staged file is renamed into place. Only files whose rename succeeded
+  get their baseline row rewritten (status 'current', the restored hash
+  and mtime), so the database never calls a file clean that was not
+  restored. Staging files carry RESTORE_TMP_MARKER, so the watcher
+  ignores them.
+- With `at`, the target is restored as it was at that moment: the newest
+  snapshot taken at or before `at`, overlaid with the latest captured
+  version (src.utils.versions) of each file that is newer than the
+  snapshot and not newer than `at`. Paths deleted in between (a newer
+  tombstone on the path or a parent folder) are left out, so `prune`
+  removes them as well.
+"""
+
+import os
+import stat
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional
+
+from src.utils.backup import Backup
+from src.utils.database import DatabaseOperation
+from src.utils.versions import VersionStore
+
+RESTORE_TMP_MARKER = ".fim-restore-"
+RESTORE_BATCH_SIZE = 500
+
+
+class RestoreError(Exception):
+    """Raised when no usable snapshot exists or a restored object fails verification."""
+
+
+def _rel_target(source_dir: str, target: str) -> str:
+    rel = os.path.relpath(os.path.abspath(target), source_dir).replace(os.sep, "/")
+    if rel == ".":
+        return ""
+    if rel.startswith(".."):
+        raise RestoreError(f"{target} is not inside {source_dir}")
+    return rel
+
+
+def _under(rel: str, target_rel: str) -> bool:
+    return not target_rel or rel == target_rel or rel.startswith(target_rel + "/")
+
+
+def snapshot_entries(backup: Backup, snapshot: dict, target_rel: str) -> Iterator[dict]:
+    """Manifest entries at or under target_rel (manifests are path-sorted, so stop early)."""
+    for entry in backup.read_manifest(snapshot):
+        if _under(entry["path"], target_rel):
+            yield entry
+        elif target_rel and entry["path"] > target_rel and not entry["path"].startswith(target_rel):
+            return
+
+
+def find_clean_snapshot(backup: Backup, source_dir: str, target_rel: str, flagged: Dict[str, str],
+                        snapshot_id: Optional[str] = None) -> dict:
+    """
+    Newest snapshot of source_dir without flagged content under target_rel
+    (or the snapshot with id snapshot_id). Raises RestoreError if none.
+    """
+    snapshots = backup.list_snapshots(source_dir)
+    if snapshot_id:
+        for snapshot in snapshots:
+            if snapshot["id"] == snapshot_id:
+                return snapshot
+        raise RestoreError(f"Snapshot not found: {snapshot_id}")
+
+    for snapshot in reversed(snapshots):
+        found = False
+        clean = True
+        for entry in snapshot_entries(backup, snapshot, target_rel):
+            found = True
+            path = os.path.join(source_dir, entry["path"])
+            if entry["type"] == "file" and flagged.get(path) == entry.get("fim_hash"):
+                clean = False
+                break
+        if found and clean:
+            return snapshot
+    raise RestoreError(f"No clean snapshot of {source_dir} contains {target_rel or 'it'}")
+
+
+def snapshot_time(snapshot: dict) -> float:
+    """Epoch time of a snapshot, from its UTC id."""
+    return datetime.strptime(snapshot["id"], "%Y%m%dT%H%M%S%fZ").replace(tzinfo=timezone.utc).timestamp()
+
+
+def point_in_time_entries(backup: Backup, versions: VersionStore, source_dir: str, target_rel: str,
+                          at: float) -> tuple:
+    """
+    (snapshot id or None, entries) describing target_rel as of `at`: the
+    newest snapshot at or before `at`, with files replaced by later captured
+    versions and paths deleted since left out. Raises RestoreError if
+    nothing was recorded by then.
+    """
+    snapshot = None
+    for candidate in backup.list_snapshots(source_dir):
+        if snapshot_time(candidate) <= at:
+            snapshot = candidate
+    since = snapshot_time(snapshot) if snapshot else 0.0
+    overrides = {
+        rel: entry for rel, entry in versions.as_of(source_dir, target_rel, at).items()
+        if entry["captured_at"] > since
+    }
+    if snapshot is None and not any(e["type"] != "deleted" for e in overrides.values()):
+        raise RestoreError(f"Nothing of {target_rel or source_dir} was backed up by the requested time")
+    deleted = {rel: entry["captured_at"] for rel, entry in overrides.items() if entry["type"] == "deleted"}
+
+    def _deleted_after(rel: str, captured_at: float) -> bool:
+        """Whether rel or a parent folder was deleted after captured_at."""
+        while True:
+            if deleted.get(rel, 0.0) > captured_at:
+                return True
+            if "/" not in rel:
+                return False
+            rel = rel.rsplit("/", 1)[0]
+
+    def _entries():
+        if snapshot is not None:
+            for entry in snapshot_entries(backup, snapshot, target_rel):
+                entry = overrides.pop(entry["path"], entry)
+                if entry["type"] != "deleted" and not _deleted_after(entry["path"], entry.pop("captured_at", since)):
+                    yield entry
+        # Files first captured after the snapshot
+        for entry in sorted(overrides.values(), key=lambda e: e["path"]):
+            if entry["type"] != "deleted" and not _deleted_after(entry["path"], entry.pop("captured_at")):
+                yield entry
+
+    return (snapshot["id"] if snapshot else None), _entries()
+
+
+class RestoreEngine:
+    def __init__(self, backup: Optional[Backup] = None, versions: Optional[VersionStore] = None):
+        self.backup = backup or Backup()
+        self._versions = versions
+
+    @property
+    def versions(self) -> VersionStore:
+        if self._versions is None:
+            self._versions = VersionStore(self.backup)
+        return self._versions
+
+    def _stage(self, entry: dict, destination: str) -> Optional[str]:
+        """
+        Write the object for entry next to destination and verify it.
+        Returns the staged path, or None when destination already matches.
+        """
+        if os.path.isfile(destination):
+            try:
+                if self.backup.hash_file(destination)[0] == entry["digest"]:
+                    return None
+            except OSError:
+                pass
+
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        staged = os.path.join(os.path.dirname(destination),
+                              f"{RESTORE_TMP_MARKER}{uuid.uuid4().hex}-{os.path.basename(destination)}")
+        try:
+            loose = self.backup.object_path(entry["digest"])
+            if os.path.exists(loose):
+                self.backup.copy_engine.copy_file(loose, staged)
+            else:
+                with open(staged, "wb") as f:
+                    f.write(self.backup.read_object(entry["digest"]))
+
+            digest, _ = self.backup.hash_file(staged)
+            if digest != entry["digest"]:
+                raise RestoreError(f"Backup object for {destination} failed verification")
+
+            os.chmod(staged, stat.S_IMODE(entry.get("mode", 0o644)))
+            mtime_ns = entry.get("mtime_ns")
+            if mtime_ns:
+                os.utime(staged, ns=(mtime_ns, mtime_ns))
+            return staged
+        except BaseException:
+            if os.path.exists(staged):
+                os.remove(staged)
+            raise
+
+    def restore(self, source_dir: str, target: str, db_session=None, snapshot_id: Optional[str] = None,
+                prune: bool = False, job=None,
+                on_restored: Optional[Callable[[List[str]], None]] = None,
+                at: Optional[float] = None,
+                on_restoring: Optional[Callable[[Dict[str, Optional[str]]], None]] = None) -> dict:
+        """
+        Restore target (a file or folder inside the monitored source_dir).
+        With `at` (epoch seconds), restore its state at that time instead of
+        the newest clean snapshot.
+        With `prune`, files under target that are not in the snapshot are removed.
+        `on_restoring` is called with {path: fim hash} before a batch is
+        renamed into place, and with {path: None} for renames that failed.
+        `on_restored` is called with the absolute paths of each committed batch.
+        """
+        started = time.perf_counter()
+        source_dir = os.path.abspath(source_dir)
+        target_rel = _rel_target(source_dir, target)
+        database_instance = DatabaseOperation(db_session) if db_session is not None else None
+
+        prefix = os.path.join(source_dir, target_rel) if target_rel else None
+        flagged = database_instance.get_flagged_hashes(source_dir, prefix) if database_instance else {}
+        if at is not None:
+            snapshot_label, entries = point_in_time_entries(self.backup, self.versions, source_dir, target_rel, at)
+        else:
+            snapshot = find_clean_snapshot(self.backup, source_dir, target_rel, flagged, snapshot_id)
+            snapshot_label, entries = snapshot["id"], snapshot_entries(self.backup, snapshot, target_rel)
+
+        stats = {"snapshot": snapshot_label, "at": at, "restored": 0, "unchanged": 0, "pruned": 0, "bytes": 0}
+        kept = set()
+        batch: List[tuple] = []
+
+        def _commit(batch):
+            staged = [(entry, destination, future.result()) for entry, destination, future in batch]
+            changed = [(entry, destination, path) for entry, destination, path in staged if path]
+            stats["unchanged"] += len(staged) - len(changed)
+            if on_restoring and changed:
+                on_restoring({destination: entry["fim_hash"] for entry, destination, _ in changed})
+            # Files already back to the snapshot content may still be flagged
+            rebaseline = [(entry, destination) for entry, destination, path in staged
+                          if not path and destination in flagged]
+            restored = []
+            try:
+                for entry, destination, path in changed:
+                    os.replace(path, destination)
+                    restored.append(destination)
+                    rebaseline.append((entry, destination))
+                    stats["restored"] += 1
+                    stats["bytes"] += entry["size"]
+            finally:
+                if on_restoring and len(restored) < len(changed):
+                    on_restoring({destination: None for _, destination, _ in changed[len(restored):]})
+                if database_instance is not None and rebaseline:
+                    database_instance.record_file_events(source_dir, {
+                        destination: {
+                            "hash": entry["fim_hash"],
+                            "type": "file",
+                            "last_modified": time.strftime("%Y-%m-%d %H:%M:%S",
+                                                           time.localtime(entry["mtime_ns"] / 1e9)),
+                        }
+                        for entry, destination in rebaseline
+                    }, status="current")
+                if on_restored and restored:
+                    on_restored(restored)
+
+        if job:
+            job.set_message(f"Restoring {target} from snapshot {snapshot_label}"
+                            + (f" as of {datetime.fromtimestamp(at):%Y-%m-%d %H:%M:%S}" if at is not None else ""))
+
+        try:
+            for entry in entries:
+                destination = os.path.join(source_dir, entry["path"])
+                if prune:
+                    kept.add(destination)
+                if entry["type"] == "folder":
+                    os.makedirs(destination, exist_ok=True)
+                    continue
+                if job:
+                    job.check_cancelled()
+                    job.set_total(files=1, bytes_=entry["size"])
+                batch.append((entry, destination, self.backup.copy_engine.submit(self._stage, entry, destination)))
+                if len(batch) >= RESTORE_BATCH_SIZE:
+                    _commit(batch)
+                    if job:
+                        job.advance(files=len(batch), bytes_=sum(e["size"] for e, _, _ in batch))
+                    batch = []
+            _commit(batch)
+            if job:
+                job.advance(files=len(batch), bytes_=sum(e["size"] for e, _, _ in batch))
+        finally:
+            # Never leave staged files behind (e.g. on cancellation or a failed check)
+            for _, _, future in batch:
+                try:
+                    staged = future.result()
+                except BaseException:
+                    continue
+                if staged and os.path.exists(staged):
+                    os.remove(staged)
+
+        if prune and os.path.isdir(os.path.join(source_dir, target_rel)):
+            for root, _, files in os.walk(os.path.join(source_dir, target_rel)):
+                for name in files:
+                    path = os.path.join(root, name)
+                    if path not in kept and RESTORE_TMP_MARKER not in name:
+                        os.remove(path)
+                        stats["pruned"] += 1
+
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        return stats
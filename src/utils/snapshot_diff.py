@@ -0,0 +1,197 @@
+"""
+snapshot_diff.py
+-----------------
+Constant-memory diff of two baselines (yesterday vs today, host A vs host B,
+backup vs live).
+
+Every source yields `(relative_path, {"hash", "type"})` sorted by relative
+path (plain string order, '/' separated), and `merge_diff` merge-joins two
+such streams. Nothing is loaded into a dict, so memory does not grow with
+the size of the tree.
+
+Sources:
+- db_snapshot: stored baseline rows for a directory (server-side cursor)
+- export_snapshot: a baseline export written by src.utils.export
+  (NDJSON or CSV, optionally gzipped)
+- live_snapshot: a scan of a directory on disk
+
+A spec string selects a source from the CLI: `db:<dir>`, `live:<dir>`, or
+a path to an export file (optionally `file:<path>#<dir>` to pick one
+directory out of a multi-directory export).
+"""
+
+import csv
+import gzip
+import heapq
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.api.models.fim_models import Directory, FileMetadata
+from src.FIM.fim_utils import FIM_monitor
+
+SnapshotEntry = Tuple[str, Dict[str, Optional[str]]]
+
+SCAN_WORKERS = int(os.getenv("FIM_VERIFY_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+
+def _relative(path: str, root: str) -> str:
+    rel = os.path.relpath(path, root)
+    return rel.replace(os.sep, "/")
+
+
+# ---------------- Sources ----------------
+
+def db_snapshot(db: Session, directory: str, statuses=("current",), batch_size: int = 1000) -> Iterator[SnapshotEntry]:
+    """Stored rows of one directory, streamed in item_path order."""
+    path_order = FileMetadata.item_path
+    if db.get_bind().dialect.name == "mysql":
+        # The default collation is case-insensitive; the merge needs byte order
+        path_order = FileMetadata.item_path.collate("utf8mb4_bin")
+
+    stmt = (
+        select(FileMetadata.item_path, FileMetadata.hash, FileMetadata.item_type)
+        .join(Directory, FileMetadata.directory_id == Directory.id)
+        .where(Directory.path == directory, FileMetadata.status.in_(statuses))
+        .order_by(path_order)
+        .execution_options(yield_per=batch_size)
+    )
+    for item_path, item_hash, item_type in db.execute(stmt):
+        yield _relative(item_path, directory), {"hash": item_hash, "type": item_type}
+
+
+def export_snapshot(path: str, directory: Optional[str] = None) -> Iterator[SnapshotEntry]:
+    """
+    Rows of a baseline export file (.ndjson / .csv, optionally .gz). The
+    export is sorted by (directory, item_path); pass `directory` when the
+    file covers more than one.
+    """
+    name = path[:-3] if path.endswith(".gz") else path
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as f:  # type: ignore[operator]
+        if name.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+
+        current_dir = None
+        for row in rows:
+            if directory and row["directory"] != directory:
+                continue
+            if current_dir is None:
+                current_dir = row["directory"]
+            elif row["directory"] != current_dir:
+                raise ValueError(f"{path} covers several directories; pick one with '#<directory>'")
+            yield _relative(row["item_path"], row["directory"]), {"hash": row["hash"], "type": row["item_type"]}
+
+
+def sorted_walk(root: str) -> Iterator[Tuple[str, str, bool]]:
+    """
+    Yield (relative_path, absolute_path, is_file) under root in string order
+    of the relative path. A folder's subtree is listed only when its
+    "<name>/" key reaches the front of the heap, so only the frontier of
+    pending entries is held in memory.
+    """
+    heap: list = [("", root, None)]
+    while heap:
+        key, path, is_file = heapq.heappop(heap)
+        if is_file is not None:
+            yield key, path, is_file
+            continue
+        # Folder markers are keyed "<rel>/", the root marker ""
+        prefix = key
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    rel = prefix + entry.name
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    heapq.heappush(heap, (rel, entry.path, not is_dir))
+                    if is_dir:
+                        heapq.heappush(heap, (rel + "/", entry.path, None))
+        except OSError:
+            continue
+
+
+def live_snapshot(root: str, workers: int = SCAN_WORKERS, fim_instance: Optional[FIM_monitor] = None) -> Iterator[SnapshotEntry]:
+    """
+    Scan root on disk in path order, hashing files on a thread pool. Folder
+    entries carry no hash (the recursive folder hash would re-read the whole
+    subtree); they are compared by existence only.
+    """
+    fim_instance = fim_instance or FIM_monitor()
+    window: deque = deque()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="fim-snapshot") as pool:
+        for rel, path, is_file in sorted_walk(root):
+            if is_file:
+                window.append((rel, "file", pool.submit(fim_instance.calculate_hash, path)))
+            else:
+                window.append((rel, "folder", None))
+            while len(window) > workers * 4:
+                rel_out, item_type, future = window.popleft()
+                yield rel_out, {"hash": future.result() if future else None, "type": item_type}
+
+        while window:
+            rel_out, item_type, future = window.popleft()
+            yield rel_out, {"hash": future.result() if future else None, "type": item_type}
+
+
+def source_from_spec(spec: str, db: Optional[Session] = None) -> Iterator[SnapshotEntry]:
+    """Build a snapshot source from a CLI spec (see module docstring)."""
+    if spec.startswith("db:"):
+        if db is None:
+            raise ValueError("A database session is required for db: snapshots")
+        return db_snapshot(db, spec[3:])
+    if spec.startswith("live:"):
+        return live_snapshot(spec[5:])
+    path = spec[5:] if spec.startswith("file:") else spec
+    path, _, directory = path.partition("#")
+    return export_snapshot(path, directory or None)
+
+
+# ---------------- Merge ----------------
+
+def _checked(source: Iterator[SnapshotEntry], label: str) -> Iterator[SnapshotEntry]:
+    previous = None
+    for rel, entry in source:
+        if previous is not None and rel <= previous:
+            raise ValueError(f"{label} snapshot is not sorted by path ('{rel}' after '{previous}')")
+        previous = rel
+        yield rel, entry
+
+
+def merge_diff(old: Iterator[SnapshotEntry], new: Iterator[SnapshotEntry]) -> Iterator[dict]:
+    """
+    Merge-join two path-sorted snapshots. Yields
+    {"status", "path", "type", "old_hash", "new_hash"} for added, modified
+    and deleted paths. Entries without a hash (live folders) only count as
+    modified if the type changed.
+    """
+    old_iter, new_iter = _checked(old, "old"), _checked(new, "new")
+    sentinel = (None, None)
+    old_rel, old_entry = next(old_iter, sentinel)
+    new_rel, new_entry = next(new_iter, sentinel)
+
+    while old_rel is not None or new_rel is not None:
+        if new_rel is None or (old_rel is not None and old_rel < new_rel):
+            yield {"status": "deleted", "path": old_rel, "type": old_entry["type"],
+                   "old_hash": old_entry["hash"], "new_hash": None}
+            old_rel, old_entry = next(old_iter, sentinel)
+        elif old_rel is None or new_rel < old_rel:
+            yield {"status": "added", "path": new_rel, "type": new_entry["type"],
+                   "old_hash": None, "new_hash": new_entry["hash"]}
+            new_rel, new_entry = next(new_iter, sentinel)
+        else:
+            old_hash, new_hash = old_entry["hash"], new_entry["hash"]
+            type_changed = old_entry["type"] != new_entry["type"]
+            hash_changed = old_hash is not None and new_hash is not None and old_hash != new_hash
+            if type_changed or hash_changed:
+                yield {"status": "modified", "path": new_rel, "type": new_entry["type"],
+                       "old_hash": old_hash, "new_hash": new_hash}
+            old_rel, old_entry = next(old_iter, sentinel)
+            new_rel, new_entry = next(new_iter, sentinel)
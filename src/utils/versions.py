@@ -0,0 +1,378 @@
+"""
+versions.py
+------------
+Continuous per-file version history in the backup object store.
+
+When the monitor reports a file as added or modified, its new content is
+stored as an object (deduplicated like snapshot content) and a version row
+is recorded in `<backup root>/versions.db` (SQLite, WAL). A retention
+policy bounds storage:
+
+- keep the last FIM_VERSION_KEEP_LAST versions of every file
+- beyond that, keep the newest version per hour for FIM_VERSION_HOURLY_HOURS
+  and per day for FIM_VERSION_DAILY_DAYS
+- cap the total size at FIM_VERSION_MAX_MB, evicting the least recently used
+  versions first (a file's newest version is never evicted)
+
+When the monitor reports a file or folder as deleted, a tombstone row (empty
+digest, no object) is recorded, so a point-in-time view leaves out paths
+that were deleted by then. Tombstones are thinned like versions but never
+evicted for size.
+
+Digests of dropped versions are queued in `gc_pending`. Their loose objects
+are deleted once no version row or snapshot manifest references them. The
+digests of published manifests are kept in `snapshot_objects`, so each
+collection reads only manifests published since the previous one (plus any
+in-progress `.manifest.gz.tmp`). Collection runs under the backup's object
+lock and is put off while a backup or capture is between storing an object
+and referencing it. Version objects are always stored loose, never packed.
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from src.utils.backup import Backup
+
+VERSIONING_ENABLED = os.getenv("FIM_VERSIONING", "1") not in ("0", "false", "False")
+KEEP_LAST = int(os.getenv("FIM_VERSION_KEEP_LAST", "10"))
+HOURLY_HOURS = int(os.getenv("FIM_VERSION_HOURLY_HOURS", "24"))
+DAILY_DAYS = int(os.getenv("FIM_VERSION_DAILY_DAYS", "30"))
+MAX_BYTES = int(float(os.getenv("FIM_VERSION_MAX_MB", "1024")) * 1024 * 1024)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    path TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    fim_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    mode INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_versions_path ON versions (source, path, created_at);
+CREATE INDEX IF NOT EXISTS ix_versions_access ON versions (last_access);
+CREATE INDEX IF NOT EXISTS ix_versions_digest ON versions (digest);
+CREATE TABLE IF NOT EXISTS gc_pending (digest TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS snapshot_objects (digest TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS scanned_manifests (name TEXT PRIMARY KEY);
+"""
+
+
+class RetentionPolicy:
+    def __init__(self, keep_last: int = KEEP_LAST, hourly_hours: int = HOURLY_HOURS,
+                 daily_days: int = DAILY_DAYS, max_bytes: int = MAX_BYTES):
+        self.keep_last = keep_last
+        self.hourly_hours = hourly_hours
+        self.daily_days = daily_days
+        self.max_bytes = max_bytes
+
+    def thin(self, rows: List[tuple], now: float) -> List[int]:
+        """
+        rows: (id, created_at) of one file, newest first. Returns the ids to
+        drop: anything past keep_last that is not the newest of its hour
+        (within hourly_hours) or of its day (within daily_days).
+        """
+        drop = []
+        hours, days = set(), set()
+        for position, (version_id, created_at) in enumerate(rows):
+            age = now - created_at
+            hour, day = int(created_at // 3600), int(created_at // 86400)
+            keep = position < self.keep_last
+            if age <= self.hourly_hours * 3600 and hour not in hours:
+                keep = True
+            if age <= self.daily_days * 86400 and day not in days:
+                keep = True
+            hours.add(hour)
+            days.add(day)
+            if not keep:
+                drop.append(version_id)
+        return drop
+
+
+class VersionStore:
+    def __init__(self, backup: Optional[Backup] = None, policy: Optional[RetentionPolicy] = None):
+        self.backup = backup or Backup()
+        self.policy = policy or RetentionPolicy()
+        self.db_path = os.path.join(self.backup.backup_base, "versions.db")
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------------- Capture ----------------
+
+    def capture(self, source_dir: str, path: str) -> Optional[dict]:
+        """
+        Store the current content of path as a new version (skipped when it
+        matches the file's latest version). Returns the version row or None.
+        """
+        source_dir = os.path.abspath(source_dir)
+        rel = os.path.relpath(path, source_dir).replace(os.sep, "/")
+        # The object must not be collected between storing it and the row
+        # that references it. It is stored loose: the row commits right away,
+        # while a pack is only sealed when the next backup finishes.
+        with self.backup.using_objects():
+            try:
+                st = os.stat(path)
+                digest, fim_hash, _, _ = self.backup._backup_file(path, pack=False)
+            except OSError as e:
+                print(f"Version capture failed for {path}: {e}")
+                return None
+
+            now = time.time()
+            with self._write_lock:
+                conn = self._conn()
+                latest = conn.execute(
+                    "SELECT digest FROM versions WHERE source = ? AND path = ? ORDER BY created_at DESC LIMIT 1",
+                    (source_dir, rel),
+                ).fetchone()
+                if latest and latest[0] == digest:
+                    return None
+                with conn:
+                    conn.execute(
+                        "INSERT INTO versions (source, path, digest, fim_hash, size, mtime_ns, mode, created_at, last_access)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (source_dir, rel, digest, fim_hash, st.st_size, st.st_mtime_ns, st.st_mode & 0o7777, now, now),
+                    )
+                self._apply_retention(conn, source_dir, rel, now)
+        self.collect()
+        return {"path": rel, "digest": digest, "fim_hash": fim_hash, "size": st.st_size, "created_at": now}
+
+    def record_deletion(self, source_dir: str, path: str) -> bool:
+        """
+        Record that path (a file or folder) was deleted, unless its latest
+        row already says so. Returns whether a tombstone was written.
+        """
+        source_dir = os.path.abspath(source_dir)
+        rel = os.path.relpath(path, source_dir).replace(os.sep, "/")
+        now = time.time()
+        with self._write_lock:
+            conn = self._conn()
+            latest = conn.execute(
+                "SELECT digest FROM versions WHERE source = ? AND path = ? ORDER BY created_at DESC LIMIT 1",
+                (source_dir, rel),
+            ).fetchone()
+            if latest and latest[0] == "":
+                return False
+            with conn:
+                conn.execute(
+                    "INSERT INTO versions (source, path, digest, fim_hash, size, mtime_ns, mode, created_at, last_access)"
+                    " VALUES (?, ?, '', '', 0, 0, 0, ?, ?)",
+                    (source_dir, rel, now, now),
+                )
+            self._apply_retention(conn, source_dir, rel, now)
+        return True
+
+    # ---------------- Retention ----------------
+
+    def _apply_retention(self, conn: sqlite3.Connection, source_dir: str, rel: str, now: float) -> int:
+        """
+        Thin the history of one file, then enforce the size cap. Digests of
+        dropped versions are queued for collect(). Returns versions dropped.
+        """
+        rows = conn.execute(
+            "SELECT id, created_at FROM versions WHERE source = ? AND path = ? ORDER BY created_at DESC",
+            (source_dir, rel),
+        ).fetchall()
+        drop = self.policy.thin(rows, now)
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM versions").fetchone()[0]
+        total -= sum(r[0] for r in conn.execute(
+            f"SELECT size FROM versions WHERE id IN ({','.join('?' * len(drop))})", drop
+        )) if drop else 0
+
+        if total > self.policy.max_bytes:
+            # LRU over everything except each file's newest version and tombstones
+            candidates = conn.execute(
+                "SELECT v.id, v.size FROM versions v WHERE v.digest != '' AND v.created_at < ("
+                " SELECT MAX(n.created_at) FROM versions n WHERE n.source = v.source AND n.path = v.path)"
+                " ORDER BY v.last_access"
+            )
+            dropped = set(drop)
+            for version_id, size in candidates:
+                if total <= self.policy.max_bytes:
+                    break
+                if version_id not in dropped:
+                    drop.append(version_id)
+                    total -= size
+
+        if not drop:
+            return 0
+        placeholders = ",".join("?" * len(drop))
+        with conn:
+            conn.execute(
+                f"INSERT OR IGNORE INTO gc_pending (digest) SELECT DISTINCT digest FROM versions"
+                f" WHERE id IN ({placeholders}) AND digest != ''",
+                drop,
+            )
+            conn.execute(f"DELETE FROM versions WHERE id IN ({placeholders})", drop)
+        return len(drop)
+
+    # ---------------- Object collection ----------------
+
+    def collect(self) -> int:
+        """
+        Delete the loose objects of dropped versions that no version or
+        snapshot manifest (published or in progress) references. Skipped,
+        and retried after a later capture, while a backup or capture is in
+        flight. Returns the number of objects deleted.
+        """
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM gc_pending LIMIT 1").fetchone() is None:
+            return 0
+        with self.backup.collecting_objects() as exclusive:
+            if not exclusive:
+                return 0
+            in_progress = self._sync_snapshot_objects(conn)
+            if in_progress is None:
+                return 0
+            unreferenced = [r[0] for r in conn.execute(
+                "SELECT p.digest FROM gc_pending p"
+                " WHERE NOT EXISTS (SELECT 1 FROM versions v WHERE v.digest = p.digest)"
+                " AND NOT EXISTS (SELECT 1 FROM snapshot_objects s WHERE s.digest = p.digest)"
+            )]
+            deleted = 0
+            for digest in unreferenced:
+                path = self.backup.object_path(digest)
+                if digest not in in_progress and os.path.exists(path):
+                    os.remove(path)
+                    deleted += 1
+            with conn:
+                conn.execute("DELETE FROM gc_pending")
+        return deleted
+
+    def _sync_snapshot_objects(self, conn: sqlite3.Connection) -> Optional[Set[str]]:
+        """
+        Add the digests of manifests published since the last collection to
+        snapshot_objects (rebuilt if a manifest went away) and return the
+        digests of in-progress `.manifest.gz.tmp` files. None if a manifest
+        could not be read, in which case nothing may be deleted.
+        """
+        published, in_progress = {}, []
+        for source_key in os.listdir(self.backup.snapshots_root):
+            root = os.path.join(self.backup.snapshots_root, source_key)
+            if not os.path.isdir(root):
+                continue
+            for name in os.listdir(root):
+                if name.endswith(".manifest.gz"):
+                    published[f"{source_key}/{name}"] = os.path.join(root, name)
+                elif name.endswith(".manifest.gz.tmp"):
+                    in_progress.append(os.path.join(root, name))
+
+        scanned = {r[0] for r in conn.execute("SELECT name FROM scanned_manifests")}
+        if scanned - published.keys():
+            with conn:
+                conn.execute("DELETE FROM snapshot_objects")
+                conn.execute("DELETE FROM scanned_manifests")
+            scanned = set()
+        for name in sorted(published.keys() - scanned):
+            digests = self._manifest_digests(published[name], complete=True)
+            if digests is None:
+                return None
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO snapshot_objects (digest) VALUES (?)", [(d,) for d in digests])
+                conn.execute("INSERT INTO scanned_manifests (name) VALUES (?)", (name,))
+
+        referenced: Set[str] = set()
+        for path in in_progress:
+            digests = self._manifest_digests(path, complete=False)
+            if digests is None:
+                return None
+            referenced |= digests
+        return referenced
+
+    @staticmethod
+    def _manifest_digests(path: str, complete: bool) -> Optional[Set[str]]:
+        """
+        Digests listed in a manifest. An in-progress one may end mid-stream;
+        what was read so far is returned. None if the file is gone (an
+        in-progress manifest was just published) or a published one is damaged.
+        """
+        digests: Set[str] = set()
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        digest = json.loads(line).get("digest")
+                        if digest:
+                            digests.add(digest)
+        except FileNotFoundError:
+            return None
+        except (EOFError, OSError, ValueError, zlib.error) as e:
+            if complete:
+                print(f"Object collection skipped, unreadable manifest {path}: {e}")
+                return None
+        return digests
+
+    # ---------------- Queries ----------------
+
+    def history(self, source_dir: str, rel: str) -> List[dict]:
+        """All stored versions of one file, newest first (deletions have `deleted` set)."""
+        rows = self._conn().execute(
+            "SELECT id, digest, fim_hash, size, mtime_ns, created_at FROM versions"
+            " WHERE source = ? AND path = ? ORDER BY created_at DESC",
+            (os.path.abspath(source_dir), rel),
+        ).fetchall()
+        return [
+            {"id": r[0], "digest": r[1] or None, "fim_hash": r[2] or None, "size": r[3], "mtime_ns": r[4],
+             "deleted": r[1] == "", "created_at": datetime.fromtimestamp(r[5]).strftime("%Y-%m-%d %H:%M:%S")}
+            for r in rows
+        ]
+
+    def as_of(self, source_dir: str, target_rel: str, at: float) -> Dict[str, dict]:
+        """
+        Latest version at or before `at` of every versioned path at or under
+        target_rel, as manifest-style entries keyed by relative path (plus
+        `captured_at`, the version's epoch time). A path deleted by then maps
+        to a tombstone entry of type "deleted".
+        Marks the returned versions as used for LRU eviction.
+        """
+        source_dir = os.path.abspath(source_dir)
+        query = (
+            "SELECT v.id, v.path, v.digest, v.fim_hash, v.size, v.mtime_ns, v.mode, v.created_at FROM versions v"
+            " WHERE v.source = ? AND v.created_at <= ? AND v.created_at = ("
+            "  SELECT MAX(n.created_at) FROM versions n"
+            "  WHERE n.source = v.source AND n.path = v.path AND n.created_at <= ?)"
+        )
+        params: list = [source_dir, at, at]
+        if target_rel:
+            query += " AND (v.path = ? OR substr(v.path, 1, ?) = ?)"
+            params += [target_rel, len(target_rel) + 1, target_rel + "/"]
+
+        conn = self._conn()
+        entries = {}
+        ids = []
+        for version_id, rel, digest, fim_hash, size, mtime_ns, mode, created_at in conn.execute(query, params):
+            ids.append(version_id)
+            if digest == "":
+                entries[rel] = {"path": rel, "type": "deleted", "captured_at": created_at}
+                continue
+            entries[rel] = {"path": rel, "type": "file", "digest": digest, "fim_hash": fim_hash,
+                            "size": size, "mtime_ns": mtime_ns, "mode": mode, "captured_at": created_at}
+        if ids:
+            with self._write_lock, conn:
+                conn.executemany("UPDATE versions SET last_access = ? WHERE id = ?", [(time.time(), i) for i in ids])
+        return entries
+
+    def stats(self) -> dict:
+        count, total = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM versions").fetchone()
+        return {"versions": count, "bytes": total, "max_bytes": self.policy.max_bytes}